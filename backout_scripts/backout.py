@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Filename      : backout.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : This script backs out a full or half-finished cut-over in one run. It reads the events of the
+                implementation steps in ./logs to find what was actually changed and reverts it in reverse order: the
+                SMCP gateways disabled by disable_smcp_gateway.py are enabled again in one patch, the deployments
+                scaled down by scale_down_smcp_gateway.py go back to their recorded replica counts, and the objects
+                relabelled by remove_labels.py / apply_helm_adoption.py and the quotas raised by increase_quotas.py are
+                restored from ./backups. Independent operations run concurrently.
+"""
+
+import argparse
+import os
+import sys
+
+# Shared helpers live alongside the implementation scripts.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "implementation_scripts"))
+
+from common.cluster_api import create_api_client, whoami
+from common.dry_run import log_report
+from common.logging_setup import create_logger
+from common.restore import BACKUP_DIR
+from common.reverse_plan import BACKOUT_DAG, LOGS_DIR, changes_done, read_events, run_backout
+
+
+def check_login():
+
+    # Check if the user is logged in to the OpenShift cluster.
+    # If not, prompt the user to log in and exit the script.
+    if not whoami(api_client):
+        logger.error("UNAUTHORIZED...!! Please login to the cluster and try again... !")
+        sys.exit(1)
+
+
+def main():
+
+    for directory in (args.logs_dir, args.backup_dir):
+        if not os.path.isdir(directory):
+            logger.error(f"Required directory {directory} does not exist. Exiting.. !")
+            sys.exit(1)
+
+    logger.info(
+        "============================   Starting Script Execution.  ============================"
+    )
+
+    # What the implementation steps changed, from their events.
+    done = changes_done(read_events(args.logs_dir))
+    logger.info(f"Changes recorded in the events of '{args.logs_dir}':")
+    for operation, dependencies in BACKOUT_DAG.items():
+        after = f" (after {', '.join(dependencies)})" if dependencies else ""
+        logger.info(f" - {operation:<16}: {len(done[operation])}{after}")
+
+    validated = True
+    if not any(done.values()):
+        logger.newline()
+        logger.info("No change to back out.")
+    else:
+        results, skipped = run_backout(api_client, done, args.backup_dir, dry_run="All" if dry_run else None)
+        changes = [result for operation in BACKOUT_DAG for result in results.get(operation, [])]
+
+        if dry_run:
+            # Validate every inverse change on the API server, nothing is persisted.
+            validated = log_report([dict(result, accepted=result["succeeded"]) for result in changes])
+        else:
+            logger.newline()
+            for result in changes:
+                target = f"{result['namespace']}/{result['name']}" if result["namespace"] else result["name"]
+                if result["succeeded"]:
+                    logger.info(f"{result['kind']} '{target}': {result['action']} done.")
+                else:
+                    logger.error(f"Error backing out {result['kind']} '{target}' ({result['action']})")
+                    logger.error("Error details: ")
+                    logger.error(f" - Reason: {result['reason']}")
+                    logger.error(f" - Status: {result['status']}")
+                    logger.error(f" - Message: {result['message']}")
+            failed = [result for result in changes if not result["succeeded"]]
+            logger.newline()
+            logger.info(f"Changes backed out : {len(changes) - len(failed)}")
+            if failed:
+                logger.error(f"Changes failed     : {len(failed)}")
+            validated = not failed
+
+        for operation in skipped:
+            logger.error(f"Skipped '{operation}', it runs after {', '.join(BACKOUT_DAG[operation])} which did not succeed.")
+        validated = validated and not skipped
+
+    logger.newline()
+    logger.info(
+        "============================   Script Execution Completed.   ============================"
+    )
+    if not validated:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    # Set global logger
+    logger = create_logger("backout")
+
+    parser = argparse.ArgumentParser("backout")
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Run the script in dry run mode without making any changes.",
+    )
+    parser.add_argument(
+        "--execute",
+        action="store_true",
+        help="Run the script in execution mode and make changes.",
+    )
+    parser.add_argument(
+        "--logs-dir",
+        default=LOGS_DIR,
+        help=f"Directory with the events of the implementation steps (default: {LOGS_DIR}).",
+    )
+    parser.add_argument(
+        "--backup-dir",
+        default=BACKUP_DIR,
+        help=f"Directory written by backup_smcp_resources.py (default: {BACKUP_DIR}).",
+    )
+    args = parser.parse_args()
+
+    if args.dry_run == args.execute:
+        logger.info("USAGE: python backout.py --dry-run (OR) --execute [--logs-dir <dir>] [--backup-dir <dir>]")
+        logger.error("Please provide the relevant input to run.")
+        sys.exit(1)  # Exit with error status
+
+    dry_run = args.dry_run
+    if dry_run:
+        logger.info(
+            "********************************************************************"
+        )
+        logger.info(
+            "****       Running in DRY RUN MODE. No changes will be made.    ****"
+        )
+        logger.info(
+            "********************************************************************"
+        )
+        logger.newline()
+
+    # Configure the Kubernetes client to connect to the OpenShift cluster.
+    api_client = create_api_client()
+
+    check_login()
+
+    # Run the main function
+    main()
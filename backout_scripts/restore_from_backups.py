@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Filename      : restore_from_backups.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : This script restores the namespace, resource quota, service account, role, role binding and service of the
+                SMCP gateways exactly as they were saved by backup_smcp_resources.py. Every backup is compared with the
+                live object and only the objects that changed since the backup are put back, concurrently, with
+                server-side apply. With --dry-run the restore is validated by the API server without any change.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# Shared helpers live alongside the implementation scripts.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "implementation_scripts"))
+
+from common.cluster_api import create_api_client, whoami
+from common.dry_run import log_report
+from common.event_log import elapsed_ms
+from common.logging_setup import create_logger
+from common.restore import BACKUP_DIR, BACKUP_KINDS, load_backups, needs_restore, plan_restore, restore
+
+
+def compare_backups(backups):
+
+    # Compare every backup with its live object, objects that cannot be read are reported in their plan.
+    start = time.monotonic()
+    plans = plan_restore(api_client, backups)
+    logger.event(
+        "Backup", None, None, "compare_backups", "success", 200, elapsed_ms(start),
+        objects=len(plans), changed=sum(needs_restore(plan) for plan in plans),
+    )
+    return plans
+
+
+def changed_paths(plan):
+
+    # Fields of the live object that differ from the backup, and the labels and annotations added since.
+    paths = list(plan["differences"])
+    if plan["remove"]:
+        for field, keys in plan["remove"]["metadata"].items():
+            paths.extend(f".metadata.{field}.{key}" for key in keys)
+    return paths
+
+
+def check_login():
+
+    # Check if the user is logged in to the OpenShift cluster.
+    # If not, prompt the user to log in and exit the script.
+    if not whoami(api_client):
+        logger.error("UNAUTHORIZED...!! Please login to the cluster and try again... !")
+        sys.exit(1)
+
+
+def main():
+
+    if not os.path.isdir(args.backup_dir):
+        logger.error(f"Backup directory {args.backup_dir} does not exist. Exiting.. !")
+        sys.exit(1)
+
+    logger.info(
+        "============================   Starting Script Execution.  ============================"
+    )
+
+    backups = load_backups(args.backup_dir, kinds=args.kind, namespaces=args.namespace)
+    logger.info(f"Backups loaded from '{args.backup_dir}': {len(backups)}")
+    plans = compare_backups(backups)
+
+    # Objects that changed since the backup, and the ones that could not be read.
+    logger.newline()
+    for plan in plans:
+        target = f"{plan['namespace']}/{plan['name']}" if plan["namespace"] else plan["name"]
+        if plan["error"]:
+            status, reason, message = plan["error"]
+            logger.error(f" - {plan['kind']} '{target}': cannot be read [{status} {reason}] {message}")
+        elif not plan["exists"]:
+            logger.info(f" - {plan['kind']} '{target}': missing, will be recreated")
+        elif needs_restore(plan):
+            paths = changed_paths(plan)
+            logger.info(f" - {plan['kind']} '{target}': {len(paths)} field(s) changed since the backup")
+            for path in paths:
+                logger.info(f"     {path}")
+
+    changed = [plan for plan in plans if needs_restore(plan)]
+    unreadable = [plan for plan in plans if plan["error"]]
+    logger.newline()
+    logger.info(f"Objects in sync with their backup : {len(plans) - len(changed) - len(unreadable)}")
+    logger.info(f"Objects to restore                : {len(changed)}")
+    if unreadable:
+        logger.error(f"Objects that cannot be read      : {len(unreadable)}")
+
+    results = restore(api_client, plans, dry_run="All" if dry_run else None)
+    failed = [result for result in results if not result["restored"]]
+
+    if dry_run:
+        # Validate every restore on the API server, nothing is persisted.
+        validated = log_report([dict(result, accepted=result["restored"]) for result in results])
+    else:
+        logger.newline()
+        for result in results:
+            target = f"{result['namespace']}/{result['name']}" if result["namespace"] else result["name"]
+            if result["restored"]:
+                logger.info(f"{result['kind']} '{target}' restored from the backup ({result['action']}).")
+            else:
+                logger.error(f"Error restoring {result['kind']} '{target}' from the backup")
+                logger.error("Error details: ")
+                logger.error(f" - Reason: {result['reason']}")
+                logger.error(f" - Status: {result['status']}")
+                logger.error(f" - Message: {result['message']}")
+        logger.newline()
+        logger.info(f"Objects restored : {len(results) - len(failed)}")
+        if failed:
+            logger.error(f"Objects failed   : {len(failed)}")
+        validated = not failed
+
+    logger.newline()
+    logger.info(
+        "============================   Script Execution Completed.   ============================"
+    )
+    if not validated or unreadable:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    # Set global logger
+    logger = create_logger("restore_from_backups")
+
+    parser = argparse.ArgumentParser("restore_from_backups")
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Run the script in dry run mode without making any changes.",
+    )
+    parser.add_argument(
+        "--execute",
+        action="store_true",
+        help="Run the script in execution mode and make changes.",
+    )
+    parser.add_argument(
+        "--backup-dir",
+        default=BACKUP_DIR,
+        help=f"Directory written by backup_smcp_resources.py (default: {BACKUP_DIR}).",
+    )
+    parser.add_argument(
+        "--kind",
+        action="append",
+        choices=list(BACKUP_KINDS),
+        help="Restore only this backup folder, can be repeated. Defaults to every folder.",
+    )
+    parser.add_argument(
+        "--namespace",
+        action="append",
+        help="Restore only the objects of this namespace, can be repeated. Defaults to every namespace.",
+    )
+    args = parser.parse_args()
+
+    if args.dry_run == args.execute:
+        logger.info("USAGE: python restore_from_backups.py --dry-run (OR) --execute [--backup-dir <dir>]")
+        logger.error("Please provide the relevant input to run.")
+        sys.exit(1)  # Exit with error status
+
+    dry_run = args.dry_run
+    if dry_run:
+        logger.info(
+            "********************************************************************"
+        )
+        logger.info(
+            "****       Running in DRY RUN MODE. No changes will be made.    ****"
+        )
+        logger.info(
+            "********************************************************************"
+        )
+        logger.newline()
+
+    # Configure the Kubernetes client to connect to the OpenShift cluster.
+    api_client = create_api_client()
+
+    check_login()
+
+    # Run the main function
+    main()
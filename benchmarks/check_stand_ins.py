@@ -0,0 +1,203 @@
+"""
+Filename      : check_stand_ins.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : Runs the shared helpers that talk to the gateways against the local stand-ins and checks their results,
+                without a cluster. The Envoy stats scraper measures the gateways of a fake API server through
+                fake_envoy_stats.py in every stats format: a format it can read must show the traffic, one without
+                traffic stats must never count as drained or taken over. The latency A/B load generator runs against
+                two fake_echo_server.py sides, one failing a share of its requests with 503, and must count their
+                requests, the 5xx class and ordered percentiles. Exits with status 1 when a check fails.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+from kubernetes import client
+
+# Shared helpers live alongside the implementation scripts.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "implementation_scripts"))
+
+from common.cluster_api import create_api_client, get_smcp
+from common.envoy_stats import create_session, measure_traffic
+from common.gateway_manifest import build_manifest
+from common.load_generator import compare, run_ab, side_metrics
+from common.logging_setup import create_logger
+from fake_api_server import FakeCluster
+from fake_api_server import start_server as start_api_server
+from fake_echo_server import start_server as start_echo_server
+from fake_envoy_stats import FakeEnvoyStats
+from fake_envoy_stats import start_server as start_stats_server
+from synthetic_cluster import build_cluster
+
+# Token the fake API server accepts, any token works.
+CHECK_TOKEN = "sha256~benchmark-token"
+
+# Requests per second of every gateway pod of the stand-in, and the tolerance of the measured rates.
+POD_RPS = 50.0
+RATE_TOLERANCE = 0.2
+
+# Share of the candidate echo requests answered with 503, and the short load of the A/B check.
+ECHO_ERROR_RATE = 0.2
+ECHO_LOAD = {"concurrency": 4, "duration": 1, "warmup": 0.2}
+
+
+def check(results, name, passed, detail):
+
+    # Record and log the outcome of one check.
+    results.append({"check": name, "passed": passed, "detail": detail})
+    if passed:
+        logger.info(f"PASS - {name}: {detail}")
+    else:
+        logger.error(f"FAIL - {name}: {detail}")
+
+
+def measure(core_api, records, **stand_in):
+
+    # Measure the traffic of the records through a stand-in of the Envoy stats with the given settings.
+    settings = {
+        "smcp_rps": POD_RPS,
+        "injected_rps": POD_RPS,
+        "smcp_connections": 10,
+        "injected_connections": 10,
+        "error_ratio": 0.0,
+        "drain_after": None,
+        "stats_format": "envoy",
+    }
+    settings.update(stand_in)
+    server, url = start_stats_server(FakeEnvoyStats(**settings))
+    try:
+        return measure_traffic(create_session(), core_api, records, args.interval, url)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def check_envoy_stats(results, core_api, records):
+
+    # Every stats format against the same gateways: Envoy and Istio stats are measured, no stats never pass.
+    for stats_format in ("envoy", "istio"):
+        for row in measure(core_api, records, stats_format=stats_format):
+            name = f"{stats_format} stats of {row['gateway_id']}"
+            expected = POD_RPS * row["injected"]["pods"]
+            check(
+                results, f"{name} measured",
+                row["injected"]["scraped"] == row["injected"]["pods"] > 0
+                and abs(row["injected"]["rps"] - expected) <= expected * RATE_TOLERANCE,
+                f"{row['injected']['scraped']}/{row['injected']['pods']} pods, {row['injected']['rps']:.1f} req/s, "
+                f"{expected:.1f} expected",
+            )
+            check(
+                results, f"{name} taken over and not drained", row["taken_over"] and not row["drained"],
+                f"taken_over={row['taken_over']}, drained={row['drained']}",
+            )
+
+    for row in measure(core_api, records, stats_format="istio", error_ratio=0.05):
+        check(
+            results, f"istio 5xx of {row['gateway_id']} block the takeover",
+            row["injected"]["errors_per_s"] > 0 and not row["taken_over"],
+            f"{row['injected']['errors_per_s']:.1f} 5xx/s, taken_over={row['taken_over']}",
+        )
+
+    for row in measure(core_api, records, smcp_rps=0.0, smcp_connections=0):
+        check(
+            results, f"idle SMCP gateway {row['gateway_id']} drained", row["drained"],
+            f"SMCP {row['smcp']['rps']:.1f} req/s, drained={row['drained']}",
+        )
+
+    for row in measure(core_api, records, smcp_rps=0.0, smcp_connections=0, stats_format="none"):
+        check(
+            results, f"unmeasured gateway {row['gateway_id']} neither drained nor taken over",
+            row["smcp"]["scraped"] == 0 and not row["drained"] and not row["taken_over"],
+            f"{row['smcp']['scraped']}/{row['smcp']['pods']} SMCP pods measured, taken_over={row['taken_over']}, "
+            f"drained={row['drained']}",
+        )
+
+
+def check_load_generator(results):
+
+    # A short A/B run between an echo stand-in that answers every request and one failing a share of them.
+    servers = [start_echo_server(0), start_echo_server(0, error_rate=ECHO_ERROR_RATE)]
+    try:
+        baseline, candidate = asyncio.run(run_ab([servers[0][1]], [servers[1][1]], **ECHO_LOAD))
+    finally:
+        for server, url in servers:
+            server.shutdown()
+            server.server_close()
+
+    for result, expected_errors in ((baseline, 0.0), (candidate, ECHO_ERROR_RATE)):
+        metrics = side_metrics(result)
+        name = f"echo {result['label']}"
+        check(results, f"{name} requests counted", metrics["requests"] > 0, f"{metrics['requests']} requests")
+        check(
+            results, f"{name} errors classified",
+            set(metrics["errors"]) <= {"5xx"} and abs(metrics["error_rate"] - expected_errors) <= RATE_TOLERANCE / 2,
+            f"errors={metrics['errors']}, error rate {metrics['error_rate']:.2%}, {expected_errors:.0%} expected",
+        )
+        latencies = [metrics["min_ms"], metrics["p50"], metrics["p90"], metrics["p99"], metrics["max_ms"]]
+        check(
+            results, f"{name} percentiles ordered",
+            None not in latencies and latencies == sorted(latencies),
+            "min/p50/p90/p99/max " + "/".join("-" if value is None else f"{value:.2f}" for value in latencies) + " ms",
+        )
+
+    error_row = next(row for row in compare(baseline, candidate) if row["metric"] == "error_rate")
+    check(
+        results, "echo candidate 5xx regress the error rate", error_row["regressed"],
+        f"{error_row['baseline']:.2%} -> {error_row['candidate']:.2%}, regressed={error_row['regressed']}",
+    )
+
+
+def main():
+
+    logger.info(
+        "============================   Starting Script Execution.  ============================"
+    )
+    logger.newline()
+
+    results = []
+
+    cluster = FakeCluster()
+    server, url = start_api_server(cluster, tls=False)
+    cluster.load(build_cluster(2, url.split("://", 1)[1]))
+    os.environ["KUBERNETES_HOST"] = url
+    os.environ["KUBERNETES_TOKEN"] = CHECK_TOKEN
+    api_client = create_api_client()
+    records = build_manifest(get_smcp(api_client))
+    check_envoy_stats(results, client.CoreV1Api(api_client), records)
+    server.shutdown()
+    server.server_close()
+    check_load_generator(results)
+
+    failed = [result for result in results if not result["passed"]]
+    logger.newline()
+    logger.info(f"Checks passed : {len(results) - len(failed)}")
+    logger.info(f"Checks failed : {len(failed)}")
+    logger.newline()
+    logger.info(
+        "============================   Script Execution Completed.   ============================"
+    )
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    os.makedirs("./logs", exist_ok=True)
+
+    # Set global logger
+    logger = create_logger("check_stand_ins")
+
+    parser = argparse.ArgumentParser("check_stand_ins")
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=1.0,
+        help="Seconds between the two Envoy stats scrapes of a check (default: 1).",
+    )
+
+    args = parser.parse_args()
+
+    main()
@@ -0,0 +1,678 @@
+"""
+Filename      : fake_api_server.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : Local stand-in for the OpenShift API server used by the benchmarks. Serves the Kubernetes subset the
+                scripts use (namespaces, quotas, services, service accounts, roles, role bindings, deployments with
+                the scale subresource, pods, endpoints, secrets, HPAs), the SMCP/SMMR custom resources, routes, the
+                current user and the alertmanager silences API. Scaling a deployment down removes its extra pods and
+                their endpoint addresses. Supports latency and 429 injection and counts calls.
+"""
+
+import argparse
+import copy
+import json
+import os
+import random
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import yaml
+
+# Shared helpers live alongside the implementation scripts.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "implementation_scripts"))
+
+from common.logging_setup import create_logger
+from synthetic_cluster import build_cluster
+
+# Plural -> (api version, kind, namespaced)
+RESOURCES = {
+    "namespaces": ("v1", "Namespace", False),
+    "resourcequotas": ("v1", "ResourceQuota", True),
+    "limitranges": ("v1", "LimitRange", True),
+    "services": ("v1", "Service", True),
+    "serviceaccounts": ("v1", "ServiceAccount", True),
+    "pods": ("v1", "Pod", True),
+    "endpoints": ("v1", "Endpoints", True),
+    "secrets": ("v1", "Secret", True),
+    "deployments": ("apps/v1", "Deployment", True),
+    "roles": ("rbac.authorization.k8s.io/v1", "Role", True),
+    "rolebindings": ("rbac.authorization.k8s.io/v1", "RoleBinding", True),
+    "horizontalpodautoscalers": ("autoscaling/v2", "HorizontalPodAutoscaler", True),
+    "servicemeshcontrolplanes": ("maistra.io/v2", "ServiceMeshControlPlane", True),
+    "servicemeshmemberrolls": ("maistra.io/v1", "ServiceMeshMemberRoll", True),
+    "routes": ("route.openshift.io/v1", "Route", True),
+}
+
+
+def now():
+
+    # RFC 3339 timestamp as used by the API server.
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def status(code, reason, message):
+
+    # metav1.Status body of an error response.
+    return {
+        "apiVersion": "v1",
+        "kind": "Status",
+        "metadata": {},
+        "status": "Failure" if code >= 400 else "Success",
+        "reason": reason,
+        "message": message,
+        "code": code,
+    }
+
+
+def match_labels(labels, selector):
+
+    # Evaluate an equality based label selector: a=b, a==b, a!=b, a and !a, comma separated.
+    labels = labels or {}
+    for term in filter(None, (term.strip() for term in (selector or "").split(","))):
+        if "!=" in term:
+            key, value = term.split("!=", 1)
+            if labels.get(key.strip()) == value.strip():
+                return False
+        elif "=" in term:
+            key, value = term.replace("==", "=").split("=", 1)
+            if labels.get(key.strip()) != value.strip():
+                return False
+        elif term.startswith("!"):
+            if term[1:] in labels:
+                return False
+        elif term not in labels:
+            return False
+    return True
+
+
+def match_fields(obj, selector):
+
+    # Evaluate a field selector: path=value, path==value and path!=value, comma separated.
+    for term in filter(None, (term.strip() for term in (selector or "").split(","))):
+        negate = "!=" in term
+        path, value = term.replace("!=", "=").replace("==", "=").split("=", 1)
+        current = obj
+        for part in path.strip().split("."):
+            current = current.get(part) if isinstance(current, dict) else None
+        if (str(current) == value.strip()) == negate:
+            return False
+    return True
+
+
+def merge_patch(target, patch):
+
+    # RFC 7386 JSON merge patch, also used for strategic merge and apply patches of these simple objects.
+    if not isinstance(patch, dict):
+        return copy.deepcopy(patch)
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = merge_patch(result.get(key), value)
+    return result
+
+
+def json_patch(target, operations):
+
+    # RFC 6902 JSON patch supporting add, replace, remove and test.
+    result = copy.deepcopy(target)
+    for operation in operations:
+        parts = [part.replace("~1", "/").replace("~0", "~") for part in operation["path"].lstrip("/").split("/")]
+        parent = result
+        for part in parts[:-1]:
+            parent = parent[int(part)] if isinstance(parent, list) else parent.setdefault(part, {})
+        last = parts[-1]
+        op = operation["op"]
+        if op == "test":
+            current = parent[int(last)] if isinstance(parent, list) else parent.get(last)
+            if current != operation["value"]:
+                raise ValueError(f"test failed at {operation['path']}")
+        elif op in ("add", "replace"):
+            if isinstance(parent, list):
+                if last == "-":
+                    parent.append(operation["value"])
+                elif op == "add":
+                    parent.insert(int(last), operation["value"])
+                else:
+                    parent[int(last)] = operation["value"]
+            else:
+                if op == "replace" and last not in parent:
+                    raise KeyError(operation["path"])
+                parent[last] = operation["value"]
+        elif op == "remove":
+            if isinstance(parent, list):
+                parent.pop(int(last))
+            else:
+                del parent[last]
+    return result
+
+
+class FakeCluster:
+
+    # In-memory object store with call counters, latency and throttling settings.
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, throttle_rate=0.0, retry_after=1):
+        self.lock = threading.Lock()
+        self.objects = {plural: {} for plural in RESOURCES}
+        self.silences = {}
+        self.counters = Counter()
+        self.resource_version = 1
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+
+    def load(self, cluster):
+
+        # Replace the store content with the given plural -> objects mapping.
+        with self.lock:
+            self.objects = {plural: {} for plural in RESOURCES}
+            self.silences = {}
+            for plural, items in cluster.items():
+                for item in items:
+                    self._store(plural, copy.deepcopy(item))
+
+    def _store(self, plural, obj):
+
+        # Save an object, setting the server managed metadata.
+        api_version, kind, namespaced = RESOURCES[plural]
+        meta = obj.setdefault("metadata", {})
+        self.resource_version += 1
+        meta["resourceVersion"] = str(self.resource_version)
+        meta.setdefault("uid", str(uuid.uuid4()))
+        meta.setdefault("creationTimestamp", now())
+        obj.setdefault("apiVersion", api_version)
+        obj.setdefault("kind", kind)
+        if plural == "resourcequotas":
+            # Quantities are always returned as strings and the quota controller mirrors spec.hard into the status.
+            hard = {key: str(value) for key, value in (obj.get("spec") or {}).get("hard", {}).items()}
+            obj.setdefault("spec", {})["hard"] = hard
+            obj.setdefault("status", {})["hard"] = dict(hard)
+        key = (meta.get("namespace") if namespaced else None, meta["name"])
+        self.objects[plural][key] = obj
+        return obj
+
+    def get(self, plural, namespace, name):
+
+        # Return a copy of an object, or None.
+        with self.lock:
+            obj = self.objects[plural].get((namespace, name))
+            return copy.deepcopy(obj) if obj else None
+
+    def list(self, plural, namespace=None, label_selector=None, field_selector=None):
+
+        # Return copies of the matching objects.
+        with self.lock:
+            return [
+                copy.deepcopy(obj)
+                for (obj_namespace, name), obj in self.objects[plural].items()
+                if (namespace is None or obj_namespace == namespace)
+                and match_labels(obj["metadata"].get("labels"), label_selector)
+                and match_fields(obj, field_selector)
+            ]
+
+    def put(self, plural, obj, dry_run=False):
+
+        # Create or replace an object.
+        with self.lock:
+            if dry_run:
+                return copy.deepcopy(obj)
+            return copy.deepcopy(self._store(plural, copy.deepcopy(obj)))
+
+    def delete(self, plural, namespace, name, dry_run=False):
+
+        # Delete an object, returning it or None.
+        with self.lock:
+            if dry_run:
+                obj = self.objects[plural].get((namespace, name))
+            else:
+                obj = self.objects[plural].pop((namespace, name), None)
+            return copy.deepcopy(obj) if obj else None
+
+    def scale_pods(self, namespace, deployment, replicas):
+
+        # Drop the pods of a deployment above its new replica count, and their addresses from the endpoints of the
+        # namespace, the way they leave once they have terminated. Pods are named <deployment>-<index>.
+        with self.lock:
+            removed = set()
+            for key, obj in list(self.objects["pods"].items()):
+                prefix, _, index = key[1].rpartition("-")
+                if key[0] == namespace and prefix == deployment and index.isdigit() and int(index) >= replicas:
+                    removed.add(key[1])
+                    del self.objects["pods"][key]
+            if not removed:
+                return
+            for (obj_namespace, name), obj in list(self.objects["endpoints"].items()):
+                if obj_namespace != namespace:
+                    continue
+                subsets = []
+                for subset in obj.get("subsets") or []:
+                    for field in ("addresses", "notReadyAddresses"):
+                        if field in subset:
+                            subset[field] = [
+                                address for address in subset[field]
+                                if (address.get("targetRef") or {}).get("name") not in removed
+                            ]
+                    if subset.get("addresses") or subset.get("notReadyAddresses"):
+                        subsets.append(subset)
+                obj["subsets"] = subsets
+                self._store("endpoints", obj)
+
+    def count(self, client, method, resource):
+
+        # Count one call.
+        with self.lock:
+            self.counters["total"] += 1
+            self.counters[f"client:{client}"] += 1
+            self.counters[f"{method} {resource}"] += 1
+
+    def stats(self):
+
+        # Snapshot of the call counters.
+        with self.lock:
+            return dict(self.counters)
+
+    def reset(self):
+
+        # Reset the call counters.
+        with self.lock:
+            self.counters = Counter()
+
+
+def parse_path(path):
+
+    # Split an API path into (plural, namespace, name, subresource), or None when it is not a resource path.
+    parts = [part for part in path.split("/") if part]
+    if not parts:
+        return None
+    if parts[0] == "api" and len(parts) >= 3:
+        rest = parts[2:]
+    elif parts[0] == "apis" and len(parts) >= 4:
+        rest = parts[3:]
+    else:
+        return None
+
+    namespace = None
+    if len(rest) >= 3 and rest[0] == "namespaces":
+        namespace = rest[1]
+        rest = rest[2:]
+
+    plural = rest[0]
+    name = rest[1] if len(rest) > 1 else None
+    subresource = rest[2] if len(rest) > 2 else None
+    return plural, namespace, name, subresource
+
+
+class FakeApiHandler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+    cluster = None
+
+    def log_message(self, format, *args):
+
+        # Keep the request log quiet, the counters carry the information.
+        return
+
+    def send_json(self, code, body, headers=None):
+
+        # Send a JSON response with a content length so connections can be reused.
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def read_body(self):
+
+        # Read and decode the request body, JSON or YAML.
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        if not raw:
+            return None
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return yaml.safe_load(raw)
+
+    def handle_request(self, method):
+
+        # Common entry point of every verb: latency, throttling, counting, then routing.
+        url = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        body = self.read_body() if method in ("POST", "PUT", "PATCH") else None
+
+        if url.path.startswith("/_bench/"):
+            return self.handle_bench(url.path)
+
+        client = self.headers.get("X-Bench-Client", "python")
+        parsed = parse_path(url.path)
+        resource = parsed[0] if parsed else url.path
+        if parsed and parsed[3]:
+            resource = f"{parsed[0]}/{parsed[3]}"
+        self.cluster.count(client, method, resource)
+
+        delay = self.cluster.latency_ms + random.uniform(0, self.cluster.jitter_ms)
+        if delay:
+            time.sleep(delay / 1000)
+
+        if self.cluster.throttle_rate and random.random() < self.cluster.throttle_rate:
+            self.cluster.count(client, method, "throttled")
+            return self.send_json(
+                429,
+                status(429, "TooManyRequests", "the server has received too many requests and has asked us to try again later"),
+                {"Retry-After": str(self.cluster.retry_after)},
+            )
+
+        if url.path.startswith("/api/v1/silence") or url.path.startswith("/api/v2/silence"):
+            return self.handle_silence(method, url.path, body)
+
+        if url.path == "/apis/user.openshift.io/v1/users/~":
+            return self.send_json(
+                200,
+                {"apiVersion": "user.openshift.io/v1", "kind": "User", "metadata": {"name": "bench-admin"}, "groups": []},
+            )
+
+        if url.path in ("/api", "/apis", "/version"):
+            return self.send_json(200, {"kind": "APIVersions", "versions": ["v1"], "gitVersion": "v1.29.0"})
+
+        if not parsed or parsed[0] not in RESOURCES:
+            return self.send_json(404, status(404, "NotFound", f"the server could not find the requested resource {url.path}"))
+
+        plural, namespace, name, subresource = parsed
+        dry_run = query.get("dryRun") == "All"
+
+        if method == "GET":
+            return self.handle_get(plural, namespace, name, subresource, query, self.headers.get("Accept", ""))
+        if method == "POST":
+            return self.handle_create(plural, namespace, body, dry_run)
+        if method == "PUT":
+            return self.handle_replace(plural, namespace, name, body, dry_run)
+        if method == "PATCH":
+            return self.handle_patch(plural, namespace, name, subresource, body, dry_run)
+        if method == "DELETE":
+            return self.handle_delete(plural, namespace, name, dry_run)
+        return self.send_json(405, status(405, "MethodNotAllowed", f"{method} is not supported"))
+
+    def handle_bench(self, path):
+
+        # Benchmark control endpoints.
+        if path == "/_bench/stats":
+            return self.send_json(200, self.cluster.stats())
+        if path == "/_bench/reset":
+            self.cluster.reset()
+            return self.send_json(200, {})
+        return self.send_json(404, status(404, "NotFound", path))
+
+    def handle_get(self, plural, namespace, name, subresource, query, accept=""):
+
+        # Read one object, its scale subresource, or list objects.
+        api_version, kind, namespaced = RESOURCES[plural]
+        if name is None:
+            items = self.cluster.list(plural, namespace, query.get("labelSelector"), query.get("fieldSelector"))
+            if "as=PartialObjectMetadataList" in accept:
+                # Metadata-only list, as the API server returns it for this Accept header.
+                api_version, kind = "meta.k8s.io/v1", "PartialObjectMetadata"
+                items = [{"apiVersion": api_version, "kind": kind, "metadata": item["metadata"]} for item in items]
+            return self.send_json(
+                200,
+                {
+                    "apiVersion": api_version,
+                    "kind": f"{kind}List",
+                    "metadata": {"resourceVersion": str(self.cluster.resource_version)},
+                    "items": items,
+                },
+            )
+
+        obj = self.cluster.get(plural, namespace if namespaced else None, name)
+        if obj is None:
+            return self.send_json(404, status(404, "NotFound", f'{plural} "{name}" not found'))
+        if subresource == "scale":
+            return self.send_json(200, self.scale_of(obj))
+        return self.send_json(200, obj)
+
+    def scale_of(self, obj):
+
+        # autoscaling/v1 Scale view of a deployment.
+        return {
+            "apiVersion": "autoscaling/v1",
+            "kind": "Scale",
+            "metadata": {
+                "name": obj["metadata"]["name"],
+                "namespace": obj["metadata"].get("namespace"),
+                "resourceVersion": obj["metadata"].get("resourceVersion"),
+            },
+            "spec": {"replicas": obj["spec"].get("replicas", 0)},
+            "status": {"replicas": obj.get("status", {}).get("replicas", 0)},
+        }
+
+    def handle_create(self, plural, namespace, body, dry_run):
+
+        # Create an object, failing when it already exists.
+        namespaced = RESOURCES[plural][2]
+        body = body or {}
+        body.setdefault("metadata", {})
+        if namespaced:
+            body["metadata"]["namespace"] = namespace
+        name = body["metadata"].get("name")
+        if self.cluster.get(plural, namespace if namespaced else None, name) is not None:
+            return self.send_json(409, status(409, "AlreadyExists", f'{plural} "{name}" already exists'))
+        return self.send_json(201, self.cluster.put(plural, body, dry_run))
+
+    def handle_replace(self, plural, namespace, name, body, dry_run):
+
+        # Replace an existing object.
+        namespaced = RESOURCES[plural][2]
+        if self.cluster.get(plural, namespace if namespaced else None, name) is None:
+            return self.send_json(404, status(404, "NotFound", f'{plural} "{name}" not found'))
+        return self.send_json(200, self.cluster.put(plural, body, dry_run))
+
+    def handle_patch(self, plural, namespace, name, subresource, body, dry_run):
+
+        # Apply a JSON, merge, strategic merge or apply patch to an object or its scale subresource.
+        namespaced = RESOURCES[plural][2]
+        content_type = (self.headers.get("Content-Type") or "").split(";")[0]
+        obj = self.cluster.get(plural, namespace if namespaced else None, name)
+
+        if obj is None:
+            if content_type == "application/apply-patch+yaml" and body:
+                body.setdefault("metadata", {})["name"] = name
+                if namespaced:
+                    body["metadata"]["namespace"] = namespace
+                return self.send_json(201, self.cluster.put(plural, body, dry_run))
+            return self.send_json(404, status(404, "NotFound", f'{plural} "{name}" not found'))
+
+        if subresource == "scale":
+            if content_type == "application/json-patch+json":
+                replicas = json_patch(self.scale_of(obj), body)["spec"]["replicas"]
+            else:
+                replicas = (body or {}).get("spec", {}).get("replicas", obj["spec"].get("replicas"))
+            obj["spec"]["replicas"] = replicas
+            obj.setdefault("status", {}).update(
+                {"replicas": replicas, "readyReplicas": replicas, "availableReplicas": replicas}
+            )
+            scaled = self.cluster.put(plural, obj, dry_run)
+            if not dry_run:
+                self.cluster.scale_pods(namespace, name, replicas)
+            return self.send_json(200, self.scale_of(scaled))
+
+        try:
+            if content_type == "application/json-patch+json":
+                patched = json_patch(obj, body or [])
+            else:
+                patched = merge_patch(obj, body or {})
+        except (KeyError, IndexError, ValueError) as e:
+            return self.send_json(422, status(422, "Invalid", f"unable to apply patch: {e}"))
+
+        # Keep the identity of the object whatever the patch contains.
+        patched["metadata"]["name"] = name
+        if namespaced:
+            patched["metadata"]["namespace"] = namespace
+        if plural == "deployments":
+            replicas = patched["spec"].get("replicas")
+            patched.setdefault("status", {}).update(
+                {"replicas": replicas, "readyReplicas": replicas, "availableReplicas": replicas}
+            )
+        stored = self.cluster.put(plural, patched, dry_run)
+        if plural == "deployments" and not dry_run and patched["spec"].get("replicas") is not None:
+            self.cluster.scale_pods(namespace, name, patched["spec"]["replicas"])
+        return self.send_json(200, stored)
+
+    def handle_delete(self, plural, namespace, name, dry_run):
+
+        # Delete an object.
+        namespaced = RESOURCES[plural][2]
+        obj = self.cluster.delete(plural, namespace if namespaced else None, name, dry_run)
+        if obj is None:
+            return self.send_json(404, status(404, "NotFound", f'{plural} "{name}" not found'))
+        return self.send_json(200, status(200, "", f'{plural} "{name}" deleted'))
+
+    def handle_silence(self, method, path, body):
+
+        # Minimal alertmanager v1/v2 silences API.
+        parts = [part for part in path.split("/") if part]
+        version = parts[1]
+        if method == "POST" and parts[2] == "silences":
+            silence_id = (body or {}).get("id") or str(uuid.uuid4())
+            silence = dict(body or {}, id=silence_id)
+            silence["status"] = {"state": "active"}
+            with self.cluster.lock:
+                self.cluster.silences[silence_id] = silence
+            if version == "v1":
+                return self.send_json(200, {"status": "success", "data": {"silenceId": silence_id}})
+            return self.send_json(200, {"silenceID": silence_id})
+        if method == "GET" and parts[2] == "silences":
+            with self.cluster.lock:
+                silences = list(self.cluster.silences.values())
+            if version == "v1":
+                return self.send_json(200, {"status": "success", "data": silences})
+            return self.send_json(200, silences)
+        if parts[2] == "silence" and len(parts) > 3:
+            silence_id = parts[3]
+            with self.cluster.lock:
+                silence = self.cluster.silences.get(silence_id)
+                if silence and method == "DELETE":
+                    silence["status"] = {"state": "expired"}
+            if silence is None:
+                return self.send_json(404, {"status": "error", "error": f"silence {silence_id} not found"})
+            if method == "DELETE":
+                return self.send_json(200, {"status": "success"} if version == "v1" else {})
+            return self.send_json(200, {"status": "success", "data": silence} if version == "v1" else silence)
+        return self.send_json(404, {"status": "error", "error": path})
+
+    def do_GET(self):
+        self.handle_request("GET")
+
+    def do_POST(self):
+        self.handle_request("POST")
+
+    def do_PUT(self):
+        self.handle_request("PUT")
+
+    def do_PATCH(self):
+        self.handle_request("PATCH")
+
+    def do_DELETE(self):
+        self.handle_request("DELETE")
+
+
+def create_certificate(directory):
+
+    # Self-signed certificate for the HTTPS listener, None when openssl is not available.
+    cert_file = os.path.join(directory, "tls.crt")
+    key_file = os.path.join(directory, "tls.key")
+    try:
+        subprocess.run(
+            [
+                "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                "-subj", "/CN=localhost", "-keyout", key_file, "-out", cert_file,
+            ],
+            capture_output=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return cert_file, key_file
+
+
+def start_server(cluster, port=0, tls=True):
+
+    # Start the server on a background thread and return (server, base url).
+    handler = type("BoundFakeApiHandler", (FakeApiHandler,), {"cluster": cluster})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+
+    scheme = "http"
+    if tls:
+        certificate = create_certificate(tempfile.mkdtemp(prefix="fake-api-"))
+        if certificate:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(*certificate)
+            server.socket = context.wrap_socket(server.socket, server_side=True)
+            scheme = "https"
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"{scheme}://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+
+    logger.info(
+        "============================   Starting Script Execution.  ============================"
+    )
+    logger.newline()
+
+    cluster = FakeCluster(args.latency_ms, args.jitter_ms, args.throttle_rate, args.retry_after)
+    server, url = start_server(cluster, args.port, not args.no_tls)
+    cluster.load(build_cluster(args.gateways, url.split("://", 1)[1]))
+
+    logger.info(f"Fake API server listening on {url} with {args.gateways} gateways.")
+    logger.info(f" - export KUBERNETES_HOST={url}")
+    logger.info(f" - export FAKE_API_URL={url}")
+    logger.info(f" - export PATH={os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bin')}:$PATH")
+    logger.newline()
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+    logger.newline()
+    logger.info(f"API calls served: {cluster.stats().get('total', 0)}")
+    logger.info(
+        "============================   Script Execution Completed.   ============================"
+    )
+
+
+if __name__ == "__main__":
+    os.makedirs("./logs", exist_ok=True)
+
+    # Set global logger
+    logger = create_logger("fake_api_server")
+
+    parser = argparse.ArgumentParser("fake_api_server")
+    parser.add_argument("--gateways", type=int, default=10, help="Number of SMCP gateways to synthesize.")
+    parser.add_argument("--port", type=int, default=8443, help="Port to listen on.")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latency added to every API call.")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Random extra latency added to every API call.")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of API calls answered with 429.")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with the 429 answers.")
+    parser.add_argument("--no-tls", action="store_true", help="Serve plain HTTP instead of HTTPS.")
+
+    args = parser.parse_args()
+
+    main()
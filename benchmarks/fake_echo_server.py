@@ -0,0 +1,128 @@
+"""
+Filename      : fake_echo_server.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : Local stand-in for a gateway behind a Service, used to try the latency A/B runs without a cluster.
+                Answers every request with a small echo of the method, path and Host header after a configurable
+                delay, with optional jitter, a share of slow requests for a tail, and a share of 503 answers. Run one
+                per side and point compare_gateway_latency.py at them with --baseline-url and --candidate-url.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Shared helpers live alongside the implementation scripts.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "implementation_scripts"))
+
+from common.logging_setup import create_logger
+
+
+class FakeEchoHandler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, without TCP_NODELAY every answer waits for the delayed ACK.
+    disable_nagle_algorithm = True
+    delay_ms = 0.0
+    jitter_ms = 0.0
+    slow_ratio = 0.0
+    slow_ms = 0.0
+    error_rate = 0.0
+
+    def log_message(self, format, *args):
+
+        # Keep the request log quiet.
+        return
+
+    def answer(self):
+
+        # Wait the configured latency, then echo the request or fail it.
+        delay = self.delay_ms + random.uniform(0, self.jitter_ms)
+        if random.random() < self.slow_ratio:
+            delay += self.slow_ms
+        time.sleep(delay / 1000)
+
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        failed = random.random() < self.error_rate
+        payload = json.dumps(
+            {"method": self.command, "path": self.path, "host": self.headers.get("Host")}
+        ).encode("utf-8")
+        self.send_response(503 if failed else 200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_PUT = answer
+
+
+def start_server(port=0, delay_ms=0.0, jitter_ms=0.0, slow_ratio=0.0, slow_ms=0.0, error_rate=0.0):
+
+    # Start the server on a background thread and return (server, base url).
+    handler = type(
+        "BoundFakeEchoHandler",
+        (FakeEchoHandler,),
+        {
+            "delay_ms": delay_ms,
+            "jitter_ms": jitter_ms,
+            "slow_ratio": slow_ratio,
+            "slow_ms": slow_ms,
+            "error_rate": error_rate,
+        },
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+
+    logger.info(
+        "============================   Starting Script Execution.  ============================"
+    )
+    logger.newline()
+
+    server, url = start_server(
+        args.port, args.delay_ms, args.jitter_ms, args.slow_ratio, args.slow_ms, args.error_rate
+    )
+    logger.info(f"Fake echo server listening on {url}")
+    logger.newline()
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+    logger.newline()
+    logger.info(
+        "============================   Script Execution Completed.   ============================"
+    )
+
+
+if __name__ == "__main__":
+    os.makedirs("./logs", exist_ok=True)
+
+    # Set global logger
+    logger = create_logger("fake_echo_server")
+
+    parser = argparse.ArgumentParser("fake_echo_server")
+    parser.add_argument("--port", type=int, default=18080, help="Port to listen on.")
+    parser.add_argument("--delay-ms", type=float, default=1.0, help="Latency added to every request.")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Random extra latency added to every request.")
+    parser.add_argument("--slow-ratio", type=float, default=0.0, help="Share of the requests that are slow.")
+    parser.add_argument("--slow-ms", type=float, default=0.0, help="Extra latency of the slow requests.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of the requests answered with 503.")
+
+    args = parser.parse_args()
+
+    main()
@@ -0,0 +1,197 @@
+"""
+Filename      : fake_envoy_stats.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : Local stand-in for the Envoy stats endpoint of the gateway pods. Serves /<namespace>/<pod>/stats/prometheus
+                in the Prometheus text format of Envoy, with request and 5xx counters that grow at a configurable rate
+                for the SMCP and the injected gateway pods, active connections, and a few hundred unrelated stats. The
+                SMCP pods can be drained after a number of seconds. --stats-format istio serves istio_requests_total
+                instead of the downstream stats, like the default Istio stats matcher, and none serves neither, like a
+                gateway whose traffic stats are not exported. Point the scripts at it with
+                SMESH_ENVOY_STATS_URL=http://127.0.0.1:<port>/{namespace}/{pod}/stats/prometheus
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Shared helpers live alongside the implementation scripts.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "implementation_scripts"))
+
+from common.logging_setup import create_logger
+
+# Upstream clusters of the unrelated stats, like the outbound clusters of a real gateway.
+NOISE_CLUSTERS = 40
+
+# Traffic stats the stand-in can serve: Envoy downstream stats, Istio standard metrics, or none of them.
+STATS_FORMATS = ["envoy", "istio", "none"]
+
+
+class FakeEnvoyStats:
+
+    def __init__(
+        self, smcp_rps, injected_rps, smcp_connections, injected_connections, error_ratio, drain_after,
+        stats_format="envoy",
+    ):
+
+        # Traffic of both sides, counted from the start of the server.
+        self.started = time.monotonic()
+        self.smcp_rps = smcp_rps
+        self.injected_rps = injected_rps
+        self.smcp_connections = smcp_connections
+        self.injected_connections = injected_connections
+        self.error_ratio = error_ratio
+        self.drain_after = drain_after
+        self.stats_format = stats_format
+
+    def traffic(self, pod):
+
+        # Requests served so far and active connections of one pod. Injected gateway pods are named
+        # <gateway>-gateway-<n>, the SMCP gateway pods <gateway>-<n>.
+        elapsed = time.monotonic() - self.started
+        if "-gateway-" in pod:
+            return self.injected_rps * elapsed, self.injected_connections
+        if self.drain_after is not None and elapsed >= self.drain_after:
+            return self.smcp_rps * self.drain_after, 0
+        return self.smcp_rps * elapsed, self.smcp_connections
+
+    def render(self, pod):
+
+        # Prometheus text of one pod, traffic stats of the gateway listener and of the admin and status listeners,
+        # between the unrelated cluster stats.
+        requests_total, connections = self.traffic(pod)
+        errors = int(requests_total * self.error_ratio)
+        requests_total = int(requests_total)
+        lines = []
+        for index in range(NOISE_CLUSTERS):
+            cluster = f"outbound|8080||backend-{index}.svc.cluster.local"
+            lines.append("# TYPE envoy_cluster_upstream_rq_total counter")
+            lines.append(f'envoy_cluster_upstream_rq_total{{envoy_cluster_name="{cluster}"}} {requests_total // NOISE_CLUSTERS}')
+            lines.append(f'envoy_cluster_upstream_cx_active{{envoy_cluster_name="{cluster}"}} 1')
+        if self.stats_format == "istio":
+            lines.append("# TYPE istio_requests_total counter")
+            for code, count in (("200", requests_total - errors), ("503", errors)):
+                if count:
+                    lines.append(
+                        f'istio_requests_total{{response_code="{code}",reporter="source",'
+                        f'destination_service="backend.svc.cluster.local"}} {count}'
+                    )
+            lines.append("# TYPE envoy_server_total_connections gauge")
+            lines.append(f"envoy_server_total_connections {connections + 1}")
+        if self.stats_format != "envoy":
+            lines.append("# TYPE envoy_server_live gauge")
+            lines.append("envoy_server_live 1")
+            return ("\n".join(lines) + "\n").encode("utf-8")
+        lines.append("# TYPE envoy_http_downstream_rq_total counter")
+        lines.append(f'envoy_http_downstream_rq_total{{envoy_http_conn_manager_prefix="outbound_0.0.0.0_8080"}} {requests_total}')
+        lines.append('envoy_http_downstream_rq_total{envoy_http_conn_manager_prefix="admin"} 917')
+        lines.append('envoy_http_downstream_rq_total{envoy_http_conn_manager_prefix="inbound_0.0.0.0_15021"} 4410')
+        lines.append("# TYPE envoy_http_downstream_rq_xx counter")
+        for code_class, count in (("2", requests_total - errors), ("4", 0), ("5", errors)):
+            lines.append(
+                f'envoy_http_downstream_rq_xx{{envoy_response_code_class="{code_class}",'
+                f'envoy_http_conn_manager_prefix="outbound_0.0.0.0_8080"}} {count}'
+            )
+        lines.append('envoy_http_downstream_rq_xx{envoy_response_code_class="5",envoy_http_conn_manager_prefix="admin"} 3')
+        lines.append("# TYPE envoy_http_downstream_cx_active gauge")
+        lines.append(f'envoy_http_downstream_cx_active{{envoy_http_conn_manager_prefix="outbound_0.0.0.0_8080"}} {connections}')
+        lines.append('envoy_http_downstream_cx_active{envoy_http_conn_manager_prefix="prometheus_stats"} 1')
+        lines.append("# TYPE envoy_server_uptime gauge")
+        lines.append(f"envoy_server_uptime {int(time.monotonic() - self.started)}")
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+class FakeEnvoyHandler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+    stats = None
+
+    def log_message(self, format, *args):
+
+        # Keep the request log quiet.
+        return
+
+    def do_GET(self):
+
+        # /<namespace>/<pod>/stats/prometheus
+        parts = self.path.split("?", 1)[0].strip("/").split("/")
+        if len(parts) != 4 or parts[2:] != ["stats", "prometheus"]:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        payload = self.stats.render(parts[1])
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def start_server(stats, port=0):
+
+    # Start the server on a background thread and return (server, stats URL template).
+    handler = type("BoundFakeEnvoyHandler", (FakeEnvoyHandler,), {"stats": stats})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/{{namespace}}/{{pod}}/stats/prometheus"
+
+
+def main():
+
+    logger.info(
+        "============================   Starting Script Execution.  ============================"
+    )
+    logger.newline()
+
+    stats = FakeEnvoyStats(
+        args.smcp_rps, args.injected_rps, args.smcp_connections, args.injected_connections, args.error_ratio,
+        args.drain_after, args.stats_format,
+    )
+    server, url = start_server(stats, args.port)
+
+    logger.info(f"Fake Envoy stats listening on {url.split('/{', 1)[0]}")
+    logger.info(f" - export SMESH_ENVOY_STATS_URL='{url}'")
+    logger.newline()
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+    logger.newline()
+    logger.info(
+        "============================   Script Execution Completed.   ============================"
+    )
+
+
+if __name__ == "__main__":
+    os.makedirs("./logs", exist_ok=True)
+
+    # Set global logger
+    logger = create_logger("fake_envoy_stats")
+
+    parser = argparse.ArgumentParser("fake_envoy_stats")
+    parser.add_argument("--port", type=int, default=19090, help="Port to listen on.")
+    parser.add_argument("--smcp-rps", type=float, default=0.0, help="Requests per second of every SMCP gateway pod.")
+    parser.add_argument("--injected-rps", type=float, default=50.0, help="Requests per second of every injected gateway pod.")
+    parser.add_argument("--smcp-connections", type=int, default=0, help="Active connections of every SMCP gateway pod.")
+    parser.add_argument("--injected-connections", type=int, default=20, help="Active connections of every injected gateway pod.")
+    parser.add_argument("--error-ratio", type=float, default=0.0, help="Share of the requests answered with a 5xx.")
+    parser.add_argument("--drain-after", type=float, help="Seconds after which the SMCP gateway pods stop serving.")
+    parser.add_argument(
+        "--stats-format",
+        choices=STATS_FORMATS,
+        default="envoy",
+        help="Traffic stats served: Envoy downstream stats, Istio standard metrics or none (default: envoy).",
+    )
+
+    args = parser.parse_args()
+
+    main()
@@ -0,0 +1,268 @@
+"""
+Filename      : run_benchmarks.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : Runs every implementation script end to end against the local fake API server, for synthetic
+                clusters of 10, 100, 1000 and 5000 gateways by default. Records the wall time, exit code and API calls
+                of every script, prints a summary table and saves the results as JSON. check_stand_ins.py runs first,
+                checking the shared helpers against the local stand-ins of the gateways.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import yaml
+
+# Shared helpers live alongside the implementation scripts.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "implementation_scripts"))
+
+from common.logging_setup import create_logger
+from fake_api_server import FakeCluster, start_server
+from synthetic_cluster import build_cluster, build_values
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.join(BENCHMARK_DIR, "..", "implementation_scripts")
+
+# Token the oc shim prints for 'oc whoami -t', the fake API server accepts any token.
+BENCH_TOKEN = "sha256~benchmark-token"
+
+# Same folders setup_script.py creates in the cluster directory.
+FOLDER_LIST = [
+    "logs",
+    "backups/quota",
+    "backups/service",
+    "backups/namespace",
+    "backups/service_account",
+    "backups/role",
+    "backups/role_binding",
+    "backups/values",
+]
+
+# Change ID the silences of a run are created, expired and deleted under.
+BENCH_CHANGE_ID = "benchmark"
+
+# Implementation steps in the order of the change, with the arguments they are run with.
+STEPS = [
+    ("01.silence.py", ["--action", "create", "--change-id", BENCH_CHANGE_ID]),
+    ("02.backup_smcp_resources.py", []),
+    ("03.increase_quotas.py", ["--execute", "--values", "values.yaml"]),
+    ("04.remove_labels.py", []),
+    ("05.apply_helm_adoption.py", []),
+    ("06.extract_namespaces.py", []),
+    ("07.enable_injected_gateway.py", ["input_namespace.yaml", "values.yaml"]),
+    ("08.check_service_endpoints.py", ["--change-id", BENCH_CHANGE_ID]),
+    ("09.scale_down_smcp_gateway.py", ["--execute"]),
+    ("10.disable_smcp_gateway.py", ["--execute"]),
+    ("11.revert_back_quotas.py", []),
+    ("12.update_cluster_values.py", ["input_namespace.yaml", "values.yaml"]),
+    ("01.silence.py", ["--action", "delete", "--change-id", BENCH_CHANGE_ID]),
+]
+
+
+def prepare_workdir(size):
+
+    # Cluster directory with the folders the scripts expect and the cluster values file.
+    workdir = tempfile.mkdtemp(prefix=f"smesh-bench-{size}-", dir=args.workdir)
+    for folder in FOLDER_LIST:
+        os.makedirs(os.path.join(workdir, folder), exist_ok=True)
+    with open(os.path.join(workdir, "values.yaml"), "w") as file:
+        yaml.safe_dump(build_values(size), file, default_flow_style=False, sort_keys=False)
+    return workdir
+
+
+def run_step(script, script_args, workdir, env):
+
+    # Run one script and return its exit code and wall time.
+    with open(os.path.join(workdir, "logs", f"{script}.stdout"), "a") as stdout:
+        start = time.perf_counter()
+        try:
+            output = subprocess.run(
+                [sys.executable, os.path.join(SCRIPTS_DIR, script)] + script_args,
+                cwd=workdir,
+                env=env,
+                stdout=stdout,
+                stderr=subprocess.STDOUT,
+                timeout=args.timeout,
+            )
+            exit_code = output.returncode
+        except subprocess.TimeoutExpired:
+            logger.error(f"Script '{script}' timed out after {args.timeout} seconds.")
+            exit_code = None
+    return exit_code, round(time.perf_counter() - start, 3)
+
+
+def run_size(size):
+
+    # Seed a fresh fake cluster with the given number of gateways and run every step against it.
+    cluster = FakeCluster(args.latency_ms, args.jitter_ms, args.throttle_rate, args.retry_after)
+    server, url = start_server(cluster)
+    cluster.load(build_cluster(size, url.split("://", 1)[1]))
+    workdir = prepare_workdir(size)
+
+    env = dict(os.environ)
+    env["PATH"] = os.path.join(BENCHMARK_DIR, "bin") + os.pathsep + env.get("PATH", "")
+    env["FAKE_API_URL"] = url
+    env["KUBERNETES_HOST"] = url
+    env["KUBERNETES_TOKEN"] = BENCH_TOKEN
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+
+    logger.info(f"Running {len(STEPS)} steps against {size} gateways ({url}, workdir '{workdir}')")
+
+    results = []
+    for script, script_args in STEPS:
+        if args.scripts and not any(script.startswith(prefix) for prefix in args.scripts):
+            continue
+
+        cluster.reset()
+        exit_code, wall_s = run_step(script, script_args, workdir, env)
+        calls = cluster.stats()
+        result = {
+            "gateways": size,
+            "script": script,
+            "args": script_args,
+            "exit_code": exit_code,
+            "wall_s": wall_s,
+            "api_calls": calls.get("total", 0),
+            "python_calls": calls.get("client:python", 0),
+            "oc_calls": calls.get("client:oc", 0),
+            "throttled": sum(count for key, count in calls.items() if key.endswith(" throttled")),
+            "calls": calls,
+        }
+        results.append(result)
+        logger.event(
+            "Benchmark", None, script, "run_step", "success" if exit_code == 0 else "failed",
+            exit_code, round(wall_s * 1000, 3), gateways=size, api_calls=result["api_calls"],
+        )
+
+    server.shutdown()
+    server.server_close()
+    if args.keep_workdir:
+        logger.info(f"Logs and backups of the run kept in '{workdir}'")
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return results
+
+
+def run_checks():
+
+    # Run check_stand_ins.py and return its exit code, its output goes to the log of the benchmark.
+    logger.info("Checking the shared helpers against the local stand-ins")
+    output = subprocess.run(
+        [sys.executable, os.path.join(BENCHMARK_DIR, "check_stand_ins.py")],
+        cwd=args.workdir or ".",
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        timeout=args.timeout,
+    )
+    for line in output.stdout.splitlines():
+        if " - " in line and ("PASS" in line or "FAIL" in line):
+            logger.info(line.split(" : ", 1)[-1])
+    if output.returncode:
+        logger.error(f"Stand-in checks failed with exit code {output.returncode}.")
+    return output.returncode
+
+
+def print_results(results):
+
+    # Summary table of the runs.
+    logger.newline()
+    logger.info(
+        f" {'SCRIPT':<34} {'GATEWAYS':>8} {'EXIT':>5} {'WALL s':>9} {'API CALLS':>10} {'OC CALLS':>9} {'429s':>6}"
+    )
+    for result in results:
+        name = f"{result['script']} {' '.join(result['args'])}".strip()
+        exit_code = "T/O" if result["exit_code"] is None else result["exit_code"]
+        logger.info(
+            f" {name[:34]:<34} {result['gateways']:>8} {exit_code:>5} {result['wall_s']:>9.3f} {result['api_calls']:>10} {result['oc_calls']:>9} {result['throttled']:>6}"
+        )
+
+    logger.newline()
+    for size in sorted({result["gateways"] for result in results}):
+        total = sum(result["wall_s"] for result in results if result["gateways"] == size)
+        calls = sum(result["api_calls"] for result in results if result["gateways"] == size)
+        logger.info(f"Total for {size} gateways: {total:.3f} seconds, {calls} API calls.")
+
+
+def main():
+
+    logger.info(
+        "============================   Starting Script Execution.  ============================"
+    )
+    logger.newline()
+
+    checks_exit_code = None if args.skip_checks else run_checks()
+    logger.newline()
+
+    results = []
+    for size in args.sizes:
+        results.extend(run_size(size))
+        logger.newline()
+
+    print_results(results)
+
+    output_file = args.output or f"./logs/{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_benchmarks.json"
+    with open(output_file, "w") as file:
+        json.dump(
+            {
+                "latency_ms": args.latency_ms,
+                "jitter_ms": args.jitter_ms,
+                "throttle_rate": args.throttle_rate,
+                "stand_in_checks": checks_exit_code,
+                "results": results,
+            },
+            file,
+            indent=2,
+        )
+    logger.newline()
+    logger.info(f"Benchmark results saved to '{output_file}'")
+
+    logger.newline()
+    logger.info(
+        "============================   Script Execution Completed.   ============================"
+    )
+    if checks_exit_code:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    os.makedirs("./logs", exist_ok=True)
+
+    # Set global logger
+    logger = create_logger("run_benchmarks")
+
+    parser = argparse.ArgumentParser("run_benchmarks")
+    parser.add_argument(
+        "--sizes",
+        type=lambda value: [int(size) for size in value.split(",")],
+        default=[10, 100, 1000, 5000],
+        help="Comma separated numbers of gateways to synthesize.",
+    )
+    parser.add_argument(
+        "--scripts",
+        type=lambda value: value.split(","),
+        default=None,
+        help="Comma separated script prefixes to run, e.g. 02,08. All the steps run by default.",
+    )
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latency added to every API call.")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Random extra latency added to every API call.")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of API calls answered with 429.")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with the 429 answers.")
+    parser.add_argument("--timeout", type=int, default=3600, help="Seconds after which a script is stopped.")
+    parser.add_argument("--workdir", default=None, help="Directory the cluster directories are created in.")
+    parser.add_argument("--keep-workdir", action="store_true", help="Keep the logs and backups of the runs.")
+    parser.add_argument("--skip-checks", action="store_true", help="Do not run check_stand_ins.py first.")
+    parser.add_argument("--output", default=None, help="Results file, ./logs/<timestamp>_benchmarks.json by default.")
+
+    args = parser.parse_args()
+
+    main()
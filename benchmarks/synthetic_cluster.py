@@ -0,0 +1,309 @@
+"""
+Filename      : synthetic_cluster.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : Builds a synthetic service mesh cluster with a configurable number of SMCP gateways: the SMCP and
+                SMMR, member namespaces with their quota, and the service, service account, role, role binding,
+                deployments, pods and endpoints of every gateway. Also builds the matching cluster values file.
+"""
+
+SMCP_NAME = "app-mesh-01"
+SMMR_NAME = "default"
+CONTROL_PLANE_NAMESPACE = "istio-system"
+MONITORING_NAMESPACE = "openshift-monitoring"
+NAMESPACE_PREFIX = "lbg-ns"
+
+INGRESS_REPLICAS = 2
+EGRESS_REPLICAS = 1
+
+# Resources of every gateway pod in the cluster values file.
+GATEWAY_REQUESTS = {"cpu": "500m", "memory": "512Mi"}
+GATEWAY_LIMITS = {"cpu": "1", "memory": "1Gi"}
+
+# status.used of the namespace quotas, hard is 4 / 8 cores and 8Gi / 16Gi.
+QUOTA_USED = {"requests.cpu": "1", "limits.cpu": "2", "requests.memory": "2Gi", "limits.memory": "4Gi", "pods": "6"}
+NEARLY_FULL_QUOTA_USED = {
+    "requests.cpu": "3500m",
+    "limits.cpu": "7",
+    "requests.memory": "7Gi",
+    "limits.memory": "15Gi",
+    "pods": "12",
+}
+
+SMCP_LABELS = {
+    "app.kubernetes.io/component": "gateway",
+    "app.kubernetes.io/instance": CONTROL_PLANE_NAMESPACE,
+    "app.kubernetes.io/managed-by": "maistra-istio-operator",
+    "app.kubernetes.io/name": "gateway",
+    "app.kubernetes.io/part-of": "istio",
+    "app.kubernetes.io/version": "2.6.0",
+    "istio.io/rev": "app-mesh-01",
+    "maistra-version": "2.6.0",
+    "maistra.io/owner": CONTROL_PLANE_NAMESPACE,
+    "maistra.io/owner-name": SMCP_NAME,
+    "release": "istio",
+}
+
+
+def gateway_id(component_type, index):
+
+    # Gateway ids follow the ig<id>/eg<id> naming of the chart.
+    return f"{'ig' if component_type == 'ingress' else 'eg'}{index:03d}"
+
+
+def namespace_name(index):
+
+    # Name of the member namespace holding the gateways of the given index.
+    return f"{NAMESPACE_PREFIX}-{index}"
+
+
+def metadata(name, namespace=None, labels=None):
+
+    # Object metadata with optional namespace and labels.
+    meta = {"name": name, "labels": dict(labels or {}), "annotations": {}}
+    if namespace:
+        meta["namespace"] = namespace
+    return meta
+
+
+def gateway_plan(gateways):
+
+    # Spread the gateways over namespaces, one ingress and one egress gateway per namespace.
+    plan = []
+    for index in range(gateways):
+        component_type = "ingress" if index % 2 == 0 else "egress"
+        plan.append(
+            {
+                "component_type": component_type,
+                "gateway_id": gateway_id(component_type, index // 2),
+                "namespace": namespace_name(index // 2),
+                "replicas": INGRESS_REPLICAS if component_type == "ingress" else EGRESS_REPLICAS,
+            }
+        )
+    return plan
+
+
+def pod(name, namespace, labels, ip):
+
+    # Running and ready pod with an IP.
+    return {
+        "apiVersion": "v1",
+        "kind": "Pod",
+        "metadata": metadata(name, namespace, labels),
+        "spec": {"containers": [{"name": "istio-proxy", "image": "proxyv2"}]},
+        "status": {
+            "phase": "Running",
+            "podIP": ip,
+            "conditions": [{"type": "Ready", "status": "True"}],
+        },
+    }
+
+
+def deployment(name, namespace, labels, replicas):
+
+    # Deployment with its status matching the requested replicas.
+    return {
+        "apiVersion": "apps/v1",
+        "kind": "Deployment",
+        "metadata": metadata(name, namespace, labels),
+        "spec": {
+            "replicas": replicas,
+            "selector": {"matchLabels": dict(labels)},
+            "template": {
+                "metadata": {"labels": dict(labels)},
+                "spec": {"containers": [{"name": "istio-proxy", "image": "proxyv2"}]},
+            },
+        },
+        "status": {
+            "replicas": replicas,
+            "readyReplicas": replicas,
+            "availableReplicas": replicas,
+        },
+    }
+
+
+def gateway_objects(gateway, ip_counter):
+
+    # Every object the SMCP and the injected gateway chart create for one gateway.
+    gid = gateway["gateway_id"]
+    namespace = gateway["namespace"]
+    replicas = gateway["replicas"]
+    labels = dict(SMCP_LABELS, app=gid, istio=gid)
+    injected_labels = {"app": gid, "type": "injectedgateway"}
+
+    objects = {
+        "services": [
+            {
+                "apiVersion": "v1",
+                "kind": "Service",
+                "metadata": metadata(gid, namespace, labels),
+                "spec": {
+                    "selector": {"app": gid},
+                    "ports": [{"name": "http2", "port": 80, "targetPort": 8080, "protocol": "TCP"}],
+                    "type": "ClusterIP",
+                },
+            }
+        ],
+        "serviceaccounts": [
+            {"apiVersion": "v1", "kind": "ServiceAccount", "metadata": metadata(f"{gid}-service-account", namespace, labels)}
+        ],
+        "roles": [
+            {
+                "apiVersion": "rbac.authorization.k8s.io/v1",
+                "kind": "Role",
+                "metadata": metadata(f"{gid}-sds", namespace, labels),
+                "rules": [{"apiGroups": [""], "resources": ["secrets"], "verbs": ["get", "watch", "list"]}],
+            }
+        ],
+        "rolebindings": [
+            {
+                "apiVersion": "rbac.authorization.k8s.io/v1",
+                "kind": "RoleBinding",
+                "metadata": metadata(f"{gid}-sds", namespace, labels),
+                "roleRef": {"apiGroup": "rbac.authorization.k8s.io", "kind": "Role", "name": f"{gid}-sds"},
+                "subjects": [{"kind": "ServiceAccount", "name": f"{gid}-service-account"}],
+            }
+        ],
+        "deployments": [
+            deployment(gid, namespace, labels, replicas),
+            deployment(f"{gid}-gateway", namespace, injected_labels, replicas),
+        ],
+        "pods": [],
+        "endpoints": [],
+    }
+
+    addresses = []
+    for prefix, pod_labels in [(gid, labels), (f"{gid}-gateway", injected_labels)]:
+        for replica in range(replicas):
+            ip_counter[0] += 1
+            ip = f"10.{(ip_counter[0] >> 16) & 255}.{(ip_counter[0] >> 8) & 255}.{ip_counter[0] & 255}"
+            objects["pods"].append(pod(f"{prefix}-{replica:05d}", namespace, pod_labels, ip))
+            addresses.append({"ip": ip, "targetRef": {"kind": "Pod", "name": f"{prefix}-{replica:05d}"}})
+
+    objects["endpoints"].append(
+        {
+            "apiVersion": "v1",
+            "kind": "Endpoints",
+            "metadata": metadata(gid, namespace, labels),
+            "subsets": [{"addresses": addresses, "ports": [{"name": "http2", "port": 8080}]}] if addresses else [],
+        }
+    )
+    return objects
+
+
+def build_cluster(gateways, alert_host):
+
+    # Return plural -> list of objects for a cluster with the given number of gateways.
+    plan = gateway_plan(gateways)
+    namespaces = sorted({gateway["namespace"] for gateway in plan}, key=lambda ns: int(ns.rsplit("-", 1)[1]))
+    cluster = {
+        "namespaces": [],
+        "resourcequotas": [],
+        "services": [],
+        "serviceaccounts": [],
+        "roles": [],
+        "rolebindings": [],
+        "deployments": [],
+        "pods": [],
+        "endpoints": [],
+        "secrets": [],
+        "servicemeshcontrolplanes": [],
+        "servicemeshmemberrolls": [],
+        "routes": [],
+        "horizontalpodautoscalers": [],
+    }
+
+    for namespace in [CONTROL_PLANE_NAMESPACE, MONITORING_NAMESPACE]:
+        cluster["namespaces"].append({"apiVersion": "v1", "kind": "Namespace", "metadata": metadata(namespace)})
+
+    for index, namespace in enumerate(namespaces):
+        cluster["namespaces"].append(
+            {
+                "apiVersion": "v1",
+                "kind": "Namespace",
+                "metadata": metadata(namespace, labels={"maistra.io/member-of": CONTROL_PLANE_NAMESPACE}),
+                "status": {"phase": "Active"},
+            }
+        )
+        hard = {
+            "requests.cpu": "4",
+            "limits.cpu": "8",
+            "requests.memory": "8Gi",
+            "limits.memory": "16Gi",
+            "pods": "50",
+        }
+        cluster["resourcequotas"].append(
+            {
+                "apiVersion": "v1",
+                "kind": "ResourceQuota",
+                "metadata": metadata(f"{namespace}-quota", namespace),
+                "spec": {"hard": dict(hard)},
+                "status": {
+                    "hard": dict(hard),
+                    # Every third namespace is nearly full, its quota blocks the injected gateway pods.
+                    "used": NEARLY_FULL_QUOTA_USED if index % 3 == 0 else QUOTA_USED,
+                },
+            }
+        )
+
+    ip_counter = [0]
+    smcp_gateways = {"additionalIngress": {}, "additionalEgress": {}}
+    for gateway in plan:
+        for plural, items in gateway_objects(gateway, ip_counter).items():
+            cluster[plural].extend(items)
+        gateway_type = "additionalIngress" if gateway["component_type"] == "ingress" else "additionalEgress"
+        smcp_gateways[gateway_type][gateway["gateway_id"]] = {
+            "enabled": True,
+            "namespace": gateway["namespace"],
+            "runtime": {"deployment": {"replicas": gateway["replicas"]}},
+            "service": {"type": "ClusterIP"},
+        }
+
+    cluster["servicemeshcontrolplanes"].append(
+        {
+            "apiVersion": "maistra.io/v2",
+            "kind": "ServiceMeshControlPlane",
+            "metadata": metadata(SMCP_NAME, CONTROL_PLANE_NAMESPACE),
+            "spec": {"version": "v2.6", "gateways": smcp_gateways},
+            "status": {"conditions": [{"type": "Ready", "status": "True"}]},
+        }
+    )
+    cluster["servicemeshmemberrolls"].append(
+        {
+            "apiVersion": "maistra.io/v1",
+            "kind": "ServiceMeshMemberRoll",
+            "metadata": metadata(SMMR_NAME, CONTROL_PLANE_NAMESPACE),
+            "spec": {"members": list(namespaces)},
+            "status": {"configuredMembers": list(namespaces)},
+        }
+    )
+    cluster["routes"].append(
+        {
+            "apiVersion": "route.openshift.io/v1",
+            "kind": "Route",
+            "metadata": metadata("alertmanager-main", MONITORING_NAMESPACE),
+            "spec": {"host": alert_host, "to": {"kind": "Service", "name": "alertmanager-main"}},
+        }
+    )
+
+    return cluster
+
+
+def build_values(gateways):
+
+    # Cluster values file matching the synthetic cluster, with the injected gateways still disabled.
+    projects = {}
+    for gateway in gateway_plan(gateways):
+        project = projects.setdefault(gateway["namespace"], {"namespace": gateway["namespace"]})
+        component_type = gateway["component_type"]
+        project[component_type] = {
+            "enabled": True,
+            "id": gateway["gateway_id"][2:],
+            f"injected_{component_type}": False,
+            "create_service": True,
+            "replicas": gateway["replicas"],
+            "requests": dict(GATEWAY_REQUESTS),
+            "limits": dict(GATEWAY_LIMITS),
+        }
+    return {"cluster": "synthetic", "project": list(projects.values())}
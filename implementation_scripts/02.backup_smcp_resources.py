@@ -8,87 +8,62 @@ Description   : This script will take a backup of the resource quota, namespace,
                 The backups will be saved in the ./backups directory.
 """
 
-import logging
+import argparse
 import os
-import subprocess
 import sys
-import types
-from datetime import datetime
+import time
 
+import kubernetes.client.rest
 import yaml
+from common.cluster_api import create_api_client, whoami
+from common.event_log import elapsed_ms
+from common.logging_setup import create_logger
+from common.instrumentation import span
+from common.scope import build_scope, in_gateway_scope, list_in_scope, mesh_namespaces
 
 
+def list_resources(kind, resource, label_selector=None):
 
-def log_newline(self, how_many_lines=1):
-
-    # Switch formatter, output a blank line
-    self.handler.setFormatter(self.blank_formatter)
-
-    for i in range(how_many_lines):
-        self.info("")
-
-    # Switch back
-    self.handler.setFormatter(self.formatter)
-
-
-def create_logger():
+    # List the resources of the scope namespaces only, one request per namespace run concurrently.
+    start = time.monotonic()
+    try:
+        resource_list = list_in_scope(api_client, resource, scope, label_selector=label_selector)
+    except kubernetes.client.rest.ApiException as e:
+        logger.event(kind, None, None, "list", "failed", e.status, elapsed_ms(start))
+        logger.error(f"Error listing '{resource}' resources")
+        logger.error("Error details: ")
+        logger.error(f" - Reason: {e.reason}")
+        logger.error(f" - Status: {e.status}")
+        logger.error(f" - Message: {e.body}")
+        return {"items": []}
 
-    # Create a handler
-    sh = logging.StreamHandler(sys.stdout)
-    handler = logging.FileHandler(
-        f"./logs/{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_backup_quota_and_service.log",
-        mode="w",
-        encoding="utf-8",
+    logger.event(
+        kind, None, None, "list", "success", 200, elapsed_ms(start),
+        items=len(resource_list["items"]), namespaces=len(scope["namespaces"]),
     )
-    handler.setLevel(logging.DEBUG)
-    formatter = logging.Formatter(
-        fmt="[%(asctime)s] %(levelname)8s : %(message)s",
-        datefmt="%a, %d %b %Y %H:%M:%S",
-    )
-    blank_formatter = logging.Formatter(fmt="")
-    handler.setFormatter(formatter)
-
-    # Create a logger, with the previously-defined handler
-    logger = logging.getLogger("logging_test")
-    logger.setLevel(logging.DEBUG)
-    logger.addHandler(handler)
-    sh.setFormatter(formatter)
-    logger.addHandler(sh)
-
-    # Save some data and add a method to logger object
-
-    logger.handler = handler
-    logger.formatter = formatter
-    logger.blank_formatter = blank_formatter
-    logger.newline = types.MethodType(log_newline, logger)
-
-    return logger
+    return resource_list
 
 
 def take_role_binding_backup():
     
     logger.newline()
     
-    output = subprocess.run(
-        ["oc", "get", "rolebinding", "-A", "-l", "app.kubernetes.io/managed-by=maistra-istio-operator", "-o", "yaml"],
-        capture_output=True,
-        text=True,
-    )
-
-    role_binding_list = yaml.safe_load(output.stdout)
+    role_binding_list = list_resources("RoleBinding", "rolebinding", "app.kubernetes.io/managed-by=maistra-istio-operator")
 
     for role_binding in role_binding_list.get("items", []):
-        if role_binding['metadata']['namespace'].startswith('lbg') and role_binding['roleRef']['name'].startswith(('ig', 'eg')):
+        if in_gateway_scope(scope, role_binding['roleRef']['name']):
             # Save the role binding data to a file
             filepath = "./backups/role_binding"
             filename = f"{role_binding['metadata']['namespace']}_{role_binding['metadata']['name']}_backup.yaml"
             fullname = os.path.join(filepath, filename)
-            with open(fullname, "w") as file:
+            start = time.monotonic()
+            with span("file", f"write {filepath}"), open(fullname, "w") as file:
                 yaml.dump(role_binding, file)
 
             logger.info(
                 f"Role Binding backup for '{role_binding['metadata']['name']}' in namespace '{role_binding['metadata']['namespace']}' saved to '{fullname}'"
             )
+            logger.event("RoleBinding", role_binding['metadata']['namespace'], role_binding['metadata']['name'], "backup", "success", None, elapsed_ms(start), file=fullname)
 
     logger.newline()      
     logger.info(
@@ -100,27 +75,22 @@ def take_role_backup():
 
     logger.newline()
     
-    output = subprocess.run(
-        ["oc", "get", "role", "-A", "-l", "app.kubernetes.io/managed-by=maistra-istio-operator", "-o", "yaml"],
-        capture_output=True,
-        text=True,
-    )
-
-    role_list = yaml.safe_load(output.stdout)
+    role_list = list_resources("Role", "role", "app.kubernetes.io/managed-by=maistra-istio-operator")
 
     for role in role_list.get("items", []):
-        if role['metadata']['namespace'].startswith('lbg'):
-            # Save the role data to a file
-            filepath = "./backups/role"
-            filename = f"{role['metadata']['namespace']}_{role['metadata']['name']}_backup.yaml"
-            fullname = os.path.join(filepath, filename)
-            with open(fullname, "w") as file:
-                yaml.dump(role, file)
-
-            logger.info(
-                f"Role backup for '{role['metadata']['name']}' in namespace '{role['metadata']['namespace']}' saved to '{fullname}'"
-            )
-            
+        # Save the role data to a file
+        filepath = "./backups/role"
+        filename = f"{role['metadata']['namespace']}_{role['metadata']['name']}_backup.yaml"
+        fullname = os.path.join(filepath, filename)
+        start = time.monotonic()
+        with span("file", f"write {filepath}"), open(fullname, "w") as file:
+            yaml.dump(role, file)
+
+        logger.info(
+            f"Role backup for '{role['metadata']['name']}' in namespace '{role['metadata']['namespace']}' saved to '{fullname}'"
+        )
+        logger.event("Role", role['metadata']['namespace'], role['metadata']['name'], "backup", "success", None, elapsed_ms(start), file=fullname)
+        
     logger.newline()      
     logger.info(
         "====================================================================================="
@@ -131,27 +101,22 @@ def take_service_account_backup():
     
     logger.newline()
     
-    output = subprocess.run(
-        ["oc", "get", "sa", "-A", "-l", "app.kubernetes.io/managed-by=maistra-istio-operator", "-o", "yaml"],
-        capture_output=True,
-        text=True,
-    )
-
-    sa_list = yaml.safe_load(output.stdout)
+    sa_list = list_resources("ServiceAccount", "sa", "app.kubernetes.io/managed-by=maistra-istio-operator")
 
     for sa in sa_list.get("items", []):
-        if sa['metadata']['namespace'].startswith('lbg'):
-            # Save the service account data to a file
-            filepath = "./backups/service_account"
-            filename = f"{sa['metadata']['namespace']}_{sa['metadata']['name']}_backup.yaml"
-            fullname = os.path.join(filepath, filename)
-            with open(fullname, "w") as file:
-                yaml.dump(sa, file)
-
-            logger.info(
-                f"Service Account backup for '{sa['metadata']['name']}' in namespace '{sa['metadata']['namespace']}' saved to '{fullname}'"
-            )
-            
+        # Save the service account data to a file
+        filepath = "./backups/service_account"
+        filename = f"{sa['metadata']['namespace']}_{sa['metadata']['name']}_backup.yaml"
+        fullname = os.path.join(filepath, filename)
+        start = time.monotonic()
+        with span("file", f"write {filepath}"), open(fullname, "w") as file:
+            yaml.dump(sa, file)
+
+        logger.info(
+            f"Service Account backup for '{sa['metadata']['name']}' in namespace '{sa['metadata']['namespace']}' saved to '{fullname}'"
+        )
+        logger.event("ServiceAccount", sa['metadata']['namespace'], sa['metadata']['name'], "backup", "success", None, elapsed_ms(start), file=fullname)
+        
     logger.newline()      
     logger.info(
         "====================================================================================="
@@ -162,26 +127,21 @@ def take_service_backup():
     
     logger.newline()
 
-    output = subprocess.run(
-        ["oc", "get", "svc", "-A", "-l", "app.kubernetes.io/managed-by=maistra-istio-operator", "-o", "yaml"],
-        capture_output=True,
-        text=True,
-    )
-
-    service_list = yaml.safe_load(output.stdout)
+    service_list = list_resources("Service", "svc", "app.kubernetes.io/managed-by=maistra-istio-operator")
 
     for service in service_list.get("items", []):
-        if service['metadata']['namespace'].startswith('lbg'):
-            # Save the service data to a file
-            filepath = "./backups/service"
-            filename = f"{service['metadata']['namespace']}_{service['metadata']['name']}_backup.yaml"
-            fullname = os.path.join(filepath, filename)
-            with open(fullname, "w") as file:
-                yaml.dump(service, file)
-
-            logger.info(
-                f"Service backup for '{service['metadata']['name']}' in namespace '{service['metadata']['namespace']}' saved to '{fullname}'"
-            )
+        # Save the service data to a file
+        filepath = "./backups/service"
+        filename = f"{service['metadata']['namespace']}_{service['metadata']['name']}_backup.yaml"
+        fullname = os.path.join(filepath, filename)
+        start = time.monotonic()
+        with span("file", f"write {filepath}"), open(fullname, "w") as file:
+            yaml.dump(service, file)
+
+        logger.info(
+            f"Service backup for '{service['metadata']['name']}' in namespace '{service['metadata']['namespace']}' saved to '{fullname}'"
+        )
+        logger.event("Service", service['metadata']['namespace'], service['metadata']['name'], "backup", "success", None, elapsed_ms(start), file=fullname)
 
     logger.newline()      
     logger.info(
@@ -193,26 +153,21 @@ def take_namespace_backup():
     
     logger.newline()
     
-    output = subprocess.run(
-        ["oc", "get", "namespace", "-A", "-l", "maistra.io/member-of=istio-system", "-o", "yaml"],
-        capture_output=True,
-        text=True,
-    )
-
-    namespace_list = yaml.safe_load(output.stdout)
+    namespace_list = list_resources("Namespace", "namespace", "maistra.io/member-of=istio-system")
 
     for namespace in namespace_list.get("items", []):
-        if namespace['metadata']['name'].startswith('lbg'):
-            # Save the namespace data to a file
-            filepath = "./backups/namespace"
-            filename = f"{namespace['metadata']['name']}_namespace_backup.yaml"
-            fullname = os.path.join(filepath, filename)
-            with open(fullname, "w") as file:
-                yaml.dump(namespace, file)
-
-            logger.info(
-                f"Namespace backup for '{namespace['metadata']['name']}' saved to '{fullname}'"
-            )
+        # Save the namespace data to a file
+        filepath = "./backups/namespace"
+        filename = f"{namespace['metadata']['name']}_namespace_backup.yaml"
+        fullname = os.path.join(filepath, filename)
+        start = time.monotonic()
+        with span("file", f"write {filepath}"), open(fullname, "w") as file:
+            yaml.dump(namespace, file)
+
+        logger.info(
+            f"Namespace backup for '{namespace['metadata']['name']}' saved to '{fullname}'"
+        )
+        logger.event("Namespace", namespace['metadata']['name'], namespace['metadata']['name'], "backup", "success", None, elapsed_ms(start), file=fullname)
 
     logger.newline()      
     logger.info(
@@ -224,26 +179,21 @@ def take_quota_backup():
     
     logger.newline()
 
-    output = subprocess.run(
-        ["oc", "get", "resourcequota", "-A", "-o", "yaml"],
-        capture_output=True,
-        text=True,
-    )
-
-    quota_list = yaml.safe_load(output.stdout)
+    quota_list = list_resources("ResourceQuota", "resourcequota")
 
     for quota in quota_list.get("items", []):
-        if quota['metadata']['namespace'].startswith('lbg'):
-            # Save the quota data to a file
-            filepath = "./backups/quota"
-            filename = f"{quota['metadata']['namespace']}_quota_backup.yaml"
-            fullname = os.path.join(filepath, filename)
-            with open(fullname, "w") as file:
-                yaml.dump(quota, file)
-
-            logger.info(
-                f"Quota backup for '{quota['metadata']['name']}' in namespace '{quota['metadata']['namespace']}' saved to '{fullname}'"
-            )
+        # Save the quota data to a file
+        filepath = "./backups/quota"
+        filename = f"{quota['metadata']['namespace']}_quota_backup.yaml"
+        fullname = os.path.join(filepath, filename)
+        start = time.monotonic()
+        with span("file", f"write {filepath}"), open(fullname, "w") as file:
+            yaml.dump(quota, file)
+
+        logger.info(
+            f"Quota backup for '{quota['metadata']['name']}' in namespace '{quota['metadata']['namespace']}' saved to '{fullname}'"
+        )
+        logger.event("ResourceQuota", quota['metadata']['namespace'], quota['metadata']['name'], "backup", "success", None, elapsed_ms(start), file=fullname)
 
     logger.newline()      
     logger.info(
@@ -255,12 +205,7 @@ def check_login():
 
     # Check if the user is logged in to the OpenShift cluster.
     # If not, prompt the user to log in and exit the script.
-    try:
-        subprocess.check_output(
-            ["oc", "whoami"],
-            stderr=subprocess.STDOUT,
-        )
-    except subprocess.CalledProcessError:
+    if not whoami(api_client):
         logger.error("UNAUTHORIZED...!! Please login to the cluster and try again... !")
         sys.exit(1)
 
@@ -269,9 +214,14 @@ def main():
 
     check_login()
 
+    # Resolve the namespaces to back up once, every list below only asks the API server for these namespaces.
+    global scope
+    scope = build_scope(args.namespace or mesh_namespaces(api_client))
+
     logger.info(
         "============================   Starting Script Execution.  ============================"
     )
+    logger.info(f"Backing up the SMCP resources of {len(scope['namespaces'])} namespaces.")
 
     take_quota_backup()
     take_namespace_backup()
@@ -288,7 +238,18 @@ def main():
 if __name__ == "__main__":
     
     # Set global logger
-    logger = create_logger()
+    logger = create_logger("backup_quota_and_service")
+
+    parser = argparse.ArgumentParser("backup_smcp_resources")
+    parser.add_argument(
+        "--namespace",
+        action="append",
+        help="Only back up the given namespace. Can be repeated. Defaults to the 'lbg' members of the SMMR.",
+    )
+    args = parser.parse_args()
+
+    # Configure the Kubernetes client to connect to the OpenShift cluster.
+    api_client = create_api_client()
 
     # Run the main function
     main()
\ No newline at end of file
@@ -4,94 +4,42 @@ Author        : Aiyaz Khan
 Maintained by : Kyndryl Engineering
 Version       : 1.0
 Description   : This script will increase the resource quota memory and CPU by 1Gi and 1 Core respectively for the smesh namespace of the injected gateway.
+                With --values, the increase is planned from the gateway pods the chart renders from the cluster values
+                file, the LimitRanges and the quota usage instead, and only the namespaces that are short are patched.
 """
 
-import logging
 import os
-import subprocess
 import sys
-import types
-from datetime import datetime
+import time
 from urllib3.exceptions import InsecureRequestWarning
 import requests
 import argparse
 import operator
 
-import kubernetes.client.rest
 import yaml
-from kubernetes import client
-
-
-def log_newline(self, how_many_lines=1):
-
-    # Switch formatter, output a blank line
-    self.handler.setFormatter(self.blank_formatter)
-
-    for i in range(how_many_lines):
-        self.info("")
-
-    # Switch back
-    self.handler.setFormatter(self.formatter)
-
-
-def create_logger():
 
-    # Create a handler
-    sh = logging.StreamHandler(sys.stdout)
-    handler = logging.FileHandler(
-        f"./logs/{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_increase_quotas.log",
-        mode="w",
-        encoding="utf-8",
-    )
-    handler.setLevel(logging.DEBUG)
-    formatter = logging.Formatter(
-        fmt="[%(asctime)s] %(levelname)8s : %(message)s",
-        datefmt="%a, %d %b %Y %H:%M:%S",
-    )
-    blank_formatter = logging.Formatter(fmt="")
-    handler.setFormatter(formatter)
-
-    # Create a logger, with the previously-defined handler
-    logger = logging.getLogger("logging_test")
-    logger.setLevel(logging.DEBUG)
-    logger.addHandler(handler)
-    sh.setFormatter(formatter)
-    logger.addHandler(sh)
-
-    # Save some data and add a method to logger object
-
-    logger.handler = handler
-    logger.formatter = formatter
-    logger.blank_formatter = blank_formatter
-    logger.newline = types.MethodType(log_newline, logger)
-
-    return logger
+import kubernetes.client.rest
+from kubernetes import client
+from common.cluster_api import create_api_client, get_object, get_smmr, list_objects, whoami
+from common.dry_run import log_report, planned_change, rehearse
+from common.event_log import elapsed_ms
+from common.fast_read import QUOTA_FIELDS, read_view
+from common.instrumentation import span
+from common.logging_setup import create_logger
+from common.quota_planner import format_row, plan_quotas
 
 
 def display_current_values(namespace):
 
-    output = subprocess.run(
-        [
-            "oc",
-            "get",
-            "quota",
-            f"{namespace}-quota",
-            "-n",
-            namespace,
-            "-o",
-            "yaml",
-        ],
-        capture_output=True,
-        text=True,
-    )
-    if output.returncode != 0:
+    try:
+        quota = get_object(api_client, "quota", f"{namespace}-quota", namespace)
+    except kubernetes.client.rest.ApiException as e:
         logger.error(
-            f"Failed to retrieve current resource quota for namespace '{namespace}': {output.stderr}"
+            f"Failed to retrieve current resource quota for namespace '{namespace}': {e.body}"
         )
         return False
 
     logger.info("Resource quota AFTER UPDATE :")
-    quota = yaml.safe_load(output.stdout)
 
     requests_cpu = quota["status"]["hard"].get("requests.cpu")
     requests_memory = quota["status"]["hard"].get("requests.memory")
@@ -110,21 +58,23 @@ def patch_namespace_quota(namespace, resources):
     quota_name = f"{namespace}-quota"
 
     if dry_run:
-        # Simulate the patching action without executing it
-        output = subprocess.CompletedProcess(
-            args=[],
-            returncode=0,
-            stdout=f'oc patch quota {quota_name} -n {namespace} --type=merge -p \'{{"spec": {{"hard": {resources}}}}}\'',
-            stderr="",
+        # Plan the patch, it is validated by the API server with dryRun=All once every namespace is planned.
+        logger.info(f"DRY RUN: Resource quota '{quota_name}' in namespace '{namespace}' would be patched with '{resources}'")
+        logger.event("ResourceQuota", namespace, quota_name, "patch_quota", "dry_run", hard=resources)
+        planned_changes.append(
+            planned_change(
+                "ResourceQuota", namespace, quota_name, "patch_quota",
+                core_api.patch_namespaced_resource_quota, quota_name, namespace, {"spec": {"hard": {**resources}}},
+                _preload_content=False,
+            )
         )
-        # Log the dry run output
-        logger.info(f"DRY RUN Command: {output.stdout}")
     else:
         # Log the action of patching the resource quota
         logger.info(
             f"Patching resource quota for namespace '{namespace}' with '{resources}'"
         )
         # Patch the resource quota for the namespace
+        start = time.monotonic()
         try:
             requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
             core_api.patch_namespaced_resource_quota(
@@ -138,7 +88,13 @@ def patch_namespace_quota(namespace, resources):
                     }
                 },
             )
+            logger.event(
+                "ResourceQuota", namespace, quota_name, "patch_quota", "success", 200, elapsed_ms(start), hard=resources
+            )
         except kubernetes.client.rest.ApiException as e:
+            logger.event(
+                "ResourceQuota", namespace, quota_name, "patch_quota", "failed", e.status, elapsed_ms(start), hard=resources
+            )
             logger.error(
                 f"Error patching resource quota '{quota_name}' in namespace '{namespace}'"
             )
@@ -157,12 +113,7 @@ def calculate_namespace_resources(namespace):
 
     quota_name = f"{namespace}-quota"
     # Get the resource quota for the namespace.
-    output = subprocess.run(
-        ["oc", "get", "quota", quota_name, "-n", namespace, "-o", "yaml"],
-        capture_output=True,
-        text=True,
-    )
-    quota = yaml.safe_load(output.stdout)
+    quota = get_object(api_client, "quota", quota_name, namespace)
 
     requests_cpu = quota["status"]["hard"].get("requests.cpu")
     requests_cpu_unit = requests_cpu[-1:]
@@ -236,19 +187,88 @@ def calculate_namespace_resources(namespace):
     else:
         logger.newline()
         logger.warning("Resource quotas not defined in Gi or Core")
+        logger.event("ResourceQuota", namespace, quota_name, "patch_quota", "manual_intervention")
         logger.warning(
             f"Result: Fail for namespace '{namespace}'. Manual intervention required to update the quota."
         )
         logger.newline()
 
 
+def plan_quota_increase(members_list):
+
+    # Plan the exact quota increase of every SMMR member from the gateways of the cluster values file,
+    # with a single list call for all the quotas, and patch the namespaces whose quota would block the new pods.
+    with span("file", f"read {args.values}"), open(args.values, "r") as file:
+        cluster_values = yaml.safe_load(file.read().replace("\t", "  "))
+
+    # The LimitRanges default what the gateway pods leave unset, and a gateway that already runs only adds its new
+    # replicas and rollout surge, the same as quota_preflight.py predicts.
+    try:
+        quotas = list_objects(api_client, "quota")["items"]
+        limit_ranges = list_objects(api_client, "limitrange")["items"]
+        live_deployments = {
+            (item["metadata"]["namespace"], item["metadata"]["name"]): item
+            for item in list_objects(api_client, "deployment", label_selector="type=injectedgateway")["items"]
+        }
+    except kubernetes.client.rest.ApiException as e:
+        logger.error("Error listing the resource quotas, limit ranges and injected gateway deployments")
+        logger.error("Error details: ")
+        logger.error(f" - Reason: {e.reason}")
+        logger.error(f" - Status: {e.status}")
+        logger.error(f" - Message: {e.body}")
+        sys.exit(1)
+
+    plan = plan_quotas(quotas, cluster_values, members_list, limit_ranges, live_deployments)
+    planned = {row["namespace"] for row in plan}
+    for namespace in members_list:
+        if namespace not in planned:
+            logger.warning(f"Resource Quota '{namespace}-quota' not found in namespace '{namespace}'. Moving on !")
+
+    for row in plan:
+        namespace = row["namespace"]
+        logger.info(f"Resource quota '{row['quota']}' in namespace '{namespace}' :")
+        logger.info(f" - Hard               : {format_row(row, 'hard')}")
+        logger.info(f" - Used               : {format_row(row, 'used')}")
+        logger.info(f" - Gateway pods       : {format_row(row, 'demand')}")
+        if row["unset"]:
+            logger.warning(
+                f"The injected gateway pods in namespace '{namespace}' set no {', '.join(row['unset'])}, the quota "
+                f"rejects them whatever its hard values. Set them in the values file or a LimitRange."
+            )
+
+        if row["blocked"]:
+            logger.warning(
+                f"Quota would block the injected gateway pods in namespace '{namespace}', short by {format_row(row, 'shortfall')}"
+            )
+            logger.newline()
+            patch_namespace_quota(namespace, row["patch"])
+            logger.newline()
+            if not dry_run:
+                logger.info(f"Resource Quota for namespace '{namespace}' has been updated successfully.")
+                logger.newline()
+                display_current_values(namespace)
+        else:
+            logger.info(f"Quota has enough headroom for the injected gateway pods in namespace '{namespace}'. No update required.")
+            logger.event("ResourceQuota", namespace, row["quota"], "patch_quota", "no_change")
+            logger.newline()
+
+        logger.info(
+            "====================================================================================="
+        )
+        logger.newline()
+
+    blocked = [row["namespace"] for row in plan if row["blocked"]]
+    logger.info(f"{len(blocked)} of {len(plan)} namespaces needed a quota increase for the injected gateway pods.")
+    logger.newline()
+
+
 def check_quota(namespace):
 
     # Check if a resource quota exists in the namespace.
     try:
         requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
-        quota = core_api.read_namespaced_resource_quota(f"{namespace}-quota", namespace)
-        logger.info(f"Resource Quota '{quota.metadata.name}' exists in namespace '{namespace}'.")
+        quota = read_view(core_api.read_namespaced_resource_quota, QUOTA_FIELDS, f"{namespace}-quota", namespace)
+        logger.info(f"Resource Quota '{quota.name}' exists in namespace '{namespace}'.")
         return True
     except kubernetes.client.rest.ApiException as e:
         if e.status == 404:
@@ -286,12 +306,7 @@ def check_login():
 
     # Check if the user is logged in to the OpenShift cluster.
     # If not, prompt the user to log in and exit the script.
-    try:
-        subprocess.check_output(
-            ["oc", "whoami"],
-            stderr=subprocess.STDOUT,
-        )
-    except subprocess.CalledProcessError:
+    if not whoami(api_client):
         logger.error("UNAUTHORIZED...!! Please login to the cluster and try again... !")
         sys.exit(1)
 
@@ -301,20 +316,7 @@ def main():
     check_login()
 
     # Read SMMR configuration from the OpenShift cluster.
-    output = subprocess.run(
-        [
-            "oc",
-            "get",
-            "smmr",
-            "default",
-            "-n",
-            "istio-system",
-            "-o",
-            "yaml",
-        ],
-        capture_output=True,
-    )
-    smmr = yaml.safe_load(output.stdout)
+    smmr = get_smmr(api_client)
 
     logger.info(
         "============================   Starting Script Execution.  ============================"
@@ -323,27 +325,37 @@ def main():
 
     members_list = smmr["spec"]["members"]
 
-    for members in members_list:
-        # Check if namespace exists
-        if check_namespace(members):
-            # Check if quota exists in the namespace
-            if check_quota(members):
-                # Calculating namespace resources
-                calculate_namespace_resources(members)
+    if args.values:
+        plan_quota_increase(members_list)
+    else:
+        for members in members_list:
+            # Check if namespace exists
+            if check_namespace(members):
+                # Check if quota exists in the namespace
+                if check_quota(members):
+                    # Calculating namespace resources
+                    calculate_namespace_resources(members)
+
+                logger.info(
+                    "====================================================================================="
+                )
+                logger.newline()
 
-            logger.info(
-                "====================================================================================="
-            )
-            logger.newline()
+    # Validate every planned patch on the API server before the change window.
+    validated = True
+    if dry_run:
+        validated = log_report(rehearse(planned_changes))
 
     logger.info(
         "============================   Script Execution Completed.   ============================"
     )
+    if not validated:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
     # Set global logger
-    logger = create_logger()
+    logger = create_logger("increase_quotas")
 
     parser = argparse.ArgumentParser("increase_quotas")
     parser.add_argument(
@@ -356,14 +368,23 @@ if __name__ == "__main__":
         action="store_true",
         help="Run the script in execution mode and make changes.",
     )
+    parser.add_argument(
+        "--values",
+        default=None,
+        help="Cluster values file to plan the quota increase from the gateway replicas, requests and limits.",
+    )
 
-    if len(sys.argv) != 2:
-        logger.info("USAGE: python increase_quotas.py --dry-run (OR) --execute")
+    args = parser.parse_args()
+    if args.dry_run == args.execute:
+        logger.info("USAGE: python increase_quotas.py --dry-run (OR) --execute [--values <cluster values file>]")
         logger.error("Please provide the relevant input to run.")
         sys.exit(1)  # Exit with error status
+    if args.values and not os.path.isfile(args.values):
+        logger.error(f"Required input file {args.values} does not exist. Exiting.. !")
+        sys.exit(1)
 
-    args = parser.parse_args()
     dry_run = args.dry_run
+    planned_changes = []
 
     if dry_run:
         logger.info(
@@ -378,37 +399,7 @@ if __name__ == "__main__":
         logger.newline()
     
     # Configure the Kubernetes client to connect to the OpenShift cluster.
-    output = subprocess.run(
-        ["oc", "whoami", "-t"],
-        capture_output=True,
-        text=True,
-    )
-    if output.returncode != 0:
-        logger.error("Unable to set KUBERNETES_TOKEN environment variable. Exiting...")
-        sys.exit(1)  # Exit if the token is not set
-    else:
-        os.environ["KUBERNETES_TOKEN"] = output.stdout.strip()
-
-    # Configure the Kubernetes client
-    configuration = client.Configuration()
-    configuration.api_key_prefix = {"authorization": "Bearer"}
-    configuration.api_key = {
-        "authorization": os.environ.get("KUBERNETES_TOKEN", "")
-    }  # Ensure the token is set in the environment variable
-    if not configuration.api_key["authorization"]:
-        logger.error("KUBERNETES_TOKEN environment variable is not set. Exiting...")
-        sys.exit(1)  # Exit if the token is not set
-    configuration.host = os.environ.get(
-        "KUBERNETES_HOST", ""
-    )  # Ensure the host is set in the environment variable
-    if not configuration.host:
-        logger.error("KUBERNETES_HOST environment variable is not set. Exiting...")
-        sys.exit(1)  # Exit if the host is not set
-    configuration.verify_ssl = (
-        False  # Disable SSL verification for local testing; set to True in production
-    )
-
-    api_client = client.ApiClient(configuration)
+    api_client = create_api_client()
 
     global core_api, apps_api  # Declare core_api and apps_api as global variables to use them in other functions
     core_api = client.CoreV1Api(api_client)
@@ -6,71 +6,19 @@ Version       : 1.0
 Description   : This script reads the smmr and pulls out the namespaces configured.
 """
 
-import logging
-import subprocess
 import sys
-import types
-from datetime import datetime
 
 import yaml
-
-
-def log_newline(self, how_many_lines=1):
-
-    # Switch formatter, output a blank line
-    self.handler.setFormatter(self.blank_formatter)
-
-    for i in range(how_many_lines):
-        self.info("")
-
-    # Switch back
-    self.handler.setFormatter(self.formatter)
-
-
-def create_logger():
-
-    # Create a handler
-    sh = logging.StreamHandler(sys.stdout)
-    handler = logging.FileHandler(
-        f"./logs/{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_extract_namespaces.log",
-        mode="w",
-        encoding="utf-8",
-    )
-    handler.setLevel(logging.DEBUG)
-    formatter = logging.Formatter(
-        fmt="[%(asctime)s] %(levelname)8s : %(message)s",
-        datefmt="%a, %d %b %Y %H:%M:%S",
-    )
-    blank_formatter = logging.Formatter(fmt="")
-    handler.setFormatter(formatter)
-
-    # Create a logger, with the previously-defined handler
-    logger = logging.getLogger("logging_test")
-    logger.setLevel(logging.DEBUG)
-    logger.addHandler(handler)
-    sh.setFormatter(formatter)
-    logger.addHandler(sh)
-
-    # Save some data and add a method to logger object
-
-    logger.handler = handler
-    logger.formatter = formatter
-    logger.blank_formatter = blank_formatter
-    logger.newline = types.MethodType(log_newline, logger)
-
-    return logger
+from common.cluster_api import create_api_client, get_smmr, whoami
+from common.logging_setup import create_logger
+from common.instrumentation import span
 
 
 def check_login():
 
     # Check if the user is logged in to the OpenShift cluster.
     # If not, prompt the user to log in and exit the script.
-    try:
-        subprocess.check_output(
-            ["oc", "whoami"],
-            stderr=subprocess.STDOUT,
-        )
-    except subprocess.CalledProcessError:
+    if not whoami(api_client):
         logger.error("UNAUTHORIZED...!! Please login to the cluster and try again... !")
         sys.exit(1)
 
@@ -80,20 +28,7 @@ def main():
     check_login()
 
     # Read SMMR configuration from the OpenShift cluster.
-    output = subprocess.run(
-        [
-            "oc",
-            "get",
-            "smmr",
-            "default",
-            "-n",
-            "istio-system",
-            "-o",
-            "yaml",
-        ],
-        capture_output=True,
-    )
-    smmr = yaml.safe_load(output.stdout)
+    smmr = get_smmr(api_client)
 
     logger.info(
         "============================   Starting Script Execution.  ============================"
@@ -103,10 +38,11 @@ def main():
     logger.info("Extracting namespaces from SMMR configuration...")
     members_list = smmr["spec"]["members"]
 
-    with open("input_namespace.yaml", "w") as file:
+    with span("file", "write input_namespace.yaml"), open("input_namespace.yaml", "w") as file:
         yaml.dump(members_list, file)
 
     logger.info("Namespaces extracted and saved to input_namespace.yaml")
+    logger.event("ServiceMeshMemberRoll", "istio-system", "default", "extract_namespaces", "success", members=len(members_list))
 
     logger.newline()
     logger.info(
@@ -116,5 +52,9 @@ def main():
 
 if __name__ == "__main__":
     # Set global logger
-    logger = create_logger()
+    logger = create_logger("extract_namespaces")
+
+    # Configure the Kubernetes client to connect to the OpenShift cluster.
+    api_client = create_api_client()
+
     main()
\ No newline at end of file
@@ -6,68 +6,38 @@ Version       : 1.0
 Description   : This script will enable the injected gateway by updating the cluster values config file.
 """
 
-import logging
 import os
+import shutil
 import sys
-import types
 from datetime import datetime
 
 from ruamel.yaml import YAML
+from common.logging_setup import create_logger
+from common.instrumentation import span
 
 yaml = YAML()
 yaml.width = sys.maxsize  # Set width to max size to avoid line breaks in YAML output
 yaml.preserve_quotes = True  # Preserve quotes in YAML output
 
 
-def log_newline(self, how_many_lines=1):
-
-    # Switch formatter, output a blank line
-    self.handler.setFormatter(self.blank_formatter)
-
-    for i in range(how_many_lines):
-        self.info("")
-
-    # Switch back
-    self.handler.setFormatter(self.formatter)
+def update_config_file(cluster_values):
 
+    with span("file", "write cluster values"), open(file2, "w") as igw_file:
+        yaml.dump(cluster_values, igw_file)
 
-def create_logger():
+def backup_config_file(file_path):
 
-    # Create a handler
-    sh = logging.StreamHandler(sys.stdout)
-    handler = logging.FileHandler(
-        f"./logs/{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_enable_injected_gateway.log",
-        mode="w",
-        encoding="utf-8",
-    )
-    handler.setLevel(logging.DEBUG)
-    formatter = logging.Formatter(
-        fmt="[%(asctime)s] %(levelname)8s : %(message)s",
-        datefmt="%a, %d %b %Y %H:%M:%S",
+    # Keep a copy of the cluster values file as it was before the update, to diff against afterwards.
+    backup_dir = "./backups/values"
+    os.makedirs(backup_dir, exist_ok=True)
+    backup_file = os.path.join(
+        backup_dir,
+        f"{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_{os.path.basename(file_path)}",
     )
-    blank_formatter = logging.Formatter(fmt="")
-    handler.setFormatter(formatter)
-
-    # Create a logger, with the previously-defined handler
-    logger = logging.getLogger("logging_test")
-    logger.setLevel(logging.DEBUG)
-    logger.addHandler(handler)
-    sh.setFormatter(formatter)
-    logger.addHandler(sh)
-
-    # Save some data and add a method to logger object
-    logger.handler = handler
-    logger.formatter = formatter
-    logger.blank_formatter = blank_formatter
-    logger.newline = types.MethodType(log_newline, logger)
+    shutil.copy2(file_path, backup_file)
+    logger.info(f"Cluster values file backed up to '{backup_file}'")
 
-    return logger
-
-
-def update_config_file(cluster_values):
-
-    with open(file2, "w") as igw_file:
-        yaml.dump(cluster_values, igw_file)
+    return backup_file
 
 def sanitize_config_file(file_path, spaces_per_tab=2):
     
@@ -80,7 +50,7 @@ def sanitize_config_file(file_path, spaces_per_tab=2):
         corrected_lines = [line.replace('\t', ' ' * spaces_per_tab) for line in lines]
 
         # Write the corrected lines back to the file
-        with open(file_path, "w") as file:
+        with span("file", "write cluster values"), open(file_path, "w") as file:
             file.writelines(corrected_lines)
             
         logger.info(f"Sanitized config file {file_path} by replacing tabs with spaces.")
@@ -106,6 +76,9 @@ def main():
             logger.newline()
             sys.exit(1)
 
+    # Back up the cluster values file before updating
+    backup_file = backup_config_file(file2)
+
     # Sanitize the cluster values file before updating
     sanitize_config_file(file2)
     
@@ -140,11 +113,13 @@ def main():
                             cluster_values["project"][ns_index]["egress"][
                                 "injected_egress"
                             ] = True
+                            logger.event("ClusterValues", ns, "egress.injected_egress", "enable_injected_gateway", "updated", file=file2)
                     elif key == "ingress":
                         if cluster_values["project"][ns_index]["ingress"]["enabled"]:
                             cluster_values["project"][ns_index]["ingress"][
                                 "injected_ingress"
                             ] = True
+                            logger.event("ClusterValues", ns, "ingress.injected_ingress", "enable_injected_gateway", "updated", file=file2)
 
         update_config_file(cluster_values)
 
@@ -154,6 +129,9 @@ def main():
     logger.info(
         " - Review the updated cluster values files and perform a git operations (devops clusters) or"
     )
+    logger.info(
+        f" - run 'python diff_cluster_values.py {backup_file} {file2}' to list the namespaces and releases to upgrade"
+    )
     logger.info(" - run the ansible script to deploy injected gateway")
     logger.newline()
     logger.info(
@@ -163,7 +141,7 @@ def main():
 
 if __name__ == "__main__":
     # Set global logger
-    logger = create_logger()
+    logger = create_logger("enable_injected_gateway")
 
     # Check if two arguments are provided (not counting the script name)
     if len(sys.argv) != 3:
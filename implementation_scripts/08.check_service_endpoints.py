@@ -6,86 +6,60 @@ Version       : 1.0
 Description   : This scripts checks the service endpoints for injected gateways pods in an OpenShift cluster.
 """
 
-
-import logging
-import os
-import subprocess
+import argparse
 import sys
-import types
-from datetime import datetime
+import time
 from urllib3.exceptions import InsecureRequestWarning
 import requests
 
 import kubernetes.client.rest
-import yaml
 from kubernetes import client
 
-
-def log_newline(self, how_many_lines=1):
-
-    # Switch formatter, output a blank line
-    self.handler.setFormatter(self.blank_formatter)
-
-    for i in range(how_many_lines):
-        self.info("")
-
-    # Switch back
-    self.handler.setFormatter(self.formatter)
-
-
-def create_logger():
-
-    # Create a handler
-    sh = logging.StreamHandler(sys.stdout)
-    handler = logging.FileHandler(
-        f"./logs/{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_check_service_endpoints.log",
-        mode="w",
-        encoding="utf-8",
-    )
-    handler.setLevel(logging.DEBUG)
-    formatter = logging.Formatter(
-        fmt="[%(asctime)s] %(levelname)8s : %(message)s",
-        datefmt="%a, %d %b %Y %H:%M:%S",
-    )
-    blank_formatter = logging.Formatter(fmt="")
-    handler.setFormatter(formatter)
-
-    # Create a logger, with the previously-defined handler
-    logger = logging.getLogger("logging_test")
-    logger.setLevel(logging.DEBUG)
-    logger.addHandler(handler)
-    sh.setFormatter(formatter)
-    logger.addHandler(sh)
-
-    # Save some data and add a method to logger object
-
-    logger.handler = handler
-    logger.formatter = formatter
-    logger.blank_formatter = blank_formatter
-    logger.newline = types.MethodType(log_newline, logger)
-
-    return logger
+from common.cluster_api import create_api_client, get_smcp, whoami
+from common.gateway_manifest import (
+    build_manifest,
+    check_manifest_namespace,
+    check_manifest_object,
+    resolve_manifest,
+)
+from common.event_log import elapsed_ms
+from common.fast_read import POD_IP_FIELDS, REPLICA_FIELDS, list_views, read_raw, read_view
+from common.logging_setup import create_logger
+from common.silence_manager import (
+    connect_cluster,
+    create_session,
+    expire_silence,
+    initialize_store,
+    passed_scopes,
+    run_silences,
+)
 
 
 def get_pod_ip(label_selector, namespace):
 
     # Get the pod IPs based on the label selector in the specified namespace.
+    start = time.monotonic()
     try:
-        pods = core_api.list_namespaced_pod(namespace, label_selector=label_selector)
-        if not pods.items:
+        pods = list_views(core_api.list_namespaced_pod, POD_IP_FIELDS, namespace, label_selector=label_selector)
+        if not pods:
             logger.warning(
                 f"No pods found with label selector '{label_selector}' in namespace '{namespace}'."
             )
+            logger.event("Pod", namespace, None, "list_pods", "no_pods", 200, elapsed_ms(start), selector=label_selector)
             return False
 
         pod_ip = {}
-        for pod in pods.items:
-            if pod.status.pod_ip:
-                pod_ip[pod.metadata.name] = pod.status.pod_ip
+        for pod in pods:
+            if pod.pod_ip:
+                pod_ip[pod.name] = pod.pod_ip
 
+        logger.event(
+            "Pod", namespace, None, "list_pods", "success", 200, elapsed_ms(start), selector=label_selector, pods=len(pod_ip)
+        )
         return pod_ip
 
     except kubernetes.client.rest.ApiException as e:
+        logger.event("Pod", namespace, None, "list_pods", "failed", e.status, elapsed_ms(start), selector=label_selector)
         logger.error(
             f"Error checking pods with label selector '{label_selector}' in namespace '{namespace}': {e}"
         )
@@ -95,46 +69,58 @@ def get_pod_ip(label_selector, namespace):
 def check_service_endpoints(service_name, namespace, pod_ip):
 
     # Check if the service endpoints are available for the given service in the specified namespace.
+    # Returns True when every pod is a READY endpoint of the service.
+    start = time.monotonic()
     try:
-        endpoints = core_api.read_namespaced_endpoints(service_name, namespace)
+        endpoints = read_raw(core_api.read_namespaced_endpoints, service_name, namespace)
+        subsets = endpoints.get("subsets") or []
+        latency_ms = elapsed_ms(start)
 
-        if not endpoints.subsets:
+        if not subsets:
             logger.warning(
                 f"Service '{service_name}' in namespace '{namespace}' has no endpoints."
             )
+            logger.event("Endpoints", namespace, service_name, "check_endpoints", "no_endpoints", 200, latency_ms)
             return False
 
         # Check if any subset has addresses
-        if any(subset.addresses for subset in endpoints.subsets):
+        if any(subset.get("addresses") for subset in subsets):
             logger.info(
                 f"Service '{service_name}' in namespace '{namespace}' has endpoints."
             )
+            all_ready = True
             for k, v in pod_ip.items():
                 if v in [
-                    address.ip
-                    for subset in endpoints.subsets
-                    if subset.addresses
-                    for address in subset.addresses
+                    address["ip"]
+                    for subset in subsets
+                    for address in subset.get("addresses") or []
                 ]:
                     logger.info(
                         f"Pod '{k}' with IP '{v}' is listed in the service '{service_name}' as READY endpoint."
                     )
+                    logger.event("Endpoints", namespace, service_name, "check_endpoints", "ready", 200, latency_ms, pod=k)
                 # Check if any subset has not_ready_addresses
                 elif v in [
-                    address.ip
-                    for subset in endpoints.subsets
-                    if subset.not_ready_addresses
-                    for address in subset.not_ready_addresses
+                    address["ip"]
+                    for subset in subsets
+                    for address in subset.get("notReadyAddresses") or []
                 ]:
                     logger.warning(
                         f"Pod '{k}' with IP '{v}' is listed in the service '{service_name}' as NOT READY endpoint."
                     )
+                    logger.event("Endpoints", namespace, service_name, "check_endpoints", "not_ready", 200, latency_ms, pod=k)
+                    all_ready = False
                 else:
                     logger.warning(
                         f"Pod '{k}' with IP '{v}' is NOT listed in the service '{service_name}' as an endpoint."
                     )
+                    logger.event("Endpoints", namespace, service_name, "check_endpoints", "not_listed", 200, latency_ms, pod=k)
+                    all_ready = False
+            return all_ready
+        return False
 
     except kubernetes.client.rest.ApiException as e:
+        logger.event("Endpoints", namespace, service_name, "check_endpoints", "failed", e.status, elapsed_ms(start))
         logger.error(
             f"Error checking service '{service_name}' in namespace '{namespace}': {e}"
         )
@@ -144,13 +130,20 @@ def check_service_endpoints(service_name, namespace, pod_ip):
 def check_replicas_mismatch(namespace, deployment_name):
 
     # Check if the number of desired replicas matches the number of available replicas for a deployment.
+    start = time.monotonic()
     try:
-        deployment = apps_api.read_namespaced_deployment(deployment_name, namespace)
-        desired_replicas = deployment.spec.replicas
-        available_replicas = deployment.status.available_replicas
+        deployment = read_view(apps_api.read_namespaced_deployment, REPLICA_FIELDS, deployment_name, namespace)
+        desired_replicas = deployment.replicas
+        available_replicas = deployment.available_replicas
         if available_replicas is None:
             available_replicas = 0
 
+        logger.event(
+            "Deployment", namespace, deployment_name, "check_replicas",
+            "mismatch" if desired_replicas != available_replicas else "success", 200, elapsed_ms(start),
+            desired=desired_replicas, available=available_replicas,
+        )
+
         if desired_replicas != available_replicas:
             logger.warning(
                 f"Replica mismatch for deployment '{deployment_name}' in namespace '{namespace}': "
@@ -158,140 +151,96 @@ def check_replicas_mismatch(namespace, deployment_name):
             )
             return True
     except kubernetes.client.rest.ApiException as e:
+        logger.event("Deployment", namespace, deployment_name, "check_replicas", "failed", e.status, elapsed_ms(start))
         logger.error(
             f"Error checking replicas for deployment '{deployment_name}' in namespace '{namespace}': {e}"
         )
     return False
 
 
-def check_service_exists(namespace, service):
-
-    # Check if a service exists in the given namespace.
-    try:
-        service = core_api.read_namespaced_service(service, namespace)
-        logger.info(f"Service '{service.metadata.name}' exists in namespace '{namespace}'.")
-        return True
-    except kubernetes.client.rest.ApiException as e:
-        if e.status == 404:
-            logger.warning(f"Service '{service}' not found in namespace '{namespace}'. Moving on !")
-        else:
-            logger.error(f"Error checking service '{service}' in namespace '{namespace}'")
-            logger.error("Error details: ")
-            logger.error(f" - Reason: {e.reason}")
-            logger.error(f" - Status: {e.status}")
-            logger.error(f" - Message: {e.body}")
-        return False
-
-
-def check_namespace(namespace):
-
-    # Check if a namespace exists in the cluster.
-    try:
-        requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
-        namespace = core_api.read_namespace(namespace)
-        logger.info(f"Namespace '{namespace.metadata.name}' exists.")
-        return True
-    except kubernetes.client.rest.ApiException as e:
-        if e.status == 404:
-            logger.warning(f"Namespace '{namespace}' not found. Moving on !")
-        else:
-            logger.error(f"Error checking namespace '{namespace}'")
-            logger.error("Error details: ")
-            logger.error(f" - Reason: {e.reason}")
-            logger.error(f" - Status: {e.status}")
-            logger.error(f" - Message: {e.body}")
-        return False
-
-
-def check_deployment(namespace, gateway_id):
-
-    # Check if a deployment exists in a given namespace.
-    try:
-        deployment = apps_api.read_namespaced_deployment(gateway_id, namespace)
-        logger.info(f"Deployment '{deployment.metadata.name}' exists in namespace '{namespace}'.")
-        return True
-    except kubernetes.client.rest.ApiException as e:
-        if e.status == 404:
-            logger.warning(f"Deployment '{gateway_id}' not found in namespace '{namespace}'. Moving on !")
-        else:
-            logger.error(f"Error checking deployment '{gateway_id}' in namespace '{namespace}'")
-            logger.error("Error details: ")
-            logger.error(f" - Reason: {e.reason}")
-            logger.error(f" - Status: {e.status}")
-            logger.error(f" - Message: {e.body}")
-        return False
-
-
 def check_login():
 
     # Check if the user is logged in to the OpenShift cluster.
     # If not, prompt the user to log in and exit the script.
-    try:
-        subprocess.check_output(
-            ["oc", "whoami"],
-            stderr=subprocess.STDOUT,
-        )
-    except subprocess.CalledProcessError:
+    if not whoami(api_client):
         logger.error("UNAUTHORIZED...!! Please login to the cluster and try again... !")
         sys.exit(1)
 
 
+def expire_passed_silences(passed):
+
+    # Expire the silences of the change for the gateways, or whole namespaces, that passed their checks.
+    initialize_store()
+    cluster = connect_cluster()
+    scopes = passed_scopes(cluster, args.change_id, passed)
+
+    logger.newline()
+    logger.info(
+        f"Expiring {len(scopes)} silences of change '{args.change_id}' for the gateways that passed their checks."
+    )
+    results = run_silences(expire_silence, create_session(), [(cluster, scope) for scope in scopes], args.change_id)
+    for (name, scope), silence_id in sorted(results.items()):
+        if not silence_id:
+            logger.error(f"Failed to expire silence '{scope}' of change '{args.change_id}'")
+
+
 def main():
 
     # Read SMCP configuration from the OpenShift cluster.
-    output = subprocess.run(
-        [
-            "oc",
-            "get",
-            "smcp",
-            "app-mesh-01",
-            "-n",
-            "istio-system",
-            "-o",
-            "yaml",
-        ],
-        capture_output=True,
-    )
-    smcp = yaml.safe_load(output.stdout)
+    smcp = get_smcp(api_client)
 
     logger.info(
         "============================   Starting Script Execution.  ============================"
     )
 
-    gateway_list = smcp["spec"]["gateways"]
-
-    for gateway_type in gateway_list:
-        if gateway_type in ["additionalEgress", "additionalIngress"]:
-            for gateway_id in smcp["spec"]["gateways"][gateway_type]:
-                namespace = smcp["spec"]["gateways"][gateway_type][gateway_id][
-                    "namespace"
-                ]
-
-                logger.newline()
-                # Check if namespace exists
-                if check_namespace(namespace):
-                    # Check if deployment exists in the namespace
-                    deployment_name = f"{gateway_id}-gateway"
-                    if check_deployment(namespace, deployment_name):
-                        # Check if the service exists in the namespace
-                        if check_service_exists(namespace, gateway_id):
-                            # Check if the pod IPs are available
-                            label_selector = f"type=injectedgateway, app={gateway_id}"
-                            pod_ip = get_pod_ip(label_selector, namespace)
-                            # Check if the service endpoints are available
-                            if pod_ip:
-                                check_service_endpoints(gateway_id, namespace, pod_ip)
-                            else:
-                                logger.warning(
-                                    f"No valid pod IPs found for {gateway_id} in {namespace}."
-                                )
-
-                            check_replicas_mismatch(namespace, deployment_name)
-
-                            logger.newline()
-                            logger.info(
-                                "====================================================================================="
-                            )
+    # Resolve every object related to the SMCP gateways up front instead of probing each name.
+    requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+    manifest = build_manifest(smcp)
+    resolve_manifest(
+        manifest,
+        ["service", "injected_deployment"],
+        core_api,
+        apps_api=apps_api,
+    )
+
+    # Gateways whose injected pods are all READY endpoints without replica mismatch.
+    passed = {}
+
+    for record in manifest:
+        namespace = record["namespace"]
+        gateway_id = record["gateway_id"]
+        passed[(namespace, gateway_id)] = False
+
+        logger.newline()
+        # Check if namespace exists
+        if check_manifest_namespace(record):
+            # Check if deployment exists in the namespace
+            deployment_name = record["objects"]["injected_deployment"]
+            if check_manifest_object(record, "injected_deployment"):
+                # Check if the service exists in the namespace
+                if check_manifest_object(record, "service"):
+                    # Check if the pod IPs are available
+                    label_selector = record["pod_selectors"]["injected"]
+                    pod_ip = get_pod_ip(label_selector, namespace)
+                    # Check if the service endpoints are available
+                    endpoints_ready = False
+                    if pod_ip:
+                        endpoints_ready = check_service_endpoints(record["objects"]["service"], namespace, pod_ip)
+                    else:
+                        logger.warning(
+                            f"No valid pod IPs found for {gateway_id} in {namespace}."
+                        )
+
+                    mismatch = check_replicas_mismatch(namespace, deployment_name)
+                    passed[(namespace, gateway_id)] = endpoints_ready and not mismatch
+
+                    logger.newline()
+                    logger.info(
+                        "====================================================================================="
+                    )
+
+    if args.change_id:
+        expire_passed_silences(passed)
 
     logger.newline()
     logger.info(
@@ -301,42 +250,20 @@ def main():
 
 if __name__ == "__main__":
     # Set global logger
-    logger = create_logger()
+    logger = create_logger("check_service_endpoints")
 
-    check_login()
+    parser = argparse.ArgumentParser("check_service_endpoints")
+    parser.add_argument(
+        "--change-id",
+        default=None,
+        help="Expire the alert silences of this change for every gateway that passes its checks.",
+    )
+    args = parser.parse_args()
 
     # Configure the Kubernetes client to connect to the OpenShift cluster.
-    output = subprocess.run(
-        ["oc", "whoami", "-t"],
-        capture_output=True,
-        text=True,
-    )
-    if output.returncode != 0:
-        logger.error("Unable to set KUBERNETES_TOKEN environment variable. Exiting...")
-        sys.exit(1)  # Exit if the token is not set
-    else:
-        os.environ["KUBERNETES_TOKEN"] = output.stdout.strip()
-
-    # Configure the Kubernetes client
-    configuration = client.Configuration()
-    configuration.api_key_prefix = {"authorization": "Bearer"}
-    configuration.api_key = {
-        "authorization": os.environ.get("KUBERNETES_TOKEN", "")
-    }  # Ensure the token is set in the environment variable
-    if not configuration.api_key["authorization"]:
-        logger.error("KUBERNETES_TOKEN environment variable is not set. Exiting...")
-        sys.exit(1)  # Exit if the token is not set
-    configuration.host = os.environ.get(
-        "KUBERNETES_HOST", ""
-    )  # Ensure the host is set in the environment variable
-    if not configuration.host:
-        logger.error("KUBERNETES_HOST environment variable is not set. Exiting...")
-        sys.exit(1)  # Exit if the host is not set
-    configuration.verify_ssl = (
-        False  # Disable SSL verification for local testing; set to True in production
-    )
+    api_client = create_api_client()
 
-    api_client = client.ApiClient(configuration)
+    check_login()
 
     global core_api, apps_api  # Declare core_api and apps_api as global variables to use them in other functions
     core_api = client.CoreV1Api(api_client)
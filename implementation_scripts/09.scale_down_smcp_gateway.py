@@ -7,84 +7,73 @@ Description   : This script scales down the replicas of the SMCP gateways
 """
 
 import argparse
-import os
-import logging
-import subprocess
 import sys
-import types
-from datetime import datetime
-
-import yaml
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from urllib3.exceptions import InsecureRequestWarning
 import requests
 
 import kubernetes.client.rest
-import yaml
 from kubernetes import client
 
-
-def log_newline(self, how_many_lines=1):
-
-    # Switch formatter, output a blank line
-    self.handler.setFormatter(self.blank_formatter)
-
-    for i in range(how_many_lines):
-        self.info("")
-
-    # Switch back
-    self.handler.setFormatter(self.formatter)
-
-
-def create_logger():
-
-    # Create a handler
-    sh = logging.StreamHandler(sys.stdout)
-    handler = logging.FileHandler(
-        f"./logs/{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_scale_down_smcp_gateway.log",
-        mode="w",
-        encoding="utf-8",
-    )
-    handler.setLevel(logging.DEBUG)
-    formatter = logging.Formatter(
-        fmt="[%(asctime)s] %(levelname)8s : %(message)s",
-        datefmt="%a, %d %b %Y %H:%M:%S",
-    )
-    blank_formatter = logging.Formatter(fmt="")
-    handler.setFormatter(formatter)
-
-    # Create a logger, with the previously-defined handler
-    logger = logging.getLogger("logging_test")
-    logger.setLevel(logging.DEBUG)
-    logger.addHandler(handler)
-    sh.setFormatter(formatter)
-    logger.addHandler(sh)
-
-    # Save some data and add a method to logger object
-
-    logger.handler = handler
-    logger.formatter = formatter
-    logger.blank_formatter = blank_formatter
-    logger.newline = types.MethodType(log_newline, logger)
-
-    return logger
-
-
-def scale_down_replicas(namespace, gateway):
+from common.cluster_api import create_api_client, get_smcp, whoami
+from common.gateway_manifest import (
+    build_manifest,
+    check_manifest_namespace,
+    check_manifest_object,
+    resolve_manifest,
+)
+from common.dry_run import log_report, planned_change, rehearse
+from common.envoy_stats import DEFAULT_INTERVAL as DEFAULT_STATS_INTERVAL
+from common.envoy_stats import (
+    TAKEOVER_MAX_ERROR_RATIO,
+    create_session,
+    drain_guard,
+    error_rate_guard,
+    error_ratio,
+    measure_traffic,
+)
+from common.event_log import elapsed_ms
+from common.fast_read import REPLICA_FIELDS, read_view
+from common.logging_setup import create_logger
+from common.progressive_scale import (
+    DEFAULT_INTERVAL,
+    DEFAULT_MIN_READY_RATIO,
+    DEFAULT_PAUSE_TIMEOUT,
+    DEFAULT_STEP,
+    progressive_scale_down,
+    readiness_guard,
+    scale_steps,
+)
+from common.replica_snapshot import (
+    SNAPSHOT_FILE,
+    load_snapshot,
+    merge_snapshot,
+    restore_snapshot,
+    save_snapshot,
+    take_snapshot,
+)
+
+
+def scale_down_replicas(namespace, gateway, previous_replicas):
 
     replicas = 0  # Set replicas to 0 to scale down
 
-    # If dry run is enabled, just log the action and return.
+    # If dry run is enabled, plan the scale change for the server-side validation and return.
     if dry_run:
-        # Simulate the command output for dry run
-        output = subprocess.CompletedProcess(
-            args=[],
-            returncode=0,
-            stdout=f"oc scale deployment {gateway} --replicas {replicas} -n {namespace}",
+        logger.info(f"DRY RUN: Deployment '{gateway}' in namespace '{namespace}' would be scaled to {replicas} replicas")
+        logger.event("Deployment", namespace, gateway, "scale_down", "dry_run", replicas=replicas)
+        planned_changes.append(
+            planned_change(
+                "Deployment", namespace, gateway, "scale_down",
+                apps_api.patch_namespaced_deployment_scale, gateway, namespace, {"spec": {"replicas": replicas}},
+                _preload_content=False,
+            )
         )
-        logger.info(f"DRY RUN Command: '{output.stdout}'")
         logger.newline()
     else:
+        start = time.monotonic()
         try:
             # Scale down the deployment
             apps_api.patch_namespaced_deployment_scale(
@@ -92,6 +81,10 @@ def scale_down_replicas(namespace, gateway):
                 namespace=namespace,
                 body={"spec": {"replicas": replicas}},
             )
+            logger.event(
+                "Deployment", namespace, gateway, "scale_down", "success", 200, elapsed_ms(start),
+                replicas=replicas, previous_replicas=previous_replicas,
+            )
             logger.info(
                 f"Scaled down deployment '{gateway}' in namespace '{namespace}' to {replicas} replicas."
             )
@@ -102,12 +95,18 @@ def scale_down_replicas(namespace, gateway):
                 logger.info(
                     f"Verification successful: Deployment '{gateway}' in namespace '{namespace}' is now at {current_replicas} replicas."
                 )
+                logger.event("Deployment", namespace, gateway, "verify_scale", "success", replicas=current_replicas)
             else:
                 logger.error(
                     f"Verification failed: Deployment '{gateway}' in namespace '{namespace}' is at {current_replicas} replicas, expected {replicas}."
                 )
+                logger.event("Deployment", namespace, gateway, "verify_scale", "failed", replicas=current_replicas)
             logger.newline()
         except kubernetes.client.exceptions.ApiException as e:
+            logger.event(
+                "Deployment", namespace, gateway, "scale_down", "failed", e.status, elapsed_ms(start),
+                replicas=replicas, previous_replicas=previous_replicas,
+            )
             logger.error(
                 f"Error scaling down deployment '{gateway}' in namespace '{namespace}'"
             )
@@ -120,10 +119,8 @@ def scale_down_replicas(namespace, gateway):
 def get_replica_count(namespace, gateway):
 
     try:
-        deployment = apps_api.read_namespaced_deployment(
-            name=gateway, namespace=namespace
-        )
-        return deployment.status.replicas if deployment.status.replicas is not None else 0
+        deployment = read_view(apps_api.read_namespaced_deployment, REPLICA_FIELDS, gateway, namespace)
+        return deployment.status_replicas if deployment.status_replicas is not None else 0
     except kubernetes.client.exceptions.ApiException as e:
         logger.error(f"Error retrieving deployment '{gateway}' in namespace '{namespace}'")
         logger.error("Error details: ")
@@ -133,50 +130,194 @@ def get_replica_count(namespace, gateway):
         return None
 
 
-def check_namespace(namespace):
+def snapshot_replicas(manifest):
 
-    # Check if a namespace exists.
-    output = subprocess.run(
-        ["oc", "get", "namespace", namespace],
-        capture_output=True,
-        text=True,
+    # Record the replica count and HPA bounds of every gateway deployment before scaling it down, with one list of
+    # the deployments and one of the HPAs. Gateways an earlier run scaled down keep the scale recorded before it.
+    # Returns the snapshot entries by (namespace, deployment).
+    gateways = [
+        (record["namespace"], record["objects"]["deployment"])
+        for record in manifest
+        if record["resolved"]["namespace"] and record["resolved"]["deployment"]
+    ]
+    start = time.monotonic()
+    try:
+        snapshot = merge_snapshot(load_snapshot(args.snapshot), take_snapshot(api_client, gateways))
+    except kubernetes.client.rest.ApiException as e:
+        logger.event("Deployment", None, None, "snapshot_replicas", "failed", e.status, elapsed_ms(start))
+        logger.error("Error reading the replica counts of the SMCP gateways, nothing was scaled down")
+        logger.error("Error details: ")
+        logger.error(f" - Reason: {e.reason}")
+        logger.error(f" - Status: {e.status}")
+        logger.error(f" - Message: {e.body}")
+        sys.exit(1)
+
+    if dry_run:
+        logger.info(f"DRY RUN: the scale of {len(snapshot)} gateways would be saved to '{args.snapshot}'")
+    else:
+        save_snapshot(snapshot, args.snapshot)
+        logger.info(f"Scale of {len(snapshot)} gateways saved to '{args.snapshot}'")
+    logger.event(
+        "Deployment", None, None, "snapshot_replicas", "dry_run" if dry_run else "success", 200, elapsed_ms(start),
+        gateways=len(snapshot), file=args.snapshot,
     )
-    if output.returncode != 0:
-        logger.error(f"Namespace '{namespace}' does not exist.")
-        return False
-    logger.info(f"Namespace '{namespace}' exists.")
-    return True
+    return {(entry["namespace"], entry["name"]): entry for entry in snapshot}
+
 
+def restore_replicas():
 
-def check_deployment(namespace, gateway_id):
+    # Put every gateway back to the replica count and HPA bounds of the snapshot, concurrently.
+    snapshot = load_snapshot(args.snapshot)
+    if not snapshot:
+        logger.error(f"No replica snapshot found in '{args.snapshot}'. Exiting.. !")
+        sys.exit(1)
 
     try:
-        requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
-        apps_api.read_namespaced_deployment(name=gateway_id, namespace=namespace)
-        logger.info(f"Deployment '{gateway_id}' exists in namespace '{namespace}'.")
-        return True
-    except kubernetes.client.exceptions.ApiException as e:
-        if e.status == 404:
-            logger.error(f"Deployment '{gateway_id}' does not exist in namespace '{namespace}'.")
+        results, unchanged = restore_snapshot(api_client, snapshot, dry_run="All" if dry_run else None)
+    except kubernetes.client.rest.ApiException as e:
+        logger.error("Error reading the current scale of the SMCP gateways")
+        logger.error("Error details: ")
+        logger.error(f" - Reason: {e.reason}")
+        logger.error(f" - Status: {e.status}")
+        logger.error(f" - Message: {e.body}")
+        sys.exit(1)
+
+    logger.info(f"Gateways already at their recorded scale : {unchanged}")
+    logger.info(f"Gateways to restore                      : {len(results)}")
+    if dry_run:
+        # Validate every scale change on the API server, nothing is persisted.
+        return log_report([dict(result, accepted=result["restored"]) for result in results])
+
+    entries = {(entry["namespace"], entry["name"]): entry for entry in snapshot}
+    logger.newline()
+    for result in results:
+        namespace, name = result["namespace"], result["name"]
+        if result["restored"]:
+            logger.info(
+                f"Restored deployment '{name}' in namespace '{namespace}' to {entries[(namespace, name)]['replicas']} replicas."
+            )
         else:
-            logger.error(f"Error checking deployment '{gateway_id}' in namespace '{namespace}'")
+            logger.error(f"Error restoring the scale of deployment '{name}' in namespace '{namespace}'")
+            logger.error("Error details: ")
+            logger.error(f" - Reason: {result['reason']}")
+            logger.error(f" - Status: {result['status']}")
+            logger.error(f" - Message: {result['message']}")
+    return all(result["restored"] for result in results)
+
+
+def scale_down_progressively(gateways):
+
+    # Step every SMCP gateway down concurrently while its injected gateway stays ready.
+    # Returns True when every gateway reached zero replicas.
+    def scale_down(gateway):
+
+        # Progressive scale down of one gateway, guarded by the readiness of its injected gateway.
+        namespace, deployment, injected_deployment, entry, record = gateway
+        guards = [readiness_guard(apps_api, namespace, injected_deployment, args.min_ready_ratio)]
+        if args.max_error_ratio is not None:
+            guards.append(error_rate_guard(session, core_api, record, args.max_error_ratio, args.stats_interval))
+        # Once the pods a step removed have left the Service endpoints, they must stop serving.
+        step_guards = [drain_guard(session, core_api, apps_api, record, args.stats_interval)] if args.drain_check else []
+        return progressive_scale_down(
+            apps_api, namespace, deployment, guards, entry.get("replicas"),
+            step=args.step, interval=args.interval, pause_timeout=args.pause_timeout, step_guards=step_guards,
+            hpa=entry.get("hpa"),
+        )
+
+    session = create_session()
+    logger.newline()
+    logger.info(
+        f"Stepping {len(gateways)} SMCP gateways down by {args.step} replica(s) every {args.interval} seconds"
+    )
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        results = list(executor.map(scale_down, gateways))
+
+    logger.newline()
+    for result in results:
+        if result["completed"]:
+            logger.info(f"Deployment '{result['name']}' in namespace '{result['namespace']}' scaled down to 0 replicas.")
+        else:
+            logger.error(
+                f"Scale down of deployment '{result['name']}' in namespace '{result['namespace']}' stopped at "
+                f"{result['replicas']} replicas: {result['reason']}"
+            )
+    return all(result["completed"] for result in results)
+
+
+def wait_for_takeover(manifest):
+
+    # Scrape the Envoy stats of the SMCP and injected gateways until the injected gateway of every SMCP gateway is
+    # ready and serves its share of the Service traffic without errors, up to --pause-timeout seconds, and return
+    # those gateways {(namespace, gateway_id)}. Both sit behind the same Service, so the SMCP pods keep their share
+    # while they are ready; they are checked to be drained after each step of a --progressive scale down. A dry run
+    # measures once.
+    records = []
+    for record in manifest:
+        if not (record["resolved"]["namespace"] and record["resolved"]["deployment"]):
+            continue
+        if record["resolved"]["injected_deployment"]:
+            records.append(record)
+        else:
+            logger.error(
+                f"Gateway '{record['gateway_id']}' in namespace '{record['namespace']}' has no injected gateway to take over its traffic."
+            )
+    max_error_ratio = TAKEOVER_MAX_ERROR_RATIO if args.max_error_ratio is None else args.max_error_ratio
+    session = create_session()
+    start = time.monotonic()
+    taken_over = set()
+    while records:
+        logger.info(f"Scraping the Envoy stats of {len(records)} gateways, {args.stats_interval} seconds apart")
+        try:
+            report = measure_traffic(
+                session, core_api, records, args.stats_interval, max_error_ratio=max_error_ratio
+            )
+        except kubernetes.client.rest.ApiException as e:
+            logger.error("Error listing the gateway pods, the traffic cannot be checked")
             logger.error("Error details: ")
             logger.error(f" - Reason: {e.reason}")
             logger.error(f" - Status: {e.status}")
             logger.error(f" - Message: {e.body}")
-        return False
+            return taken_over
+
+        timed_out = dry_run or time.monotonic() - start >= args.pause_timeout
+        for record, row in zip(records, report):
+            smcp, injected = row["smcp"], row["injected"]
+            ready, readiness = readiness_guard(
+                apps_api, row["namespace"], record["objects"]["injected_deployment"], args.min_ready_ratio
+            )()
+            share = f"{row['injected_share']:.0%}" if row["injected_share"] is not None else "-"
+            detail = (
+                f"{readiness}, serving {injected['rps']:.1f} req/s with {error_ratio(injected):.2%} 5xx, {share} of the "
+                f"requests for {row['pod_share']:.0%} of the pods, SMCP {smcp['rps']:.1f} req/s"
+            )
+            passed = ready and row["taken_over"]
+            if passed:
+                taken_over.add((row["namespace"], row["gateway_id"]))
+                logger.info(
+                    f"Injected gateway of '{row['gateway_id']}' in namespace '{row['namespace']}' has taken over: {detail}"
+                )
+            elif timed_out:
+                logger.error(
+                    f"Injected gateway of '{row['gateway_id']}' in namespace '{row['namespace']}' has not taken over: {detail}"
+                )
+            logger.event(
+                "Gateway", row["namespace"], row["gateway_id"], "takeover_check",
+                "taken_over" if passed else "pending", smcp=smcp, injected=injected,
+                injected_share=row["injected_share"], pod_share=row["pod_share"], ready=ready,
+            )
+
+        records = [record for record in records if (record["namespace"], record["gateway_id"]) not in taken_over]
+        if not records or timed_out:
+            break
+        logger.warning(f"Waiting for the injected gateways of {len(records)} SMCP gateways to take over..")
+    return taken_over
 
 
 def check_login():
 
     # Check if the user is logged in to the OpenShift cluster.
     # If not, prompt the user to log in and exit the script.
-    try:
-        subprocess.check_output(
-            ["oc", "whoami"],
-            stderr=subprocess.STDOUT,
-        )
-    except subprocess.CalledProcessError:
+    if not whoami(api_client):
         logger.error("UNAUTHORIZED...!! Please login to the cluster and try again... !")
         sys.exit(1)
 
@@ -186,87 +327,97 @@ def main():
     check_login()
 
     # Read SMCP configuration from the OpenShift cluster.
-    output = subprocess.run(
-        [
-            "oc",
-            "get",
-            "smcp",
-            "app-mesh-01",
-            "-n",
-            "istio-system",
-            "-o",
-            "yaml",
-        ],
-        capture_output=True,
-    )
-    smcp = yaml.safe_load(output.stdout)
+    smcp = get_smcp(api_client)
 
     logger.info(
         "============================   Starting Script Execution.  ============================"
     )
 
-    gateway_list = smcp["spec"]["gateways"]
-
-    for gateway_type in gateway_list:
-        if gateway_type in ["additionalEgress", "additionalIngress"]:
-            for gateway_id in smcp["spec"]["gateways"][gateway_type]:
-                namespace = smcp["spec"]["gateways"][gateway_type][gateway_id][
-                    "namespace"
-                ]
+    # Resolve every object related to the SMCP gateways up front instead of probing each name.
+    requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+    manifest = build_manifest(smcp)
+    kinds = ["deployment", "injected_deployment"] if args.progressive or args.drain_check else ["deployment"]
+    resolve_manifest(manifest, kinds, core_api, apps_api=apps_api)
+    snapshot = snapshot_replicas(manifest)
+    previous_replicas = {key: entry["replicas"] for key, entry in snapshot.items()}
+    taken_over = wait_for_takeover(manifest) if args.drain_check else None
+    progressive_gateways = []
+    validated = True
 
-                logger.newline()
-                # Check if namespace exists
-                if check_namespace(namespace):
-                    # Check if deployment exists in the namespace
-                    if check_deployment(namespace, gateway_id):
-                        scale_down_replicas(namespace, gateway_id)
+    for record in manifest:
+        namespace = record["namespace"]
 
-                        logger.info(
-                            "====================================================================================="
+        logger.newline()
+        # Check if namespace exists
+        if check_manifest_namespace(record):
+            # Check if deployment exists in the namespace
+            if check_manifest_object(record, "deployment"):
+                deployment = record["objects"]["deployment"]
+                if taken_over is not None and (namespace, record["gateway_id"]) not in taken_over:
+                    # The injected gateway does not carry its share of the traffic yet, leave the old one running.
+                    logger.error(f"The injected gateway has not taken over the traffic of '{deployment}', it is not scaled down.")
+                    validated = False
+                elif args.progressive and not dry_run:
+                    # Step the gateway down once every gateway is checked, watching its injected gateway.
+                    if check_manifest_object(record, "injected_deployment"):
+                        progressive_gateways.append(
+                            (namespace, deployment, record["objects"]["injected_deployment"],
+                             snapshot.get((namespace, deployment), {}), record)
                         )
+                    else:
+                        logger.error(f"No injected gateway to take over the traffic, '{deployment}' is not scaled down.")
+                        validated = False
+                else:
+                    if args.progressive:
+                        steps = scale_steps(previous_replicas.get((namespace, deployment)) or 0, args.step)
+                        logger.info(f"DRY RUN: Deployment '{deployment}' in namespace '{namespace}' would be stepped down to {steps}")
+                        hpa = snapshot.get((namespace, deployment), {}).get("hpa")
+                        if hpa:
+                            logger.info(f"DRY RUN: HPA '{hpa['name']}' would be pinned to the replicas of every step")
+                    scale_down_replicas(namespace, deployment, previous_replicas.get((namespace, deployment)))
+
+                logger.info(
+                    "====================================================================================="
+                )
+
+    # Validate every planned scale change on the API server before the change window.
+    if dry_run:
+        validated = log_report(rehearse(planned_changes)) and validated
+    elif progressive_gateways:
+        validated = scale_down_progressively(progressive_gateways) and validated
 
     logger.newline()
     logger.info(
         "============================   Script Execution Completed.   ============================"
     )
+    if not validated:
+        sys.exit(1)
 
 
-if __name__ == "__main__":
-    # Set global logger
-    logger = create_logger()
-    
-        # Configure the Kubernetes client to connect to the OpenShift cluster.
-    output = subprocess.run(
-        ["oc", "whoami", "-t"],
-        capture_output=True,
-        text=True,
+def restore_main():
+
+    check_login()
+
+    logger.info(
+        "============================   Starting Script Execution.  ============================"
     )
-    if output.returncode != 0:
-        logger.error("Unable to set KUBERNETES_TOKEN environment variable. Exiting...")
-        sys.exit(1)  # Exit if the token is not set
-    else:
-        os.environ["KUBERNETES_TOKEN"] = output.stdout.strip()
-
-    # Configure the Kubernetes client
-    configuration = client.Configuration()
-    configuration.api_key_prefix = {"authorization": "Bearer"}
-    configuration.api_key = {
-        "authorization": os.environ.get("KUBERNETES_TOKEN", "")
-    }  # Ensure the token is set in the environment variable
-    if not configuration.api_key["authorization"]:
-        logger.error("KUBERNETES_TOKEN environment variable is not set. Exiting...")
-        sys.exit(1)  # Exit if the token is not set
-    configuration.host = os.environ.get(
-        "KUBERNETES_HOST", ""
-    )  # Ensure the host is set in the environment variable
-    if not configuration.host:
-        logger.error("KUBERNETES_HOST environment variable is not set. Exiting...")
-        sys.exit(1)  # Exit if the host is not set
-    configuration.verify_ssl = (
-        False  # Disable SSL verification for local testing; set to True in production
+
+    validated = restore_replicas()
+
+    logger.newline()
+    logger.info(
+        "============================   Script Execution Completed.   ============================"
     )
+    if not validated:
+        sys.exit(1)
 
-    api_client = client.ApiClient(configuration)
+
+if __name__ == "__main__":
+    # Set global logger
+    logger = create_logger("scale_down_smcp_gateway")
+
+    # Configure the Kubernetes client to connect to the OpenShift cluster.
+    api_client = create_api_client()
 
     global core_api, apps_api, auth_api  # Declare core_api and apps_api as global variables to use them in other functions
     core_api = client.CoreV1Api(api_client)
@@ -284,14 +435,79 @@ if __name__ == "__main__":
         action="store_true",
         help="Run the script in execution mode and make changes.",
     )
+    parser.add_argument(
+        "--restore",
+        action="store_true",
+        help="Scale the gateways back to the replica counts and HPA bounds recorded before the scale down.",
+    )
+    parser.add_argument(
+        "--progressive",
+        action="store_true",
+        help="Step the gateways down while their injected gateways stay ready, instead of straight to 0.",
+    )
+    parser.add_argument(
+        "--step",
+        type=int,
+        default=DEFAULT_STEP,
+        help=f"Replicas removed per step with --progressive (default: {DEFAULT_STEP}).",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=DEFAULT_INTERVAL,
+        help=f"Seconds the traffic settles between two steps with --progressive (default: {DEFAULT_INTERVAL}).",
+    )
+    parser.add_argument(
+        "--min-ready-ratio",
+        type=float,
+        default=DEFAULT_MIN_READY_RATIO,
+        help=f"Share of the injected gateway replicas that must be available for a step (default: {DEFAULT_MIN_READY_RATIO}).",
+    )
+    parser.add_argument(
+        "--pause-timeout",
+        type=float,
+        default=DEFAULT_PAUSE_TIMEOUT,
+        help=f"Seconds a breached check may pause a gateway before its scale down is aborted (default: {DEFAULT_PAUSE_TIMEOUT}).",
+    )
+    parser.add_argument(
+        "--drain-check",
+        action="store_true",
+        help="Only scale down the SMCP gateways whose injected gateway is ready and serves its share of the traffic in "
+        "its Envoy stats, waiting up to --pause-timeout. With --progressive, the removed pods must also drain after every step.",
+    )
+    parser.add_argument(
+        "--max-error-ratio",
+        type=float,
+        help="Pause a --progressive step while the 5xx share of the injected gateway in its Envoy stats is above this, "
+        f"and the highest 5xx share --drain-check accepts (default for --drain-check: {TAKEOVER_MAX_ERROR_RATIO}).",
+    )
+    parser.add_argument(
+        "--stats-interval",
+        type=float,
+        default=DEFAULT_STATS_INTERVAL,
+        help=f"Seconds between the two Envoy stats scrapes the request rates are computed from (default: {DEFAULT_STATS_INTERVAL}).",
+    )
+    parser.add_argument(
+        "--snapshot",
+        default=SNAPSHOT_FILE,
+        help=f"Replica snapshot written before the scale down (default: {SNAPSHOT_FILE}).",
+    )
 
-    if len(sys.argv) != 2:
-        logger.info("USAGE: python scale_down_smcp_gateway.py --dry-run (OR) --execute")
+    args = parser.parse_args()
+    if (
+        args.dry_run == args.execute
+        or (args.restore and (args.progressive or args.drain_check))
+        or args.step < 1
+        or (args.max_error_ratio is not None and not (args.progressive or args.drain_check))
+    ):
+        logger.info(
+            "USAGE: python scale_down_smcp_gateway.py --dry-run (OR) --execute [--restore | [--progressive] [--drain-check]] [--snapshot <file>]"
+        )
         logger.error("Please provide the relevant input to run.")
         sys.exit(1)  # Exit with error status
 
-    args = parser.parse_args()
     dry_run = args.dry_run
+    planned_changes = []
     if dry_run:
         logger.info(
             "********************************************************************"
@@ -304,4 +520,7 @@ if __name__ == "__main__":
         )
         logger.newline()
 
-    main()
+    if args.restore:
+        restore_main()
+    else:
+        main()
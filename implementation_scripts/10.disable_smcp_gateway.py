@@ -8,58 +8,21 @@ Description   : This script disables smcp gateway by setting enabled: false in t
 
 import argparse
 import json
-import logging
-import subprocess
 import sys
-import types
-from datetime import datetime
-
-import yaml
-
-
-def log_newline(self, how_many_lines=1):
-
-    # Switch formatter, output a blank line
-    self.handler.setFormatter(self.blank_formatter)
-
-    for i in range(how_many_lines):
-        self.info("")
-
-    # Switch back
-    self.handler.setFormatter(self.formatter)
-
-
-def create_logger():
-
-    # Create a handler
-    sh = logging.StreamHandler(sys.stdout)
-    handler = logging.FileHandler(
-        f"./logs/{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_disable_smcp_gateway.log",
-        mode="w",
-        encoding="utf-8",
-    )
-    handler.setLevel(logging.DEBUG)
-    formatter = logging.Formatter(
-        fmt="[%(asctime)s] %(levelname)8s : %(message)s",
-        datefmt="%a, %d %b %Y %H:%M:%S",
-    )
-    blank_formatter = logging.Formatter(fmt="")
-    handler.setFormatter(formatter)
-
-    # Create a logger, with the previously-defined handler
-    logger = logging.getLogger("logging_test")
-    logger.setLevel(logging.DEBUG)
-    logger.addHandler(handler)
-    sh.setFormatter(formatter)
-    logger.addHandler(sh)
-
-    # Save some data and add a method to logger object
-    logger.handler = handler
-    logger.formatter = formatter
-    logger.blank_formatter = blank_formatter
-    logger.newline = types.MethodType(log_newline, logger)
-
-    return logger
+import time
+
+import kubernetes.client.rest
+from common.cluster_api import (
+    CONTROL_PLANE_NAMESPACE,
+    SMCP_NAME,
+    create_api_client,
+    get_smcp,
+    patch_object,
+    whoami,
+)
+from common.dry_run import log_report, planned_change, rehearse
+from common.event_log import elapsed_ms
+from common.logging_setup import create_logger
 
 
 def patch_smcp(gateway_type, gateway_id):
@@ -72,52 +35,43 @@ def patch_smcp(gateway_type, gateway_id):
         }
     ]
 
-    # Convert patch_data to a JSON string
-    json_patch = json.dumps(patch_data)
-
     if dry_run:
-        output = subprocess.CompletedProcess(
-            args=[],
-            returncode=0,
-            stdout=f"oc patch smcp app-mesh-01 -n istio-system --type=json -p='{json_patch}'",
-            stderr="",
+        # Plan the patch for the server-side validation.
+        logger.info(f"DRY RUN: SMCP '{SMCP_NAME}' would be patched with '{json.dumps(patch_data)}'")
+        logger.event("ServiceMeshControlPlane", "istio-system", "app-mesh-01", "disable_gateway", "dry_run", gateway_id=gateway_id, gateway_type=gateway_type)
+        planned_changes.append(
+            planned_change(
+                "ServiceMeshControlPlane", CONTROL_PLANE_NAMESPACE, SMCP_NAME, f"disable_gateway {gateway_id}",
+                patch_object, api_client, "smcp", SMCP_NAME, CONTROL_PLANE_NAMESPACE, patch_data,
+            )
         )
-        logger.info(f"DRY RUN Command: '{output.stdout}'")
         logger.newline()
     else:
         # Patch the SMCP configuration to disable the gateways.
-        output = subprocess.run(
-            [
-                "oc",
-                "patch",
-                "smcp",
-                "app-mesh-01",
-                "-n",
-                "istio-system",
-                "--type=json",
-                f"-p={json_patch}",
-            ],
-            capture_output=True,
-        )
-
-        if output.returncode != 0:
-            logger.error(f"Failed to patch SMCP: {output.stderr.decode()}")
+        start = time.monotonic()
+        try:
+            patch_object(api_client, "smcp", SMCP_NAME, CONTROL_PLANE_NAMESPACE, patch_data)
+        except kubernetes.client.rest.ApiException as e:
+            logger.event(
+                "ServiceMeshControlPlane", "istio-system", "app-mesh-01", "disable_gateway", "failed", e.status,
+                elapsed_ms(start), gateway_id=gateway_id, gateway_type=gateway_type,
+            )
+            logger.error(f"Failed to patch SMCP: {e.body}")
             sys.exit(1)
-        else:
-            logger.info(f"Successfully patched smcp: {patch_data}")
-            logger.newline()
+
+        logger.event(
+            "ServiceMeshControlPlane", "istio-system", "app-mesh-01", "disable_gateway", "success", 200,
+            elapsed_ms(start), gateway_id=gateway_id, gateway_type=gateway_type,
+        )
+        logger.info(f"Successfully patched smcp: {patch_data}")
+        logger.newline()
 
 
 def check_login():
 
     # Check if the user is logged in to the OpenShift cluster.
     # If not, prompt the user to log in and exit the script.
-    try:
-        subprocess.check_output(
-            ["oc", "whoami"],
-            stderr=subprocess.STDOUT,
-        )
-    except subprocess.CalledProcessError:
+    if not whoami(api_client):
         logger.error("UNAUTHORIZED...!! Please login to the cluster and try again... !")
         sys.exit(1)
 
@@ -127,20 +81,7 @@ def main():
     check_login()
 
     # Read SMCP configuration from the OpenShift cluster.
-    output = subprocess.run(
-        [
-            "oc",
-            "get",
-            "smcp",
-            "app-mesh-01",
-            "-n",
-            "istio-system",
-            "-o",
-            "yaml",
-        ],
-        capture_output=True,
-    )
-    smcp = yaml.safe_load(output.stdout)
+    smcp = get_smcp(api_client)
 
     logger.info(
         "============================   Starting Script Execution.  ============================"
@@ -163,15 +104,25 @@ def main():
                 logger.info(
                     "====================================================================================="
                 )
+    # Validate every planned patch on the API server before the change window.
+    validated = True
+    if dry_run:
+        validated = log_report(rehearse(planned_changes))
+
     logger.newline()
     logger.info(
         "============================   Script Execution Completed.   ============================"
     )
+    if not validated:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
     # Set global logger
-    logger = create_logger()
+    logger = create_logger("disable_smcp_gateway")
+
+    # Configure the Kubernetes client to connect to the OpenShift cluster.
+    api_client = create_api_client()
 
     parser = argparse.ArgumentParser("disable_smcp_gateway")
     parser.add_argument(
@@ -192,6 +143,7 @@ if __name__ == "__main__":
 
     args = parser.parse_args()
     dry_run = args.dry_run
+    planned_changes = []
     if dry_run:
         logger.info(
             "********************************************************************"
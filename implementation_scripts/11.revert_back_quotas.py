@@ -6,72 +6,27 @@ Version       : 1.0
 Description   : This script will revert the resource quota memory and CPU to their original values from the backup taken earlier for the smesh namespaces.
 """
 
-import logging
 import os
-import subprocess
 import sys
-import types
-from datetime import datetime
+import time
 from urllib3.exceptions import InsecureRequestWarning
 import requests
 
 import kubernetes.client.rest
 import yaml
 from kubernetes import client
-
-
-def log_newline(self, how_many_lines=1):
-
-    # Switch formatter, output a blank line
-    self.handler.setFormatter(self.blank_formatter)
-
-    for i in range(how_many_lines):
-        self.info("")
-
-    # Switch back
-    self.handler.setFormatter(self.formatter)
-
-
-def create_logger():
-
-    # Create a handler
-    sh = logging.StreamHandler(sys.stdout)
-    handler = logging.FileHandler(
-        f"./logs/{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_revert_back_quotas.log",
-        mode="w",
-        encoding="utf-8",
-    )
-    handler.setLevel(logging.DEBUG)
-    formatter = logging.Formatter(
-        fmt="[%(asctime)s] %(levelname)8s : %(message)s",
-        datefmt="%a, %d %b %Y %H:%M:%S",
-    )
-    blank_formatter = logging.Formatter(fmt="")
-    handler.setFormatter(formatter)
-
-    # Create a logger, with the previously-defined handler
-    logger = logging.getLogger("logging_test")
-    logger.setLevel(logging.DEBUG)
-    logger.addHandler(handler)
-    sh.setFormatter(formatter)
-    logger.addHandler(sh)
-
-    # Save some data and add a method to logger object
-
-    logger.handler = handler
-    logger.formatter = formatter
-    logger.blank_formatter = blank_formatter
-    logger.newline = types.MethodType(log_newline, logger)
-
-    return logger
+from common.cluster_api import create_api_client, get_smmr, whoami
+from common.event_log import elapsed_ms
+from common.fast_read import QUOTA_FIELDS, read_view
+from common.logging_setup import create_logger
 
 
 def display_current_values(namespace):
 
     try:
         requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
-        quota = core_api.read_namespaced_resource_quota(f"{namespace}-quota", namespace)
-        hard_limits = quota.spec.hard
+        quota = read_view(core_api.read_namespaced_resource_quota, QUOTA_FIELDS, f"{namespace}-quota", namespace)
+        hard_limits = quota.hard
         requests_cpu = hard_limits.get("requests.cpu")
         requests_memory = hard_limits.get("requests.memory")
         limits_cpu = hard_limits.get("limits.cpu")
@@ -103,6 +58,7 @@ def patch_namespace_quota(namespace, resources):
             }
         }
     }
+    start = time.monotonic()
     try:
         requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
         core_api.patch_namespaced_resource_quota(
@@ -113,8 +69,10 @@ def patch_namespace_quota(namespace, resources):
         logger.info(
             f"Successfully patched resource quota '{quota_name}' in namespace '{namespace}'"
         )
+        logger.event("ResourceQuota", namespace, quota_name, "revert_quota", "success", 200, elapsed_ms(start), hard=resources)
         return True
     except kubernetes.client.rest.ApiException as e:
+        logger.event("ResourceQuota", namespace, quota_name, "revert_quota", "failed", e.status, elapsed_ms(start), hard=resources)
         logger.error(
             f"Error patching resource quota '{quota_name}' in namespace '{namespace}'"
         )
@@ -136,6 +94,7 @@ def revert_back_original(namespace):
         logger.error(
             f"Backup file '{fullpath}' does not exist. Cannot revert resource quotas for namespace '{namespace}'."
         )
+        logger.event("ResourceQuota", namespace, f"{namespace}-quota", "revert_quota", "no_backup", file=fullpath)
         logger.newline()
         return
     # Read the backup file
@@ -186,8 +145,8 @@ def check_quota(namespace):
     # Check if a resource quota exists in the given namespace.
     try:
         requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
-        quota = core_api.read_namespaced_resource_quota(f"{namespace}-quota", namespace)
-        logger.info(f"Resource quota '{quota.metadata.name}' exists in namespace '{namespace}'.")
+        quota = read_view(core_api.read_namespaced_resource_quota, QUOTA_FIELDS, f"{namespace}-quota", namespace)
+        logger.info(f"Resource quota '{quota.name}' exists in namespace '{namespace}'.")
         return True
     except kubernetes.client.rest.ApiException as e:
         if e.status == 404:
@@ -225,12 +184,7 @@ def check_login():
 
     # Check if the user is logged in to the OpenShift cluster.
     # If not, prompt the user to log in and exit the script.
-    try:
-        subprocess.check_output(
-            ["oc", "whoami"],
-            stderr=subprocess.STDOUT,
-        )
-    except subprocess.CalledProcessError:
+    if not whoami(api_client):
         logger.error("UNAUTHORIZED...!! Please login to the cluster and try again... !")
         sys.exit(1)
 
@@ -240,20 +194,7 @@ def main():
     check_login()
 
     # Read SMMR configuration from the OpenShift cluster.
-    output = subprocess.run(
-        [
-            "oc",
-            "get",
-            "smmr",
-            "default",
-            "-n",
-            "istio-system",
-            "-o",
-            "yaml",
-        ],
-        capture_output=True,
-    )
-    smmr = yaml.safe_load(output.stdout)
+    smmr = get_smmr(api_client)
 
     logger.info(
         "============================   Starting Script Execution.  ============================"
@@ -282,42 +223,12 @@ def main():
 
 if __name__ == "__main__":
     # Set global logger
-    logger = create_logger()
-
-    check_login()
+    logger = create_logger("revert_back_quotas")
 
     # Configure the Kubernetes client to connect to the OpenShift cluster.
-    output = subprocess.run(
-        ["oc", "whoami", "-t"],
-        capture_output=True,
-        text=True,
-    )
-    if output.returncode != 0:
-        logger.error("Unable to set KUBERNETES_TOKEN environment variable. Exiting...")
-        sys.exit(1)  # Exit if the token is not set
-    else:
-        os.environ["KUBERNETES_TOKEN"] = output.stdout.strip()
-
-    # Configure the Kubernetes client
-    configuration = client.Configuration()
-    configuration.api_key_prefix = {"authorization": "Bearer"}
-    configuration.api_key = {
-        "authorization": os.environ.get("KUBERNETES_TOKEN", "")
-    }  # Ensure the token is set in the environment variable
-    if not configuration.api_key["authorization"]:
-        logger.error("KUBERNETES_TOKEN environment variable is not set. Exiting...")
-        sys.exit(1)  # Exit if the token is not set
-    configuration.host = os.environ.get(
-        "KUBERNETES_HOST", ""
-    )  # Ensure the host is set in the environment variable
-    if not configuration.host:
-        logger.error("KUBERNETES_HOST environment variable is not set. Exiting...")
-        sys.exit(1)  # Exit if the host is not set
-    configuration.verify_ssl = (
-        False  # Disable SSL verification for local testing; set to True in production
-    )
+    api_client = create_api_client()
 
-    api_client = client.ApiClient(configuration)
+    check_login()
 
     global core_api, apps_api  # Declare core_api and apps_api as global variables to use them in other functions
     core_api = client.CoreV1Api(api_client)
@@ -7,67 +7,21 @@ Description   : This script will update the cluster values config file by disabl
 """
 
 
-import logging
 import os
 import sys
-import types
-from datetime import datetime
 
 from ruamel.yaml import YAML
+from common.logging_setup import create_logger
+from common.instrumentation import span
 
 yaml = YAML()
 yaml.width = sys.maxsize  # Set width to max size to avoid line breaks in YAML output
 yaml.preserve_quotes = True  # Preserve quotes in YAML output
 
 
-def log_newline(self, how_many_lines=1):
-
-    # Switch formatter, output a blank line
-    self.handler.setFormatter(self.blank_formatter)
-
-    for i in range(how_many_lines):
-        self.info("")
-
-    # Switch back
-    self.handler.setFormatter(self.formatter)
-
-
-def create_logger():
-
-    # Create a handler
-    sh = logging.StreamHandler(sys.stdout)
-    handler = logging.FileHandler(
-        f"./logs/{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_update_cluster_values.log",
-        mode="w",
-        encoding="utf-8",
-    )
-    handler.setLevel(logging.DEBUG)
-    formatter = logging.Formatter(
-        fmt="[%(asctime)s] %(levelname)8s : %(message)s",
-        datefmt="%a, %d %b %Y %H:%M:%S",
-    )
-    blank_formatter = logging.Formatter(fmt="")
-    handler.setFormatter(formatter)
-
-    # Create a logger, with the previously-defined handler
-    logger = logging.getLogger("logging_test")
-    logger.setLevel(logging.DEBUG)
-    logger.addHandler(handler)
-    sh.setFormatter(formatter)
-    logger.addHandler(sh)
-
-    # Save some data and add a method to logger object
-    logger.handler = handler
-    logger.formatter = formatter
-    logger.blank_formatter = blank_formatter
-    logger.newline = types.MethodType(log_newline, logger)
-
-    return logger
-
-
 def update_config_file(cluster_values):
 
-    with open(file2, "w") as igw_file:
+    with span("file", "write cluster values"), open(file2, "w") as igw_file:
         yaml.dump(cluster_values, igw_file)
 
 
@@ -119,6 +73,7 @@ def main():
                             cluster_values["project"][ns_index]["egress"][
                                 "enabled"
                             ] = False
+                            logger.event("ClusterValues", ns, "egress.enabled", "disable_smcp_gateway", "updated", file=file2)
                     elif key == "ingress":
                         if (
                             cluster_values["project"][ns_index]["ingress"]["enabled"]
@@ -126,6 +81,7 @@ def main():
                             cluster_values["project"][ns_index]["ingress"][
                                 "enabled"
                             ] = False
+                            logger.event("ClusterValues", ns, "ingress.enabled", "disable_smcp_gateway", "updated", file=file2)
 
         update_config_file(cluster_values)
 
@@ -143,7 +99,7 @@ def main():
 
 if __name__ == "__main__":
     # Set global logger
-    logger = create_logger()
+    logger = create_logger("update_cluster_values")
 
     # Check if two arguments are provided (not counting the script name)
     if len(sys.argv) != 3:
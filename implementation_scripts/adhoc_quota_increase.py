@@ -7,72 +7,25 @@ Description   : This script will increase the resource quota memory and CPU for
 """
 
 import argparse
-import logging
 import operator
-import os
-import subprocess
 import sys
-import types
-from datetime import datetime
+import time
 
 import kubernetes.client.rest
 import requests
-import yaml
 from kubernetes import client
 from urllib3.exceptions import InsecureRequestWarning
-
-
-def log_newline(self, how_many_lines=1):
-
-    # Switch formatter, output a blank line
-    self.handler.setFormatter(self.blank_formatter)
-
-    for i in range(how_many_lines):
-        self.info("")
-
-    # Switch back
-    self.handler.setFormatter(self.formatter)
-
-
-def create_logger():
-
-    # Create a handler
-    sh = logging.StreamHandler(sys.stdout)
-    handler = logging.FileHandler(
-        f"./logs/{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_adhoc_quota_increase.log",
-        mode="w",
-        encoding="utf-8",
-    )
-    handler.setLevel(logging.DEBUG)
-    formatter = logging.Formatter(
-        fmt="[%(asctime)s] %(levelname)8s : %(message)s",
-        datefmt="%a, %d %b %Y %H:%M:%S",
-    )
-    blank_formatter = logging.Formatter(fmt="")
-    handler.setFormatter(formatter)
-
-    # Create a logger, with the previously-defined handler
-    logger = logging.getLogger("logging_test")
-    logger.setLevel(logging.DEBUG)
-    logger.addHandler(handler)
-    sh.setFormatter(formatter)
-    logger.addHandler(sh)
-
-    # Save some data and add a method to logger object
-
-    logger.handler = handler
-    logger.formatter = formatter
-    logger.blank_formatter = blank_formatter
-    logger.newline = types.MethodType(log_newline, logger)
-
-    return logger
+from common.cluster_api import create_api_client, whoami
+from common.event_log import elapsed_ms
+from common.fast_read import QUOTA_FIELDS, read_view
+from common.logging_setup import create_logger
 
 
 def display_current_values(namespace, quota_name):
 
     try:
         requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
-        quota = core_api.read_namespaced_resource_quota(quota_name, namespace)
+        quota = read_view(core_api.read_namespaced_resource_quota, QUOTA_FIELDS, quota_name, namespace)
     except kubernetes.client.rest.ApiException as e:
         logger.error(
             f"Error retrieving resource quota '{quota_name}' in namespace '{namespace}'"
@@ -83,10 +36,10 @@ def display_current_values(namespace, quota_name):
         logger.error(f" - Message: {e.body}")
         return
 
-    requests_cpu = quota.spec.hard.get("requests.cpu")
-    requests_memory = quota.spec.hard.get("requests.memory")
-    limits_cpu = quota.spec.hard.get("limits.cpu")
-    limits_memory = quota.spec.hard.get("limits.memory")
+    requests_cpu = quota.hard.get("requests.cpu")
+    requests_memory = quota.hard.get("requests.memory")
+    limits_cpu = quota.hard.get("limits.cpu")
+    limits_memory = quota.hard.get("limits.memory")
     logger.info(f" - CPU Requests       : {requests_cpu}")
     logger.info(f" - CPU Limits         : {limits_cpu}")
     logger.info(f" - Memory Requests    : {requests_memory}")
@@ -102,6 +55,7 @@ def patch_namespace_quota(namespace, resources):
         f"Patching resource quota for namespace '{namespace}' with '{resources}'"
     )
     # Patch the resource quota for the namespace
+    start = time.monotonic()
     try:
         requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
         core_api.patch_namespaced_resource_quota(
@@ -109,7 +63,9 @@ def patch_namespace_quota(namespace, resources):
             namespace=namespace,
             body={"spec": {"hard": {**resources}}},
         )
+        logger.event("ResourceQuota", namespace, quota_name, "patch_quota", "success", 200, elapsed_ms(start), hard=resources)
     except kubernetes.client.rest.ApiException as e:
+        logger.event("ResourceQuota", namespace, quota_name, "patch_quota", "failed", e.status, elapsed_ms(start), hard=resources)
         logger.error(
             f"Error patching resource quota '{quota_name}' in namespace '{namespace}'"
         )
@@ -131,7 +87,7 @@ def calculate_namespace_resources(namespace):
     # Get the resource quota for the namespace.
     try:
         requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
-        quota = core_api.read_namespaced_resource_quota(quota_name, namespace)
+        quota = read_view(core_api.read_namespaced_resource_quota, QUOTA_FIELDS, quota_name, namespace)
     except kubernetes.client.rest.ApiException as e:
         logger.error(
             f"Error retrieving resource quota '{quota_name}' in namespace '{namespace}'"
@@ -142,10 +98,10 @@ def calculate_namespace_resources(namespace):
         logger.error(f" - Message: {e.body}")
         return
 
-    requests_cpu = quota.spec.hard.get("requests.cpu")
-    requests_memory = quota.spec.hard.get("requests.memory")
-    limits_cpu = quota.spec.hard.get("limits.cpu")
-    limits_memory = quota.spec.hard.get("limits.memory")
+    requests_cpu = quota.hard.get("requests.cpu")
+    requests_memory = quota.hard.get("requests.memory")
+    limits_cpu = quota.hard.get("limits.cpu")
+    limits_memory = quota.hard.get("limits.memory")
     requests_memory_unit = (
         "".join(filter(str.isalpha, requests_memory)) if requests_memory else None
     )
@@ -218,9 +174,9 @@ def check_quota(namespace):
     # Check if a resource quota exists in the namespace.
     try:
         requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
-        quota = core_api.read_namespaced_resource_quota(f"{namespace}-quota", namespace)
+        quota = read_view(core_api.read_namespaced_resource_quota, QUOTA_FIELDS, f"{namespace}-quota", namespace)
         logger.info(
-            f"Resource Quota '{quota.metadata.name}' exists in namespace '{namespace}'."
+            f"Resource Quota '{quota.name}' exists in namespace '{namespace}'."
         )
         return True
     except kubernetes.client.rest.ApiException as e:
@@ -261,12 +217,7 @@ def check_login():
 
     # Check if the user is logged in to the OpenShift cluster.
     # If not, prompt the user to log in and exit the script.
-    try:
-        subprocess.check_output(
-            ["oc", "whoami"],
-            stderr=subprocess.STDOUT,
-        )
-    except subprocess.CalledProcessError:
+    if not whoami(api_client):
         logger.error("UNAUTHORIZED...!! Please login to the cluster and try again... !")
         sys.exit(1)
 
@@ -315,7 +266,7 @@ def main():
 
 if __name__ == "__main__":
     # Set global logger
-    logger = create_logger()
+    logger = create_logger("adhoc_quota_increase")
 
     parser = argparse.ArgumentParser("adhoc_quota_increase")
 
@@ -327,37 +278,7 @@ if __name__ == "__main__":
     input_file = sys.argv[1]
 
     # Configure the Kubernetes client to connect to the OpenShift cluster.
-    output = subprocess.run(
-        ["oc", "whoami", "-t"],
-        capture_output=True,
-        text=True,
-    )
-    if output.returncode != 0:
-        logger.error("Unable to set KUBERNETES_TOKEN environment variable. Exiting...")
-        sys.exit(1)  # Exit if the token is not set
-    else:
-        os.environ["KUBERNETES_TOKEN"] = output.stdout.strip()
-
-    # Configure the Kubernetes client
-    configuration = client.Configuration()
-    configuration.api_key_prefix = {"authorization": "Bearer"}
-    configuration.api_key = {
-        "authorization": os.environ.get("KUBERNETES_TOKEN", "")
-    }  # Ensure the token is set in the environment variable
-    if not configuration.api_key["authorization"]:
-        logger.error("KUBERNETES_TOKEN environment variable is not set. Exiting...")
-        sys.exit(1)  # Exit if the token is not set
-    configuration.host = os.environ.get(
-        "KUBERNETES_HOST", ""
-    )  # Ensure the host is set in the environment variable
-    if not configuration.host:
-        logger.error("KUBERNETES_HOST environment variable is not set. Exiting...")
-        sys.exit(1)  # Exit if the host is not set
-    configuration.verify_ssl = (
-        False  # Disable SSL verification for local testing; set to True in production
-    )
-
-    api_client = client.ApiClient(configuration)
+    api_client = create_api_client()
 
     global core_api, apps_api  # Declare core_api and apps_api as global variables to use them in other functions
     core_api = client.CoreV1Api(api_client)
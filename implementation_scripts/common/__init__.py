@@ -0,0 +1,7 @@
+"""
+Filename      : __init__.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : Shared helpers used by the implementation, pre-check and backout scripts.
+"""
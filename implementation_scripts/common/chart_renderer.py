@@ -0,0 +1,369 @@
+"""
+Filename      : chart_renderer.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : Renders the same manifests as the charts/service-mesh-injected-gateway templates directly from the
+                cluster values file, without the helm binary. Any change to the chart templates must be mirrored here.
+"""
+
+import logging
+import math
+import re
+
+from common.quantity import parse_quantity
+
+logger = logging.getLogger("logging_test")
+
+CHART_NAME = "service-mesh-injected-gateway"
+
+SECRET_READER_RULES = [
+    {
+        "apiGroups": [""],
+        "resources": ["secrets"],
+        "verbs": ["get", "watch", "list"],
+    }
+]
+
+
+# Fields holding resource quantities, compared by value since the API server normalizes them ("0.5" -> "500m").
+QUANTITY_PATH = re.compile(r"\.(resources\.(requests|limits)|spec\.hard)\.")
+
+
+def default(value, default_value):
+
+    # Mirror the helm 'default' function, which treats every empty value as unset.
+    return value if value else default_value
+
+
+def render_resources(gateway):
+
+    # Mirror the 'with limits' / 'with requests' blocks of the deployment templates.
+    resources = {}
+    if gateway.get("limits"):
+        resources["limits"] = dict(gateway["limits"])
+    if gateway.get("requests"):
+        resources["requests"] = dict(gateway["requests"])
+    return resources
+
+
+def render_service_account(namespace, component_type):
+
+    # templates/injected-gw-<component_type>-sa.yaml
+    return {
+        "apiVersion": "v1",
+        "kind": "ServiceAccount",
+        "metadata": {
+            "name": f"injected-gateway-{component_type}-sa",
+            "namespace": namespace,
+        },
+    }
+
+
+def render_role(namespace, component_type):
+
+    # templates/injected-gw-<component_type>-role.yaml
+    return {
+        "apiVersion": "rbac.authorization.k8s.io/v1",
+        "kind": "Role",
+        "metadata": {
+            "name": f"injected-gateway-{component_type}-role",
+            "namespace": namespace,
+        },
+        "rules": [dict(rule) for rule in SECRET_READER_RULES],
+    }
+
+
+def render_role_binding(namespace, component_type):
+
+    # templates/injected-gw-<component_type>-rolebinding.yaml
+    return {
+        "apiVersion": "rbac.authorization.k8s.io/v1",
+        "kind": "RoleBinding",
+        "metadata": {
+            "name": f"injected-gateway-{component_type}-rb",
+            "namespace": namespace,
+        },
+        "roleRef": {
+            "apiGroup": "rbac.authorization.k8s.io",
+            "kind": "Role",
+            "name": f"injected-gateway-{component_type}-role",
+        },
+        "subjects": [
+            {
+                "kind": "ServiceAccount",
+                "name": f"injected-gateway-{component_type}-sa",
+            }
+        ],
+    }
+
+
+def render_ingress_service(namespace, gateway):
+
+    # templates/injected-gw-ingress-service.yaml
+    gateway_id = f"ig{gateway['id']}"
+    return {
+        "apiVersion": "v1",
+        "kind": "Service",
+        "metadata": {"name": gateway_id, "namespace": namespace},
+        "spec": {
+            "ports": [
+                {"name": "status-port", "port": 15021, "protocol": "TCP", "targetPort": 15021},
+                {"name": "http2", "port": 80, "protocol": "TCP", "targetPort": 8080},
+                {"name": "https", "port": 443, "protocol": "TCP", "targetPort": 8443},
+            ],
+            "selector": {"app": gateway_id, "istio": "ingressgateway"},
+            "sessionAffinity": "None",
+            "type": "ClusterIP",
+        },
+    }
+
+
+def render_egress_service(namespace, gateway):
+
+    # templates/injected-gw-egress-service.yaml
+    gateway_id = f"eg{gateway['id']}"
+    return {
+        "apiVersion": "v1",
+        "kind": "Service",
+        "metadata": {"name": gateway_id, "namespace": namespace},
+        "spec": {
+            "ports": [
+                {"name": "http2", "port": 80, "protocol": "TCP", "targetPort": 8080},
+                {"name": "https", "port": 443, "protocol": "TCP", "targetPort": 8443},
+            ],
+            "selector": {"app": gateway_id, "istio": "egressgateway"},
+            "sessionAffinity": "None",
+            "type": "ClusterIP",
+        },
+    }
+
+
+def render_ingress_deployment(namespace, gateway):
+
+    # templates/injected-gw-ingress-deployment.yaml
+    gateway_id = f"ig{gateway['id']}"
+    labels = {"app": gateway_id, "istio": "ingressgateway", "type": "injectedgateway"}
+    probe = {"path": "/healthz/ready", "port": 15021, "scheme": "HTTP"}
+    return {
+        "apiVersion": "apps/v1",
+        "kind": "Deployment",
+        "metadata": {"name": f"{gateway_id}-gateway", "namespace": namespace},
+        "spec": {
+            "replicas": default(gateway.get("replicas"), 1),
+            "selector": {"matchLabels": dict(labels)},
+            "template": {
+                "metadata": {
+                    "annotations": {"inject.istio.io/templates": "gateway"},
+                    "labels": {**labels, "sidecar.istio.io/inject": "true"},
+                },
+                "spec": {
+                    "serviceAccountName": "injected-gateway-ingress-sa",
+                    "containers": [
+                        {
+                            "name": "istio-proxy",
+                            "image": "auto",
+                            "imagePullPolicy": "IfNotPresent",
+                            "ports": [
+                                {"containerPort": 8080, "name": "http2", "protocol": "TCP"},
+                                {"containerPort": 8443, "name": "https", "protocol": "TCP"},
+                                {"containerPort": 15021, "name": "status-port", "protocol": "TCP"},
+                                {"containerPort": 15090, "name": "http-envoy-prom", "protocol": "TCP"},
+                            ],
+                            "livenessProbe": {
+                                "httpGet": dict(probe),
+                                "initialDelaySeconds": 5,
+                                "periodSeconds": 2,
+                            },
+                            "readinessProbe": {
+                                "failureThreshold": 30,
+                                "httpGet": dict(probe),
+                                "initialDelaySeconds": 1,
+                                "periodSeconds": 2,
+                                "successThreshold": 1,
+                                "timeoutSeconds": 1,
+                            },
+                            "resources": render_resources(gateway),
+                        }
+                    ],
+                },
+            },
+        },
+    }
+
+
+def render_egress_deployment(namespace, gateway):
+
+    # templates/injected-gw-egress-deployment.yaml
+    gateway_id = f"eg{gateway['id']}"
+    labels = {"app": gateway_id, "istio": "egressgateway", "type": "injectedgateway"}
+    probe = {"path": "/healthz/ready", "port": 15021, "scheme": "HTTP"}
+    return {
+        "apiVersion": "apps/v1",
+        "kind": "Deployment",
+        "metadata": {"name": f"{gateway_id}-gateway", "namespace": namespace},
+        "spec": {
+            "replicas": default(gateway.get("replicas"), 1),
+            "selector": {"matchLabels": dict(labels)},
+            "template": {
+                "metadata": {
+                    "annotations": {"inject.istio.io/templates": "gateway"},
+                    "labels": {**labels, "sidecar.istio.io/inject": "true"},
+                },
+                "spec": {
+                    "serviceAccountName": "injected-gateway-egress-sa",
+                    "containers": [
+                        {
+                            "name": "istio-proxy",
+                            "image": "auto",
+                            "ports": [
+                                {"containerPort": 8080, "name": "http2", "protocol": "TCP"},
+                                {"containerPort": 8443, "name": "https", "protocol": "TCP"},
+                                {"containerPort": 15021, "name": "status-port", "protocol": "TCP"},
+                            ],
+                            "livenessProbe": {
+                                "httpGet": dict(probe),
+                                "initialDelaySeconds": 5,
+                                "periodSeconds": 5,
+                            },
+                            "readinessProbe": {
+                                "failureThreshold": 3,
+                                "httpGet": dict(probe),
+                                "initialDelaySeconds": 5,
+                                "periodSeconds": 5,
+                                "successThreshold": 2,
+                                "timeoutSeconds": 5,
+                            },
+                            "resources": render_resources(gateway),
+                        }
+                    ],
+                },
+            },
+        },
+    }
+
+
+def render_project(project):
+
+    # Render every object the chart creates for a single project entry of the values file.
+    namespace = project["namespace"]
+    ingress = project.get("ingress") or {}
+    egress = project.get("egress") or {}
+    objects = []
+
+    if egress.get("injected_egress"):
+        objects.append(render_service_account(namespace, "egress"))
+        objects.append(render_role(namespace, "egress"))
+        objects.append(render_role_binding(namespace, "egress"))
+    if ingress.get("injected_ingress"):
+        objects.append(render_service_account(namespace, "ingress"))
+        objects.append(render_role(namespace, "ingress"))
+        objects.append(render_role_binding(namespace, "ingress"))
+    if egress.get("create_service"):
+        objects.append(render_egress_service(namespace, egress))
+    if ingress.get("create_service"):
+        objects.append(render_ingress_service(namespace, ingress))
+    if egress.get("injected_egress"):
+        objects.append(render_egress_deployment(namespace, egress))
+    if ingress.get("injected_ingress"):
+        objects.append(render_ingress_deployment(namespace, ingress))
+
+    return objects
+
+
+def render_values(cluster_values, namespaces=None):
+
+    # Render the chart for every project in the values file, or only for the given namespaces.
+    rendered = []
+    for project in cluster_values.get("project") or []:
+        if namespaces is not None and project.get("namespace") not in namespaces:
+            continue
+        rendered.extend(render_project(project))
+    return rendered
+
+
+def validate_values(cluster_values, namespaces=None):
+
+    # Check the values file for everything that would make 'helm upgrade' fail or render broken objects.
+    errors = []
+
+    if not isinstance(cluster_values, dict) or "project" not in cluster_values:
+        return ["The cluster values file does not contain 'project' key."]
+
+    seen_namespaces = set()
+    seen_ids = {}
+
+    for index, project in enumerate(cluster_values["project"] or []):
+        namespace = project.get("namespace") if isinstance(project, dict) else None
+        if not namespace:
+            errors.append(f"project[{index}] has no 'namespace'.")
+            continue
+        if namespaces is not None and namespace not in namespaces:
+            continue
+        if namespace in seen_namespaces:
+            errors.append(f"Namespace '{namespace}' is defined more than once.")
+        seen_namespaces.add(namespace)
+
+        for component_type, prefix in (("ingress", "ig"), ("egress", "eg")):
+            if component_type not in project:
+                errors.append(
+                    f"Namespace '{namespace}' has no '{component_type}' block; the chart templates require it."
+                )
+                continue
+            gateway = project[component_type] or {}
+            enabled = gateway.get(f"injected_{component_type}") or gateway.get("create_service")
+            if not enabled:
+                continue
+            if gateway.get("id") in (None, ""):
+                errors.append(f"Namespace '{namespace}' {component_type} is enabled but has no 'id'.")
+                continue
+            gateway_id = f"{prefix}{gateway['id']}"
+            if gateway_id in seen_ids:
+                errors.append(
+                    f"Gateway '{gateway_id}' is defined in both '{seen_ids[gateway_id]}' and '{namespace}'."
+                )
+            seen_ids[gateway_id] = namespace
+            replicas = gateway.get("replicas")
+            if replicas is not None and (not isinstance(replicas, int) or replicas < 0):
+                errors.append(f"Namespace '{namespace}' {component_type} has invalid replicas '{replicas}'.")
+            for key in ("requests", "limits"):
+                if gateway.get(key) is not None and not isinstance(gateway[key], dict):
+                    errors.append(f"Namespace '{namespace}' {component_type} '{key}' must be a mapping.")
+
+    return errors
+
+
+def diff_object(rendered, live, path=""):
+
+    # Return the paths where the live object differs from the rendered one.
+    # Only fields set by the chart are compared; fields defaulted by the API server are ignored.
+    differences = []
+
+    if isinstance(rendered, dict):
+        if not isinstance(live, dict):
+            return [path or "."]
+        for key, value in rendered.items():
+            differences.extend(diff_object(value, live.get(key), f"{path}.{key}"))
+    elif isinstance(rendered, list):
+        if not isinstance(live, list) or len(live) != len(rendered):
+            return [path]
+        for index, value in enumerate(rendered):
+            differences.extend(diff_object(value, live[index], f"{path}[{index}]"))
+    elif not same_value(rendered, live, path):
+        differences.append(path)
+
+    return differences
+
+
+def same_value(rendered, live, path):
+
+    # Compare two leaf values, resource quantities by the amount they stand for.
+    if QUANTITY_PATH.search(path):
+        try:
+            rendered_amount, live_amount = parse_quantity(rendered), parse_quantity(live)
+        except (ValueError, TypeError):
+            pass
+        else:
+            if not (math.isnan(rendered_amount) or math.isnan(live_amount)):
+                return math.isclose(rendered_amount, live_amount, rel_tol=1e-9)
+    return str(rendered) == str(live)
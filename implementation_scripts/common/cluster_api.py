@@ -0,0 +1,328 @@
+"""
+Filename      : cluster_api.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : In-process replacements for the oc commands the scripts used to run (oc whoami, oc whoami -t, oc get,
+                oc patch, oc apply --server-side) through the kubernetes client. Objects are returned as the same dicts
+                'oc get -o yaml' printed, so the scripts keep working on the exact same data without forking oc.
+"""
+
+import logging
+import sys
+
+import kubernetes.client.rest
+import requests
+from kubernetes import client
+from urllib3.exceptions import InsecureRequestWarning
+
+from common.credentials import RefreshingApiClient, get_provider
+from common.fast_read import LIST_CHUNK_SIZE, loads
+
+logger = logging.getLogger("logging_test")
+
+SMCP_NAME = "app-mesh-01"
+SMMR_NAME = "default"
+CONTROL_PLANE_NAMESPACE = "istio-system"
+
+# oc resource name -> (api, read method, list all method, list namespaced method, api version, kind)
+CORE_RESOURCES = {
+    "namespace": ("core", "read_namespace", "list_namespace", None, "v1", "Namespace"),
+    "quota": (
+        "core",
+        "read_namespaced_resource_quota",
+        "list_resource_quota_for_all_namespaces",
+        "list_namespaced_resource_quota",
+        "v1",
+        "ResourceQuota",
+    ),
+    "limitrange": (
+        "core",
+        "read_namespaced_limit_range",
+        "list_limit_range_for_all_namespaces",
+        "list_namespaced_limit_range",
+        "v1",
+        "LimitRange",
+    ),
+    "svc": ("core", "read_namespaced_service", "list_service_for_all_namespaces", "list_namespaced_service", "v1", "Service"),
+    "sa": (
+        "core",
+        "read_namespaced_service_account",
+        "list_service_account_for_all_namespaces",
+        "list_namespaced_service_account",
+        "v1",
+        "ServiceAccount",
+    ),
+    "deployment": (
+        "apps",
+        "read_namespaced_deployment",
+        "list_deployment_for_all_namespaces",
+        "list_namespaced_deployment",
+        "apps/v1",
+        "Deployment",
+    ),
+    "hpa": (
+        "autoscaling",
+        "read_namespaced_horizontal_pod_autoscaler",
+        "list_horizontal_pod_autoscaler_for_all_namespaces",
+        "list_namespaced_horizontal_pod_autoscaler",
+        "autoscaling/v2",
+        "HorizontalPodAutoscaler",
+    ),
+    "role": (
+        "auth",
+        "read_namespaced_role",
+        "list_role_for_all_namespaces",
+        "list_namespaced_role",
+        "rbac.authorization.k8s.io/v1",
+        "Role",
+    ),
+    "rolebinding": (
+        "auth",
+        "read_namespaced_role_binding",
+        "list_role_binding_for_all_namespaces",
+        "list_namespaced_role_binding",
+        "rbac.authorization.k8s.io/v1",
+        "RoleBinding",
+    ),
+}
+
+# oc resource name -> (group, version, plural, kind) of the custom resources.
+CUSTOM_RESOURCES = {
+    "smcp": ("maistra.io", "v2", "servicemeshcontrolplanes", "ServiceMeshControlPlane"),
+    "smmr": ("maistra.io", "v1", "servicemeshmemberrolls", "ServiceMeshMemberRoll"),
+    "route": ("route.openshift.io", "v1", "routes", "Route"),
+}
+
+# Aliases accepted by oc for the same resources.
+RESOURCE_ALIASES = {
+    "resourcequota": "quota",
+    "limits": "limitrange",
+    "horizontalpodautoscaler": "hpa",
+    "service": "svc",
+    "serviceaccount": "sa",
+    "ns": "namespace",
+    "servicemeshcontrolplane": "smcp",
+    "servicemeshmemberroll": "smmr",
+}
+
+
+def create_api_client(context_name=None):
+
+    # Configure the Kubernetes client from KUBERNETES_HOST/KUBERNETES_TOKEN, the in-cluster service account or the
+    # kubeconfig context, see common/credentials.py.
+    provider = get_provider(context_name)
+    configuration = client.Configuration()
+    if not provider.configure(configuration):
+        logger.error(
+            "Unable to find cluster credentials in KUBERNETES_HOST/KUBERNETES_TOKEN, the service account or the kubeconfig. Exiting..."
+        )
+        sys.exit(1)  # Exit if no credentials are found
+    if not configuration.api_key.get("authorization") and not configuration.cert_file:
+        logger.error("Unable to find a login token or client certificate for the cluster. Exiting...")
+        sys.exit(1)  # Exit if the token is not set
+
+    if not configuration.verify_ssl:
+        # Disable warnings for certificate verification
+        requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+
+    return RefreshingApiClient(configuration, provider)
+
+
+def whoami(api_client):
+
+    # Same as 'oc whoami': the name of the logged in user, None when the token is not accepted.
+    try:
+        user = client.CustomObjectsApi(api_client).get_cluster_custom_object(
+            "user.openshift.io", "v1", "users", "~", _preload_content=False
+        )
+        return loads(user.data)["metadata"]["name"]
+    except kubernetes.client.rest.ApiException:
+        return None
+
+
+def resource_type(resource):
+
+    # Normalize an oc resource name, e.g. 'rolebindings' or 'resourcequota'.
+    resource = resource.lower()
+    resource = RESOURCE_ALIASES.get(resource, resource)
+    if resource not in CORE_RESOURCES and resource not in CUSTOM_RESOURCES and resource.endswith("s"):
+        resource = RESOURCE_ALIASES.get(resource[:-1], resource[:-1])
+    if resource not in CORE_RESOURCES and resource not in CUSTOM_RESOURCES:
+        raise ValueError(f"Unsupported resource type '{resource}'")
+    return resource
+
+
+def typed_api(api_client, api):
+
+    # Typed API class of a core resource.
+    return {
+        "core": client.CoreV1Api,
+        "apps": client.AppsV1Api,
+        "auth": client.RbacAuthorizationV1Api,
+        "autoscaling": client.AutoscalingV2Api,
+    }[api](api_client)
+
+
+def get_object(api_client, resource, name, namespace=None):
+
+    # Same as 'oc get <resource> <name> -n <namespace> -o yaml'. Raises ApiException on failure.
+    resource = resource_type(resource)
+    if resource in CUSTOM_RESOURCES:
+        group, version, plural, kind = CUSTOM_RESOURCES[resource]
+        response = client.CustomObjectsApi(api_client).get_namespaced_custom_object(
+            group, version, namespace, plural, name, _preload_content=False
+        )
+    else:
+        api, read_method, list_all_method, list_method, api_version, kind = CORE_RESOURCES[resource]
+        read = getattr(typed_api(api_client, api), read_method)
+        if namespace is None:
+            response = read(name, _preload_content=False)
+        else:
+            response = read(name, namespace, _preload_content=False)
+    return loads(response.data)
+
+
+def list_objects(api_client, resource, namespace=None, label_selector=None, field_selector=None):
+
+    # Same as 'oc get <resource> [-n <namespace> | -A] [-l <selector>] [--field-selector <selector>] -o yaml': a List
+    # whose items carry their apiVersion and kind. Pages through the results like oc does. Raises ApiException on
+    # failure.
+    resource = resource_type(resource)
+    kwargs = {"limit": LIST_CHUNK_SIZE, "_preload_content": False}
+    if label_selector:
+        kwargs["label_selector"] = label_selector
+    if field_selector:
+        kwargs["field_selector"] = field_selector
+
+    if resource in CUSTOM_RESOURCES:
+        group, version, plural, kind = CUSTOM_RESOURCES[resource]
+        api_version = f"{group}/{version}"
+        custom_api = client.CustomObjectsApi(api_client)
+        if namespace is None:
+            list_call = lambda **options: custom_api.list_cluster_custom_object(group, version, plural, **options)
+        else:
+            list_call = lambda **options: custom_api.list_namespaced_custom_object(group, version, namespace, plural, **options)
+    else:
+        api, read_method, list_all_method, list_method, api_version, kind = CORE_RESOURCES[resource]
+        typed = typed_api(api_client, api)
+        if namespace is None or list_method is None:
+            list_call = getattr(typed, list_all_method)
+        else:
+            list_call = lambda **options: getattr(typed, list_method)(namespace, **options)
+
+    items = []
+    continue_token = None
+    while True:
+        if continue_token:
+            kwargs["_continue"] = continue_token
+        page = loads(list_call(**kwargs).data)
+        for item in page.get("items") or []:
+            items.append({"apiVersion": api_version, "kind": kind, **item})
+        continue_token = (page.get("metadata") or {}).get("continue")
+        if not continue_token:
+            break
+
+    return {"apiVersion": "v1", "items": items, "kind": "List", "metadata": {"resourceVersion": ""}}
+
+
+def patch_method(api_client, resource):
+
+    # Typed patch method of a core resource, e.g. patch_namespaced_role for read_namespaced_role.
+    api, read_method, list_all_method, list_method, api_version, kind = CORE_RESOURCES[resource]
+    return getattr(typed_api(api_client, api), read_method.replace("read_", "patch_", 1))
+
+
+def patch_object(api_client, resource, name, namespace, patch, dry_run=None):
+
+    # Same as 'oc patch <resource> <name> -n <namespace> --type=json|strategic -p <patch> [--dry-run=server]' with
+    # dry_run="All": a list is sent as a JSON patch, a dict as a strategic merge patch (a merge patch for the custom
+    # resources), where None removes a field. Raises ApiException on failure.
+    resource = resource_type(resource)
+    kwargs = {"dry_run": dry_run} if dry_run else {}
+    if isinstance(patch, list):
+        content_type = "application/json-patch+json"
+    elif resource in CUSTOM_RESOURCES:
+        content_type = "application/merge-patch+json"
+    else:
+        content_type = "application/strategic-merge-patch+json"
+
+    if resource in CUSTOM_RESOURCES:
+        group, version, plural, kind = CUSTOM_RESOURCES[resource]
+        response = client.CustomObjectsApi(api_client).patch_namespaced_custom_object(
+            group,
+            version,
+            namespace,
+            plural,
+            name,
+            patch,
+            _content_type=content_type,
+            _preload_content=False,
+            **kwargs,
+        )
+    else:
+        patch_call = patch_method(api_client, resource)
+        args = (name, patch) if namespace is None else (name, namespace, patch)
+        response = patch_call(*args, _content_type=content_type, _preload_content=False, **kwargs)
+    return loads(response.data)
+
+
+def apply_object(api_client, obj, field_manager, dry_run=None):
+
+    # Same as 'oc apply --server-side --force-conflicts --field-manager=<field_manager> -f <file>
+    # [--dry-run=server]' with dry_run="All": the API server merges the object into the live one, or creates it,
+    # in one request. Raises ApiException on failure.
+    resource = resource_type(obj["kind"])
+    name = obj["metadata"]["name"]
+    namespace = obj["metadata"].get("namespace")
+    kwargs = {
+        "field_manager": field_manager,
+        "force": True,
+        "_content_type": "application/apply-patch+yaml",
+        "_preload_content": False,
+    }
+    if dry_run:
+        kwargs["dry_run"] = dry_run
+
+    if resource in CUSTOM_RESOURCES:
+        group, version, plural, kind = CUSTOM_RESOURCES[resource]
+        response = client.CustomObjectsApi(api_client).patch_namespaced_custom_object(
+            group, version, namespace, plural, name, obj, **kwargs
+        )
+    else:
+        patch_call = patch_method(api_client, resource)
+        args = (name, obj) if namespace is None else (name, namespace, obj)
+        response = patch_call(*args, **kwargs)
+    return loads(response.data)
+
+
+def get_route_host(api_client, namespace, name):
+
+    # Same as 'oc get route <name> -n <namespace> -o jsonpath={.spec.host}'. Raises ApiException on failure.
+    return get_object(api_client, "route", name, namespace).get("spec", {}).get("host", "")
+
+
+def read_or_exit(api_client, resource, name, namespace):
+
+    # Read one of the objects a script cannot run without, exit when it cannot be read.
+    try:
+        return get_object(api_client, resource, name, namespace)
+    except kubernetes.client.rest.ApiException as e:
+        logger.error(f"Error reading {resource} '{name}' in namespace '{namespace}'")
+        logger.error("Error details: ")
+        logger.error(f" - Reason: {e.reason}")
+        logger.error(f" - Status: {e.status}")
+        logger.error(f" - Message: {e.body}")
+        sys.exit(1)
+
+
+def get_smcp(api_client):
+
+    # Same as 'oc get smcp app-mesh-01 -n istio-system -o yaml'.
+    return read_or_exit(api_client, "smcp", SMCP_NAME, CONTROL_PLANE_NAMESPACE)
+
+
+def get_smmr(api_client):
+
+    # Same as 'oc get smmr default -n istio-system -o yaml'.
+    return read_or_exit(api_client, "smmr", SMMR_NAME, CONTROL_PLANE_NAMESPACE)
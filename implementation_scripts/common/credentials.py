@@ -0,0 +1,267 @@
+"""
+Filename      : credentials.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : Cluster credential provider. Resolves the API server, token and CA bundle from KUBERNETES_HOST and
+                KUBERNETES_TOKEN, the in-cluster service account or the kubeconfig context, without needing the oc
+                binary. The credentials are cached for the session and the token is reloaded when the server
+                answers 401, e.g. after a service account token rotation or a new 'oc login'.
+"""
+
+import atexit
+import base64
+import logging
+import os
+import tempfile
+import threading
+
+import yaml
+from kubernetes import client
+
+logger = logging.getLogger("logging_test")
+
+SERVICE_ACCOUNT_DIR = "/var/run/secrets/kubernetes.io/serviceaccount"
+
+# Optional settings, all read from the environment.
+CONTEXT_ENV = "SMESH_KUBE_CONTEXT"
+CA_FILE_ENV = "KUBERNETES_CA_FILE"
+INSECURE_ENV = "SMESH_INSECURE_SKIP_TLS_VERIFY"
+
+# Connections kept open per host, the same as the worker pools of the scripts so every worker reuses its TLS session.
+CONNECTION_POOL_MAXSIZE = 10
+
+
+def is_true(value):
+
+    # Environment flags: true, yes, 1.
+    return str(value or "").strip().lower() in ("true", "yes", "1")
+
+
+def read_file(path):
+
+    # Content of a file, stripped, None when it cannot be read.
+    try:
+        with open(path, "r") as file:
+            return file.read().strip()
+    except OSError:
+        return None
+
+
+def load_env_credentials():
+
+    # KUBERNETES_HOST and KUBERNETES_TOKEN exported by hand or by the pipeline.
+    host = os.environ.get("KUBERNETES_HOST")
+    token = os.environ.get("KUBERNETES_TOKEN")
+    if not host or not token:
+        return None
+    ca_file = os.environ.get(CA_FILE_ENV)
+    return {
+        "source": "environment",
+        "host": host,
+        "token": token,
+        "ca_file": ca_file,
+        # Keep the historical behaviour of not verifying when no CA bundle is given.
+        "insecure": not ca_file,
+    }
+
+
+def load_in_cluster_credentials():
+
+    # Service account token and CA mounted in the pod, when running from a CI pod.
+    token_file = os.path.join(SERVICE_ACCOUNT_DIR, "token")
+    service_host = os.environ.get("KUBERNETES_SERVICE_HOST")
+    if not service_host or not os.path.isfile(token_file):
+        return None
+    service_port = os.environ.get("KUBERNETES_SERVICE_PORT", "443")
+    if ":" in service_host:
+        service_host = f"[{service_host}]"
+    return {
+        "source": "in-cluster",
+        "host": f"https://{service_host}:{service_port}",
+        "token_file": token_file,
+        "ca_file": os.path.join(SERVICE_ACCOUNT_DIR, "ca.crt"),
+        "insecure": False,
+    }
+
+
+def kubeconfig_path():
+
+    # First file of KUBECONFIG, or the default kubeconfig 'oc login' writes.
+    return os.environ.get("KUBECONFIG", "").split(os.pathsep)[0] or os.path.expanduser("~/.kube/config")
+
+
+def load_kubeconfig_credentials(context_name=None):
+
+    # Server, token, CA and client certificate of a kubeconfig context, the current context by default.
+    path = kubeconfig_path()
+    try:
+        with open(path, "r") as file:
+            config = yaml.safe_load(file) or {}
+    except (OSError, yaml.YAMLError):
+        return None
+
+    context_name = context_name or config.get("current-context")
+    contexts = {item["name"]: item.get("context") or {} for item in config.get("contexts") or []}
+    if context_name not in contexts:
+        return None
+    context = contexts[context_name]
+    cluster = {item["name"]: item.get("cluster") or {} for item in config.get("clusters") or []}.get(context.get("cluster"), {})
+    user = {item["name"]: item.get("user") or {} for item in config.get("users") or []}.get(context.get("user"), {})
+    if not cluster.get("server"):
+        return None
+
+    # Relative file names in a kubeconfig are relative to the kubeconfig itself.
+    base_dir = os.path.dirname(os.path.abspath(path))
+    resolve = lambda name: os.path.join(base_dir, name) if name and not os.path.isabs(name) else name
+
+    return {
+        "source": f"kubeconfig context '{context_name}'",
+        "host": cluster["server"],
+        "token": user.get("token"),
+        "token_file": resolve(user.get("tokenFile")),
+        "ca_file": resolve(cluster.get("certificate-authority")),
+        "ca_data": cluster.get("certificate-authority-data"),
+        "cert_file": resolve(user.get("client-certificate")),
+        "cert_data": user.get("client-certificate-data"),
+        "key_file": resolve(user.get("client-key")),
+        "key_data": user.get("client-key-data"),
+        "insecure": bool(cluster.get("insecure-skip-tls-verify")),
+    }
+
+
+class CredentialProvider:
+
+    # Resolve the credentials once per session, in order: environment, in-cluster service account, kubeconfig.
+    # A named context always comes from the kubeconfig.
+    def __init__(self, context_name=None):
+        self.context_name = context_name
+        self.lock = threading.Lock()
+        self.cached = None
+        self.temp_files = {}
+        atexit.register(self.cleanup)
+
+    def resolve(self):
+        if self.context_name:
+            return load_kubeconfig_credentials(self.context_name)
+        return (
+            load_env_credentials()
+            or load_in_cluster_credentials()
+            or load_kubeconfig_credentials()
+        )
+
+    def credentials(self):
+
+        # Cached credentials with the token loaded, None when no source is available.
+        with self.lock:
+            if self.cached is None:
+                credentials = self.resolve()
+                if credentials:
+                    credentials["token"] = self.load_token(credentials)
+                    logger.debug(f"Using cluster credentials from the {credentials['source']}.")
+                self.cached = credentials
+            return self.cached
+
+    def load_token(self, credentials):
+
+        # Token files are read again on every refresh, service account tokens are rotated by the kubelet.
+        if credentials.get("token_file"):
+            return read_file(credentials["token_file"]) or credentials.get("token")
+        return credentials.get("token")
+
+    def refresh(self):
+
+        # Called on 401: resolve the credentials again and return the new token, None when it did not change.
+        with self.lock:
+            previous = (self.cached or {}).get("token")
+            credentials = self.resolve()
+            if not credentials:
+                return None
+            credentials["token"] = self.load_token(credentials)
+            self.cached = credentials
+        if credentials["token"] and credentials["token"] != previous:
+            logger.info(f"Reloaded the cluster token from the {credentials['source']}.")
+            return credentials["token"]
+        return None
+
+    def materialize(self, credentials, key):
+
+        # File holding the CA bundle or client certificate: the file from the config, or the inline base64 data
+        # written once to a private temporary file for the rest of the session.
+        if credentials.get(f"{key}_file"):
+            return credentials[f"{key}_file"]
+        data = credentials.get(f"{key}_data")
+        if not data:
+            return None
+        with self.lock:
+            if data not in self.temp_files:
+                handle, path = tempfile.mkstemp(prefix=f"smesh-{key}-", suffix=".pem")
+                with os.fdopen(handle, "wb") as file:
+                    file.write(base64.b64decode(data))
+                self.temp_files[data] = path
+            return self.temp_files[data]
+
+    def configure(self, configuration):
+
+        # Fill a kubernetes client configuration, returns False when no credentials were found.
+        credentials = self.credentials()
+        if not credentials:
+            return False
+
+        configuration.host = credentials["host"]
+        if credentials.get("token"):
+            configuration.api_key_prefix = {"authorization": "Bearer"}
+            configuration.api_key = {"authorization": credentials["token"]}
+        configuration.cert_file = self.materialize(credentials, "cert")
+        configuration.key_file = self.materialize(credentials, "key")
+
+        configuration.verify_ssl = not (credentials.get("insecure") or is_true(os.environ.get(INSECURE_ENV)))
+        if configuration.verify_ssl:
+            configuration.ssl_ca_cert = self.materialize(credentials, "ca")
+
+        configuration.connection_pool_maxsize = CONNECTION_POOL_MAXSIZE
+        return True
+
+    def cleanup(self):
+
+        # Remove the temporary CA and certificate files.
+        for path in self.temp_files.values():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class RefreshingApiClient(client.ApiClient):
+
+    # ApiClient that reloads the token and retries once when the server answers 401 Unauthorized.
+    def __init__(self, configuration, provider):
+        super().__init__(configuration)
+        self.provider = provider
+
+    def call_api(self, method, url, header_params=None, *args, **kwargs):
+        response = super().call_api(method, url, header_params, *args, **kwargs)
+        if response.status != 401:
+            return response
+
+        token = self.provider.refresh()
+        if not token:
+            return response
+        # Read the 401 body so its connection goes back to the pool before the retry.
+        response.read()
+        self.configuration.api_key = {"authorization": token}
+        header_params = {key: value for key, value in (header_params or {}).items() if key.lower() != "authorization"}
+        header_params["authorization"] = f"Bearer {token}"
+        return super().call_api(method, url, header_params, *args, **kwargs)
+
+
+_provider = {}
+
+
+def get_provider(context_name=None):
+
+    # One provider per context and process, so the token and CA bundle are loaded once per session.
+    context_name = context_name or os.environ.get(CONTEXT_ENV)
+    if context_name not in _provider:
+        _provider[context_name] = CredentialProvider(context_name)
+    return _provider[context_name]
@@ -0,0 +1,106 @@
+"""
+Filename      : dry_run.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : Server-side rehearsal of the --dry-run modes. The changes a script would make are collected while it
+                runs and then sent concurrently with dryRun=All, so validation, admission webhooks and quota problems
+                surface in the rehearsal instead of during the change window. The results are logged as one report.
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import kubernetes.client.rest
+
+from common.event_log import elapsed_ms
+from common.fast_read import loads
+
+logger = logging.getLogger("logging_test")
+
+
+def planned_change(kind, namespace, name, action, call, *args, **kwargs):
+
+    # A change a dry run rehearses: the API call and its arguments, sent later with dry_run="All". Typed API calls
+    # should pass _preload_content=False, the response of a rehearsal is never read.
+    return {
+        "kind": kind,
+        "namespace": namespace,
+        "name": name,
+        "action": action,
+        "call": call,
+        "args": args,
+        "kwargs": kwargs,
+    }
+
+
+def error_message(e):
+
+    # Message of the Status the API server returned, the reason when the body is not a Status.
+    try:
+        return loads(e.body).get("message") or e.reason
+    except (TypeError, ValueError, AttributeError):
+        return e.reason
+
+
+def rehearse_change(change):
+
+    # Send one change with dryRun=All and return its result, the API server validates it without persisting it.
+    start = time.monotonic()
+    result = {key: change[key] for key in ("kind", "namespace", "name", "action")}
+    try:
+        change["call"](*change["args"], dry_run="All", **change["kwargs"])
+        result.update({"accepted": True, "status": 200, "reason": None, "message": None})
+    except kubernetes.client.rest.ApiException as e:
+        result.update({"accepted": False, "status": e.status, "reason": e.reason, "message": error_message(e)})
+    result["latency_ms"] = elapsed_ms(start)
+    logger.event(
+        result["kind"], result["namespace"], result["name"], result["action"],
+        "dry_run_accepted" if result["accepted"] else "dry_run_rejected", result["status"], result["latency_ms"],
+        reason=result["reason"],
+    )
+    return result
+
+
+def rehearse(changes, max_workers=10):
+
+    # Send every planned change concurrently with dryRun=All, results in the order of the changes.
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(rehearse_change, changes))
+
+
+def log_report(results):
+
+    # One report of the rehearsal: totals, every rejected change and the rejections per reason.
+    # Returns True when the API server accepted every change.
+    rejected = [result for result in results if not result["accepted"]]
+
+    logger.newline()
+    logger.info(
+        "============================   DRY RUN Validation Report   ============================"
+    )
+    logger.info(f"Changes validated by the API server with dryRun=All : {len(results)}")
+    logger.info(f" - Accepted : {len(results) - len(rejected)}")
+    logger.info(f" - Rejected : {len(rejected)}")
+
+    if rejected:
+        logger.newline()
+        logger.error("Changes the API server would reject:")
+        for result in rejected:
+            target = f"{result['namespace']}/{result['name']}" if result["namespace"] else result["name"]
+            logger.error(f" - [{result['status']} {result['reason']}] {result['kind']} '{target}' {result['action']}")
+            logger.error(f"     {result['message']}")
+
+        reasons = {}
+        for result in rejected:
+            key = f"{result['status']} {result['reason']}"
+            reasons[key] = reasons.get(key, 0) + 1
+        logger.newline()
+        logger.error("Rejections by reason: " + ", ".join(f"{key}={count}" for key, count in sorted(reasons.items())))
+
+    logger.info(
+        "====================================================================================="
+    )
+    logger.newline()
+    return not rejected
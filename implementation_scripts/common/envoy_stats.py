@@ -0,0 +1,383 @@
+"""
+Filename      : envoy_stats.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : Envoy stats of the SMCP and injected gateways. Pulls /stats/prometheus from the http-envoy-prom port
+                (15090) of every gateway pod concurrently through one pooled requests.Session, parses the response as
+                a stream keeping only the downstream request, 5xx and active connection stats, or the istio_requests_total
+                and server connection stats the default Istio stats matcher exports instead, and compares the
+                request rates and active connections of the old SMCP gateway and the new injected gateway of every
+                namespace. Both gateways sit behind the same Service, so while the SMCP pods are ready they keep their
+                share of the requests: before the scale down the injected gateway is checked to take its own share
+                without errors, and only after the SMCP pods have left the endpoints are they checked to be drained.
+"""
+
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import kubernetes.client.rest
+import requests
+from requests.adapters import HTTPAdapter
+
+from common.event_log import elapsed_ms
+from common.fast_read import POD_IP_FIELDS, REPLICA_FIELDS, list_views, read_raw, read_view
+
+logger = logging.getLogger("logging_test")
+
+# http-envoy-prom port of the gateway pods. SMESH_ENVOY_STATS_URL replaces the URL, e.g. to scrape through a
+# port-forward or a local stand-in: http://127.0.0.1:19090/{namespace}/{pod}/stats/prometheus
+ENVOY_STATS_PORT = 15090
+STATS_URL = "http://{pod_ip}:" + str(ENVOY_STATS_PORT) + "/stats/prometheus"
+STATS_URL_ENV = "SMESH_ENVOY_STATS_URL"
+
+# Pods scraped at the same time, and connections kept open per pod.
+MAX_WORKERS = 10
+REQUEST_TIMEOUT = 10
+
+# Seconds between the two scrapes the rates are computed from.
+DEFAULT_INTERVAL = 10
+
+# The old gateway is drained below this many requests per second and active downstream connections.
+DRAIN_MAX_RPS = 0.5
+DRAIN_MAX_CONNECTIONS = 5
+
+# The injected gateway has taken over its part of the traffic when it serves at least 80% of its share of the
+# Service pods, the Service does not balance requests exactly, with at most 1% of them answered 5xx.
+TAKEOVER_MIN_SHARE_RATIO = 0.8
+TAKEOVER_MAX_ERROR_RATIO = 0.01
+
+# Stat -> traffic field. Only these lines are parsed, every other line of the response is skipped.
+TRAFFIC_STATS = {
+    "envoy_http_downstream_rq_total": "requests",
+    "envoy_http_downstream_rq_xx": "errors",
+    "envoy_http_downstream_cx_active": "active_connections",
+}
+
+# Istio standard metric and Envoy server stat, exported by every gateway with the default proxyStatsMatcher, which
+# leaves out the downstream stats above. They count a traffic field the pod does not export a downstream stat for.
+FALLBACK_STATS = {
+    "istio_requests_total": "requests",
+    "envoy_server_total_connections": "active_connections",
+}
+
+# Connection managers of Envoy itself (admin, Prometheus and status ports), not gateway traffic.
+INTERNAL_PREFIXES = ("admin", "prometheus_stats", "agent", "inbound_0.0.0.0_15090", "inbound_0.0.0.0_15021")
+
+LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def create_session():
+
+    # Session shared by every scrape, keep-alive connections per pod.
+    adapter = HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS, max_retries=0)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def parse_sample(line):
+
+    # Name, labels and value of one sample line, e.g. name{label="value"} 12.
+    brace = line.find("{")
+    if brace == -1:
+        name, _, rest = line.partition(" ")
+        return name, {}, float(rest.split()[0])
+    close = line.rfind("}")
+    labels = dict(LABEL.findall(line, brace, close))
+    return line[:brace], labels, float(line[close + 1:].split()[0])
+
+
+def parse_stats(lines):
+
+    # Traffic totals of one pod from the lines of /stats/prometheus, parsed as they arrive, and the traffic fields
+    # no stat was exported for: (totals, missing). Only the lines of the traffic and fallback stats are parsed,
+    # comments and every other stat are skipped on their first characters. A field is counted from the fallback
+    # stats only when the pod exports no downstream stat for it.
+    totals = {field: 0.0 for field in TRAFFIC_STATS.values()}
+    fallback = dict(totals)
+    seen, fallback_seen = set(), set()
+    names = tuple(TRAFFIC_STATS) + tuple(FALLBACK_STATS)
+    for line in lines:
+        if not line or not line.startswith(names):
+            continue
+        name, labels, value = parse_sample(line)
+        field = TRAFFIC_STATS.get(name)
+        if field is not None:
+            if labels.get("envoy_http_conn_manager_prefix", "").startswith(INTERNAL_PREFIXES):
+                continue
+            seen.add(field)
+            if field == "errors" and labels.get("envoy_response_code_class") != "5":
+                continue
+            totals[field] += value
+        elif name == "istio_requests_total":
+            fallback_seen.update(("requests", "errors"))
+            fallback["requests"] += value
+            if labels.get("response_code", "").startswith("5"):
+                fallback["errors"] += value
+        elif name in FALLBACK_STATS:
+            fallback_seen.add(FALLBACK_STATS[name])
+            fallback[FALLBACK_STATS[name]] += value
+
+    for field in totals:
+        if field not in seen and field in fallback_seen:
+            totals[field] = fallback[field]
+            seen.add(field)
+    return totals, sorted(set(totals) - seen)
+
+
+def stats_url(pod, url_template=None):
+
+    # URL of the stats of one pod, from the template in SMESH_ENVOY_STATS_URL when it is set.
+    template = url_template or os.environ.get(STATS_URL_ENV) or STATS_URL
+    return template.format(namespace=pod["namespace"], pod=pod["name"], pod_ip=pod["pod_ip"])
+
+
+def scrape_pod(session, pod, url_template=None):
+
+    # Traffic totals of one pod with the time they were read at, None when its stats cannot be read or lack a
+    # traffic field, so a pod that is not measured never counts as drained or as taking over. istio_requests_total
+    # only appears once the pod served a request, a pod that never did is not measured either.
+    start = time.monotonic()
+    url = stats_url(pod, url_template)
+    try:
+        with session.get(url, stream=True, timeout=REQUEST_TIMEOUT) as response:
+            response.raise_for_status()
+            totals, missing = parse_stats(response.iter_lines(decode_unicode=True))
+    except (requests.RequestException, ValueError) as e:
+        logger.warning(f"Envoy stats of pod '{pod['name']}' in namespace '{pod['namespace']}' cannot be read: {e}")
+        logger.event("Pod", pod["namespace"], pod["name"], "scrape_stats", "failed", None, elapsed_ms(start), url=url)
+        return None
+    if missing:
+        logger.warning(
+            f"Envoy stats of pod '{pod['name']}' in namespace '{pod['namespace']}' have no {', '.join(missing)} stat, "
+            f"it is not measured."
+        )
+        logger.event(
+            "Pod", pod["namespace"], pod["name"], "scrape_stats", "incomplete", 200, elapsed_ms(start),
+            url=url, missing=missing,
+        )
+        return None
+    logger.event("Pod", pod["namespace"], pod["name"], "scrape_stats", "success", 200, elapsed_ms(start), **totals)
+    totals["read_at"] = time.monotonic()
+    return totals
+
+
+def gateway_pods(core_api, records, max_workers=MAX_WORKERS):
+
+    # Running pods of the SMCP and injected gateway of every record, with their side: [{namespace, gateway_id,
+    # side, name, pod_ip}]. Raises ApiException on failure.
+    def list_pods(record):
+
+        # Pods of both sides of one gateway.
+        pods = []
+        for side, selector in record["pod_selectors"].items():
+            for view in list_views(core_api.list_namespaced_pod, POD_IP_FIELDS, record["namespace"], label_selector=selector):
+                if view.pod_ip:
+                    pods.append(
+                        {
+                            "namespace": record["namespace"],
+                            "gateway_id": record["gateway_id"],
+                            "side": side,
+                            "name": view.name,
+                            "pod_ip": view.pod_ip,
+                        }
+                    )
+        return pods
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return [pod for pods in executor.map(list_pods, records) for pod in pods]
+
+
+def scrape_pods(session, pods, url_template=None, max_workers=MAX_WORKERS):
+
+    # Traffic totals of every pod, scraped concurrently: {(namespace, pod name): totals or None}.
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(lambda pod: scrape_pod(session, pod, url_template), pods)
+        return {(pod["namespace"], pod["name"]): totals for pod, totals in zip(pods, results)}
+
+
+def side_traffic(pods, first, second):
+
+    # Request and 5xx rates and active connections of the pods of one side between two scrapes, over the time
+    # between the two reads of every pod. A pod restarted in between has its counters reset, its rate is counted
+    # from zero.
+    traffic = {"pods": 0, "scraped": 0, "rps": 0.0, "errors_per_s": 0.0, "active_connections": 0.0}
+    for pod in pods:
+        traffic["pods"] += 1
+        key = (pod["namespace"], pod["name"])
+        before, after = first.get(key), second.get(key)
+        if before is None or after is None:
+            continue
+        traffic["scraped"] += 1
+        interval = max(after["read_at"] - before["read_at"], 0.001)
+        for field, rate in (("requests", "rps"), ("errors", "errors_per_s")):
+            delta = after[field] - before[field]
+            traffic[rate] += (delta if delta >= 0 else after[field]) / interval
+        traffic["active_connections"] += after["active_connections"]
+    return traffic
+
+
+def is_drained(traffic, max_rps=DRAIN_MAX_RPS, max_connections=DRAIN_MAX_CONNECTIONS):
+
+    # True when every pod of the side was scraped and it serves less than the drain thresholds.
+    return (
+        traffic["scraped"] == traffic["pods"]
+        and traffic["rps"] <= max_rps
+        and traffic["active_connections"] <= max_connections
+    )
+
+
+def error_ratio(traffic):
+
+    # Share of the requests of one side answered 5xx, 0 without requests.
+    return traffic["errors_per_s"] / traffic["rps"] if traffic["rps"] else 0.0
+
+
+def has_taken_over(
+    injected,
+    injected_share,
+    pod_share,
+    min_share_ratio=TAKEOVER_MIN_SHARE_RATIO,
+    max_error_ratio=TAKEOVER_MAX_ERROR_RATIO,
+):
+
+    # True when every pod of the injected side was scraped, it serves at least min_share_ratio of its share of the
+    # Service pods and at most max_error_ratio of its requests fail. Without any traffic there is no share to check.
+    if not injected["pods"] or injected["scraped"] < injected["pods"]:
+        return False
+    if error_ratio(injected) > max_error_ratio:
+        return False
+    return injected_share is None or injected_share >= pod_share * min_share_ratio
+
+
+def measure_traffic(
+    session,
+    core_api,
+    records,
+    interval=DEFAULT_INTERVAL,
+    url_template=None,
+    max_rps=DRAIN_MAX_RPS,
+    max_connections=DRAIN_MAX_CONNECTIONS,
+    min_share_ratio=TAKEOVER_MIN_SHARE_RATIO,
+    max_error_ratio=TAKEOVER_MAX_ERROR_RATIO,
+    sleep=time.sleep,
+):
+
+    # Scrape every gateway pod twice, interval seconds apart, and compare the old SMCP gateway with the injected
+    # gateway of every record: [{namespace, gateway_id, smcp, injected, injected_share, pod_share, taken_over,
+    # drained}]. pod_share is the share of the injected pods among the pods of both sides. Raises ApiException
+    # when the pods cannot be listed.
+    pods = gateway_pods(core_api, records)
+    first = scrape_pods(session, pods, url_template)
+    sleep(interval)
+    second = scrape_pods(session, pods, url_template)
+
+    report = []
+    for record in records:
+        sides = {}
+        for side in record["pod_selectors"]:
+            side_pods = [
+                pod for pod in pods
+                if pod["namespace"] == record["namespace"] and pod["gateway_id"] == record["gateway_id"]
+                and pod["side"] == side
+            ]
+            sides[side] = side_traffic(side_pods, first, second)
+        total_rps = sides["smcp"]["rps"] + sides["injected"]["rps"]
+        total_pods = sides["smcp"]["pods"] + sides["injected"]["pods"]
+        injected_share = sides["injected"]["rps"] / total_rps if total_rps else None
+        pod_share = sides["injected"]["pods"] / total_pods if total_pods else 0.0
+        report.append(
+            {
+                "namespace": record["namespace"],
+                "gateway_id": record["gateway_id"],
+                "smcp": sides["smcp"],
+                "injected": sides["injected"],
+                "injected_share": injected_share,
+                "pod_share": pod_share,
+                "taken_over": has_taken_over(
+                    sides["injected"], injected_share, pod_share, min_share_ratio, max_error_ratio
+                ),
+                "drained": is_drained(sides["smcp"], max_rps, max_connections),
+            }
+        )
+    return report
+
+
+def error_rate_guard(session, core_api, record, max_error_ratio, interval=DEFAULT_INTERVAL, url_template=None):
+
+    # Guard for the progressive scale down: passes while the 5xx share of the requests the injected gateway
+    # serves stays at or below max_error_ratio. Returns (passed, detail).
+    def check():
+
+        # 5xx rate of the injected gateway against its request rate.
+        try:
+            traffic = measure_traffic(session, core_api, [record], interval, url_template)[0]["injected"]
+        except kubernetes.client.rest.ApiException as e:
+            return False, f"injected gateway pods of '{record['gateway_id']}' cannot be listed: {e.status} {e.reason}"
+        if traffic["scraped"] < traffic["pods"] or not traffic["pods"]:
+            return False, f"Envoy stats of {traffic['scraped']}/{traffic['pods']} injected gateway pods read"
+        ratio = error_ratio(traffic)
+        detail = f"injected gateway 5xx {ratio:.2%} of {traffic['rps']:.1f} req/s"
+        return ratio <= max_error_ratio, detail
+
+    return check
+
+
+def drain_guard(
+    session,
+    core_api,
+    apps_api,
+    record,
+    interval=DEFAULT_INTERVAL,
+    url_template=None,
+    max_rps=DRAIN_MAX_RPS,
+    max_connections=DRAIN_MAX_CONNECTIONS,
+    sleep=time.sleep,
+):
+
+    # Check after every step of the progressive scale down: passes once the Service endpoints list no more SMCP
+    # gateway pods than its deployment has replicas, and the SMCP pods that left the endpoints and still run, i.e.
+    # are terminating, are drained. After the last step that is the whole SMCP gateway. Returns (passed, detail).
+    namespace, gateway_id = record["namespace"], record["gateway_id"]
+    service = record["objects"]["service"]
+
+    def check():
+
+        # SMCP pods in the endpoints against the replicas, then the traffic of the removed pods.
+        try:
+            replicas = read_view(
+                apps_api.read_namespaced_deployment, REPLICA_FIELDS, record["objects"]["deployment"], namespace
+            ).replicas or 0
+            endpoints = read_raw(core_api.read_namespaced_endpoints, service, namespace)
+            pods = [pod for pod in gateway_pods(core_api, [record]) if pod["side"] == "smcp"]
+        except kubernetes.client.rest.ApiException as e:
+            return False, f"SMCP gateway '{gateway_id}' or its endpoints cannot be read: {e.status} {e.reason}"
+
+        listed = {
+            address["ip"]
+            for subset in endpoints.get("subsets") or []
+            for field in ("addresses", "notReadyAddresses")
+            for address in subset.get(field) or []
+        }
+        serving = [pod for pod in pods if pod["pod_ip"] in listed]
+        if len(serving) > replicas:
+            return False, f"{len(serving)} SMCP gateway pods still in the endpoints of '{service}', {replicas} expected"
+        removed = [pod for pod in pods if pod["pod_ip"] not in listed]
+        if not removed:
+            return True, f"SMCP gateway '{gateway_id}' has {len(serving)} pods in the endpoints of '{service}'"
+
+        first = scrape_pods(session, removed, url_template)
+        sleep(interval)
+        traffic = side_traffic(removed, first, scrape_pods(session, removed, url_template))
+        detail = (
+            f"{traffic['scraped']}/{traffic['pods']} SMCP gateway pods out of the endpoints of '{service}' serve "
+            f"{traffic['rps']:.1f} req/s, {traffic['active_connections']:.0f} connections"
+        )
+        return is_drained(traffic, max_rps, max_connections), detail
+
+    return check
@@ -0,0 +1,70 @@
+"""
+Filename      : event_log.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : Structured JSON-lines event log written next to the human readable log of every script. Events go
+                through a QueueHandler so writing them never blocks the API calls they describe.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import time
+import types
+from datetime import datetime, timezone
+
+EVENT_FIELDS = ["step", "kind", "namespace", "name", "action", "outcome", "status", "latency_ms"]
+
+
+class JsonLinesFormatter(logging.Formatter):
+
+    # Format the event attached to the record as a single JSON line.
+    def format(self, record):
+        event = {"ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat()}
+        event.update(record.event)
+        return json.dumps(event, default=str, separators=(",", ":"))
+
+
+def elapsed_ms(start):
+
+    # Milliseconds elapsed since a time.monotonic() reading.
+    return round((time.monotonic() - start) * 1000, 3)
+
+
+def log_event(self, kind, namespace, name, action, outcome, status=None, latency_ms=None, **extra):
+
+    # Emit one structured event, e.g. logger.event("Service", "ns", "eg001", "patch_labels", "success", 200, 12.5)
+    event = dict(zip(EVENT_FIELDS, [self.event_step, kind, namespace, name, action, outcome, status, latency_ms]))
+    event.update(extra)
+    self.event_logger.info(action, extra={"event": event})
+
+
+def attach_event_log(logger, step):
+
+    # Write the events of the step to ./logs/<timestamp>_<step>.events.jsonl through a queue and a background writer.
+    handler = logging.FileHandler(
+        f"./logs/{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_{step}.events.jsonl",
+        mode="w",
+        encoding="utf-8",
+    )
+    handler.setFormatter(JsonLinesFormatter())
+
+    event_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(event_queue, handler)
+    listener.start()
+    atexit.register(listener.stop)
+
+    # Separate logger that never propagates, so events stay out of the human readable log and stdout.
+    event_logger = logging.getLogger(f"logging_test.events.{step}")
+    event_logger.setLevel(logging.INFO)
+    event_logger.propagate = False
+    event_logger.addHandler(logging.handlers.QueueHandler(event_queue))
+
+    logger.event_step = step
+    logger.event_logger = event_logger
+    logger.event = types.MethodType(log_event, logger)
+
+    return logger
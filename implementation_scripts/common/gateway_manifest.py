@@ -0,0 +1,169 @@
+"""
+Filename      : gateway_manifest.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : Builds a per-gateway manifest from the SMCP gateway inventory listing every related object
+                (service, service account, role, role binding, deployments and pod selectors) and resolves
+                the whole manifest with one LIST per object kind and namespace instead of a GET per object.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import kubernetes.client.rest
+
+from common.fast_read import NAME_FIELDS, list_views
+from common.metadata_scan import METADATA_ACCEPT
+
+logger = logging.getLogger("logging_test")
+
+GATEWAY_TYPES = ["additionalEgress", "additionalIngress"]
+
+# Manifest key -> (display name, api, list method) used to resolve the object names.
+MANIFEST_KINDS = {
+    "service": ("Service", "core", "list_namespaced_service"),
+    "service_account": ("Service Account", "core", "list_namespaced_service_account"),
+    "role": ("Role", "auth", "list_namespaced_role"),
+    "role_binding": ("Role Binding", "auth", "list_namespaced_role_binding"),
+    "deployment": ("Deployment", "apps", "list_namespaced_deployment"),
+    "injected_deployment": ("Deployment", "apps", "list_namespaced_deployment"),
+}
+
+
+def get_gateway_inventory(smcp):
+
+    # Return one entry per additional ingress/egress gateway defined in the SMCP, in SMCP order.
+    inventory = []
+    gateway_list = smcp["spec"]["gateways"]
+
+    for gateway_type in gateway_list:
+        if gateway_type in GATEWAY_TYPES:
+            for gateway_id in gateway_list[gateway_type]:
+                gateway = gateway_list[gateway_type][gateway_id]
+                inventory.append(
+                    {
+                        "gateway_type": gateway_type,
+                        "gateway_id": gateway_id,
+                        "namespace": gateway["namespace"],
+                        "component_type": "egress" if gateway_type == "additionalEgress" else "ingress",
+                        "enabled": gateway.get("enabled", True),
+                        "replicas": gateway.get("runtime", {}).get("deployment", {}).get("replicas"),
+                    }
+                )
+
+    return inventory
+
+
+def build_manifest(smcp):
+
+    # Build the list of related object names for every gateway from the SMCP naming rules.
+    manifest = []
+    for gateway in get_gateway_inventory(smcp):
+        gateway_id = gateway["gateway_id"]
+        record = dict(gateway)
+        record["objects"] = {
+            "service": gateway_id,
+            "service_account": f"{gateway_id}-service-account",
+            "role": f"{gateway_id}-sds",
+            "role_binding": f"{gateway_id}-sds",
+            "deployment": gateway_id,
+            "injected_deployment": f"{gateway_id}-gateway",
+        }
+        record["pod_selectors"] = {
+            "smcp": f"app={gateway_id},type!=injectedgateway",
+            "injected": f"type=injectedgateway,app={gateway_id}",
+        }
+        record["resolved"] = {"namespace": False}
+        record["resolved"].update({key: False for key in record["objects"]})
+        manifest.append(record)
+
+    return manifest
+
+
+def list_object_names(api, method, namespace):
+
+    # List the names of all objects of one kind in the namespace, fetching only their metadata.
+    items = list_views(getattr(api, method), NAME_FIELDS, namespace, _headers={"Accept": METADATA_ACCEPT})
+    return {item.name for item in items}
+
+
+def resolve_namespace(namespace, methods, apis):
+
+    # Run one LIST per required kind in the namespace and return the names found per list method.
+    found = {}
+    for api_name, method in methods:
+        try:
+            found[method] = list_object_names(apis[api_name], method, namespace)
+        except kubernetes.client.rest.ApiException as e:
+            logger.error(f"Error listing objects with '{method}' in namespace '{namespace}'")
+            logger.error("Error details: ")
+            logger.error(f" - Reason: {e.reason}")
+            logger.error(f" - Status: {e.status}")
+            logger.error(f" - Message: {e.body}")
+            found[method] = set()
+
+    return found
+
+
+def resolve_manifest(manifest, kinds, core_api, apps_api=None, auth_api=None, max_workers=10):
+
+    # Resolve the requested object kinds for every gateway in the manifest.
+    # Namespaces are resolved with a single LIST, every other kind with one LIST per namespace run concurrently.
+    apis = {"core": core_api, "apps": apps_api, "auth": auth_api}
+    methods = sorted({MANIFEST_KINDS[kind][1:] for kind in kinds})
+
+    try:
+        existing_namespaces = {item.name for item in list_views(core_api.list_namespace, NAME_FIELDS)}
+    except kubernetes.client.rest.ApiException as e:
+        logger.error("Error listing namespaces")
+        logger.error("Error details: ")
+        logger.error(f" - Reason: {e.reason}")
+        logger.error(f" - Status: {e.status}")
+        logger.error(f" - Message: {e.body}")
+        existing_namespaces = set()
+
+    namespaces = sorted({record["namespace"] for record in manifest} & existing_namespaces)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = dict(
+            zip(namespaces, executor.map(lambda ns: resolve_namespace(ns, methods, apis), namespaces))
+        )
+
+    for record in manifest:
+        namespace = record["namespace"]
+        record["resolved"]["namespace"] = namespace in existing_namespaces
+        found = results.get(namespace, {})
+        for kind in kinds:
+            method = MANIFEST_KINDS[kind][2]
+            record["resolved"][kind] = record["objects"][kind] in found.get(method, set())
+
+    return manifest
+
+
+def check_manifest_namespace(record):
+
+    # Check the resolved manifest to see if the gateway namespace exists in the cluster.
+    namespace = record["namespace"]
+    if record["resolved"]["namespace"]:
+        logger.info(f"Namespace '{namespace}' exists.")
+        return True
+
+    logger.warning(f"Namespace '{namespace}' not found. Moving on !")
+    logger.event("Namespace", None, namespace, "check", "not_found", gateway_id=record["gateway_id"])
+    return False
+
+
+def check_manifest_object(record, kind):
+
+    # Check the resolved manifest to see if the related object exists in the gateway namespace.
+    namespace = record["namespace"]
+    name = record["objects"][kind]
+    display_name = MANIFEST_KINDS[kind][0]
+    if record["resolved"][kind]:
+        logger.info(f"{display_name} '{name}' exists in namespace '{namespace}'.")
+        return True
+
+    logger.warning(f"{display_name} '{name}' not found in namespace '{namespace}'. Moving on !")
+    logger.event(display_name, namespace, name, "check", "not_found", gateway_id=record["gateway_id"])
+    return False
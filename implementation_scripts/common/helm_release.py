@@ -0,0 +1,83 @@
+"""
+Filename      : helm_release.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : Release naming and shard planning for splitting the injected gateway chart into per-namespace or
+                per-batch Helm releases instead of one release covering every project in the cluster.
+"""
+
+import copy
+import hashlib
+import os
+import zlib
+
+RELEASE_NAME = "service-mesh-injected-gateway"
+RELEASE_NAMESPACE = "istio-system"
+SHARD_PREFIX = "smigw"
+SHARD_STRATEGIES = ["none", "namespace", "batch"]
+
+# Strategy of both 05.apply_helm_adoption.py and shard_injected_gateway_releases.py when none is given, so the
+# objects are always labelled for the releases the values files are planned for.
+DEFAULT_SHARD_STRATEGY = "none"
+
+# Helm release names are limited to 53 characters.
+MAX_RELEASE_NAME_LENGTH = 53
+
+
+def shard_values_dir(values_file):
+
+    # Directory the per-release values files go to, next to the cluster values file: <cluster>.yaml -> <cluster>-shards/,
+    # the directory the sharded install task of playbook/enroll-namespaces.yml reads.
+    return f"{os.path.splitext(values_file)[0]}-shards"
+
+
+def namespace_release_name(namespace):
+
+    # Release name for a per-namespace shard, shortened with a stable hash when the namespace is too long.
+    release_name = f"{SHARD_PREFIX}-{namespace}"
+    if len(release_name) <= MAX_RELEASE_NAME_LENGTH:
+        return release_name
+
+    digest = hashlib.sha1(namespace.encode("utf-8")).hexdigest()[:8]
+    return f"{release_name[:MAX_RELEASE_NAME_LENGTH - 9].rstrip('-')}-{digest}"
+
+
+def batch_release_name(batch_index):
+
+    # Release name for a batch shard.
+    return f"{RELEASE_NAME}-b{batch_index:03d}"
+
+
+def batch_index(namespace, batch_count):
+
+    # Stable batch assignment so adding or removing a namespace never moves the others to another release.
+    return zlib.crc32(namespace.encode("utf-8")) % batch_count
+
+
+def release_name_for(namespace, strategy="none", batch_count=1):
+
+    # Name of the release that owns the injected gateway objects of the namespace.
+    if strategy == "namespace":
+        return namespace_release_name(namespace)
+    if strategy == "batch":
+        return batch_release_name(batch_index(namespace, batch_count))
+    return RELEASE_NAME
+
+
+def plan_shards(cluster_values, strategy, batch_count=1):
+
+    # Group the projects of the values file by owning release, preserving the values file order.
+    shards = {}
+    for project in cluster_values.get("project") or []:
+        release_name = release_name_for(project["namespace"], strategy, batch_count)
+        shards.setdefault(release_name, []).append(project)
+    return shards
+
+
+def shard_values(cluster_values, projects):
+
+    # Copy of the values file containing only the given projects, every other key is kept as is.
+    values = {key: copy.deepcopy(value) for key, value in cluster_values.items() if key != "project"}
+    values["project"] = copy.deepcopy(projects)
+    return values
@@ -0,0 +1,222 @@
+"""
+Filename      : instrumentation.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : Lightweight timing spans around subprocess calls, kubernetes client calls, YAML load/dump and file
+                writes. Prints p50/p95/p99 per operation at exit and exports a Chrome trace-event JSON file when the
+                SMESH_TRACE_FILE environment variable is set.
+"""
+
+import atexit
+import functools
+import json
+import logging
+import math
+import os
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+logger = logging.getLogger("logging_test")
+
+TRACE_FILE_ENV = "SMESH_TRACE_FILE"
+
+HTTP_METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+_spans = []
+_spans_lock = threading.Lock()
+_local = threading.local()
+_state = {"step": None, "origin": time.perf_counter()}
+
+
+def _record(category, name, start, duration):
+
+    # Keep one finished span, timestamps are relative to the install time.
+    with _spans_lock:
+        _spans.append((category, name, start - _state["origin"], duration, threading.get_ident()))
+
+
+@contextmanager
+def span(category, name):
+
+    # Time the enclosed block. Nested spans of the same category are only counted once, at the outermost level.
+    active = getattr(_local, "active", None)
+    if active is None:
+        active = _local.active = set()
+    if category in active:
+        yield
+        return
+
+    active.add(category)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(category, name, start, time.perf_counter() - start)
+        active.discard(category)
+
+
+def _wrap(category, function, name_of):
+
+    # Wrap a callable so every call is recorded as a span.
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with span(category, name_of(*args, **kwargs)):
+            return function(*args, **kwargs)
+
+    wrapper.__wrapped_by_instrumentation__ = True
+    return wrapper
+
+
+def _command_name(*args, **kwargs):
+
+    # "oc get" for ["oc", "get", "smcp", ...], the first two words are enough to group the calls.
+    command = args[0] if args else kwargs.get("args", "")
+    if isinstance(command, (list, tuple)):
+        return " ".join(os.path.basename(str(part)) for part in command[:2])
+    return str(command).split(" ")[0]
+
+
+def _path_template(path):
+
+    # "/api/v1/namespaces/lbg-ns-0/resourcequotas/lbg-ns-0-quota" -> "/api/v1/namespaces/{namespace}/resourcequotas/{name}"
+    parts = path.split("?", 1)[0].strip("/").split("/")
+    prefix = 2 if parts[0] == "api" else 3
+    head, rest = parts[:prefix], parts[prefix:]
+    if len(rest) > 2 and rest[0] == "namespaces":
+        head += ["namespaces", "{namespace}"]
+        rest = rest[2:]
+    if len(rest) > 1:
+        rest[1] = "{name}"
+    return "/" + "/".join(head + rest)
+
+
+def _api_call_name(self, *args, **kwargs):
+
+    # "PATCH /api/v1/namespaces/{namespace}/resourcequotas/{name}", the path template groups calls per resource.
+    # Current clients call call_api(method, url), older ones call_api(resource_path, method).
+    if args and args[0] in HTTP_METHODS:
+        return f"{args[0]} {_path_template(urlparse(args[1] if len(args) > 1 else kwargs.get('url', '')).path)}"
+    resource_path = args[0] if args else kwargs.get("resource_path", "")
+    method = args[1] if len(args) > 1 else kwargs.get("method")
+    return f"{method} {resource_path}"
+
+
+def _patch(owner, attribute, category, name_of):
+
+    # Replace owner.attribute with its instrumented version, once.
+    function = getattr(owner, attribute, None)
+    if function is None or getattr(function, "__wrapped_by_instrumentation__", False):
+        return
+    setattr(owner, attribute, _wrap(category, function, name_of))
+
+
+def install(step):
+
+    # Instrument the libraries the script uses and report the timings at exit.
+    _state["step"] = step
+    _state["origin"] = time.perf_counter()
+
+    _patch(subprocess, "run", "subprocess", _command_name)
+    _patch(subprocess, "check_output", "subprocess", _command_name)
+
+    # Only instrument the libraries the script already imported.
+    if "yaml" in sys.modules:
+        yaml = sys.modules["yaml"]
+        for attribute in ["load", "safe_load", "load_all", "safe_load_all"]:
+            _patch(yaml, attribute, "yaml", lambda *args, _name=attribute, **kwargs: f"yaml.{_name}")
+        for attribute in ["dump", "safe_dump", "dump_all", "safe_dump_all"]:
+            _patch(yaml, attribute, "yaml", lambda *args, _name=attribute, **kwargs: f"yaml.{_name}")
+
+    if "ruamel.yaml" in sys.modules:
+        yaml_class = sys.modules["ruamel.yaml"].YAML
+        _patch(yaml_class, "load", "yaml", lambda *args, **kwargs: "ruamel.load")
+        _patch(yaml_class, "dump", "yaml", lambda *args, **kwargs: "ruamel.dump")
+
+    if "kubernetes.client" in sys.modules:
+        _patch(sys.modules["kubernetes.client"].ApiClient, "call_api", "k8s", _api_call_name)
+
+    atexit.register(report)
+
+
+def percentile(durations, fraction):
+
+    # Nearest-rank percentile of a sorted list.
+    index = max(0, math.ceil(fraction * len(durations)) - 1)
+    return durations[index]
+
+
+def summarize(spans):
+
+    # Group the spans per operation type and per operation, returning count, total and p50/p95/p99 in ms.
+    groups = {}
+    for category, name, start, duration, thread_id in spans:
+        groups.setdefault((category, "*"), []).append(duration)
+        groups.setdefault((category, name), []).append(duration)
+
+    summary = []
+    for (category, name), durations in sorted(groups.items()):
+        durations.sort()
+        summary.append(
+            {
+                "step": _state["step"],
+                "category": category,
+                "operation": name,
+                "count": len(durations),
+                "total_ms": round(sum(durations) * 1000, 3),
+                "p50_ms": round(percentile(durations, 0.50) * 1000, 3),
+                "p95_ms": round(percentile(durations, 0.95) * 1000, 3),
+                "p99_ms": round(percentile(durations, 0.99) * 1000, 3),
+            }
+        )
+    return summary
+
+
+def export_chrome_trace(spans, trace_file):
+
+    # Write the spans in the Chrome trace-event format (chrome://tracing, Perfetto).
+    events = [
+        {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": round(start * 1_000_000, 3),
+            "dur": round(duration * 1_000_000, 3),
+            "pid": os.getpid(),
+            "tid": thread_id,
+            "args": {"step": _state["step"]},
+        }
+        for category, name, start, duration, thread_id in spans
+    ]
+    with open(trace_file, "w") as file:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+
+def report():
+
+    # Print the timing report of the run and export the trace when requested.
+    with _spans_lock:
+        spans = list(_spans)
+    if not spans:
+        return
+
+    elapsed = time.perf_counter() - _state["origin"]
+    logger.newline()
+    logger.info(f"Timing report for '{_state['step']}' ({elapsed:.3f} seconds):")
+    logger.info(
+        f" {'OPERATION':<72} {'COUNT':>6} {'TOTAL ms':>11} {'P50 ms':>9} {'P95 ms':>9} {'P99 ms':>9}"
+    )
+    for row in summarize(spans):
+        operation = f"{row['category']} (all)" if row["operation"] == "*" else f"  {row['operation']}"
+        logger.info(
+            f" {operation[:72]:<72} {row['count']:>6} {row['total_ms']:>11.1f} {row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f}"
+        )
+
+    trace_file = os.environ.get(TRACE_FILE_ENV)
+    if trace_file:
+        export_chrome_trace(spans, trace_file)
+        logger.info(f"Chrome trace saved to '{trace_file}'")
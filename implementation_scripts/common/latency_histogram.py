@@ -0,0 +1,101 @@
+"""
+Filename      : latency_histogram.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : HDR-style latency histogram. Latencies are recorded in microseconds into log-linear buckets, exact below
+                2048 us and within 0.1% (three significant digits) above, up to a minute, so recording is a few integer
+                operations, the memory is fixed whatever the number of requests, and histograms of several runs can be
+                merged. Percentiles report the highest value of their bucket, never lower than the real latency.
+"""
+
+# 2^11 sub-buckets: values below 2048 us are exact, every power of two above is split in 1024 buckets.
+SUB_BUCKET_BITS = 11
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+SUB_BUCKET_HALF = SUB_BUCKET_COUNT // 2
+
+# Highest latency tracked, in microseconds. Slower requests are counted at this value.
+MAX_LATENCY_US = 60 * 1000 * 1000
+
+# Percentiles of the reports.
+REPORT_PERCENTILES = (50.0, 90.0, 99.0, 99.9, 99.99)
+
+
+def bucket_index(value):
+
+    # Bucket of a latency in microseconds: the value itself below SUB_BUCKET_COUNT, then SUB_BUCKET_HALF buckets
+    # per power of two.
+    if value < SUB_BUCKET_COUNT:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    return SUB_BUCKET_COUNT + (shift - 1) * SUB_BUCKET_HALF + (value >> shift) - SUB_BUCKET_HALF
+
+
+def bucket_highest(index):
+
+    # Highest latency in microseconds that falls in a bucket.
+    if index < SUB_BUCKET_COUNT:
+        return index
+    shift = (index - SUB_BUCKET_COUNT) // SUB_BUCKET_HALF + 1
+    sub_bucket = (index - SUB_BUCKET_COUNT) % SUB_BUCKET_HALF + SUB_BUCKET_HALF
+    return ((sub_bucket + 1) << shift) - 1
+
+
+class LatencyHistogram:
+
+    def __init__(self):
+
+        # One counter per bucket up to MAX_LATENCY_US.
+        self.counts = [0] * (bucket_index(MAX_LATENCY_US) + 1)
+        self.count = 0
+        self.total_us = 0
+        self.min_us = None
+        self.max_us = 0
+
+    def record(self, seconds):
+
+        # Record one latency given in seconds.
+        value = min(max(round(seconds * 1000000), 0), MAX_LATENCY_US)
+        self.counts[bucket_index(value)] += 1
+        self.count += 1
+        self.total_us += value
+        self.min_us = value if self.min_us is None else min(self.min_us, value)
+        self.max_us = max(self.max_us, value)
+
+    def merge(self, other):
+
+        # Add the latencies of another histogram to this one.
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        self.count += other.count
+        self.total_us += other.total_us
+        if other.min_us is not None:
+            self.min_us = other.min_us if self.min_us is None else min(self.min_us, other.min_us)
+        self.max_us = max(self.max_us, other.max_us)
+
+    def percentile(self, percentile):
+
+        # Latency in milliseconds at or under which the given percentage of the requests completed, None when empty.
+        if not self.count:
+            return None
+        rank = max(1, -(-self.count * percentile // 100))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bucket_highest(index), self.max_us) / 1000
+        return self.max_us / 1000
+
+    def summary(self, percentiles=REPORT_PERCENTILES):
+
+        # Count, mean, min, max and percentiles in milliseconds, for the reports and the events.
+        summary = {
+            "count": self.count,
+            "mean_ms": self.total_us / self.count / 1000 if self.count else None,
+            "min_ms": self.min_us / 1000 if self.min_us is not None else None,
+            "max_ms": self.max_us / 1000 if self.count else None,
+        }
+        for percentile in percentiles:
+            summary[f"p{percentile:g}"] = self.percentile(percentile)
+        return summary
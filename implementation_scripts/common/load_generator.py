@@ -0,0 +1,246 @@
+"""
+Filename      : load_generator.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : Async HTTP load generator for the gateway latency A/B runs. Drives HTTP/1.1 load through an aiohttp
+                connection pool, or HTTP/2 through httpx when it is installed, from a fixed number of concurrent
+                workers, either as fast as the gateway answers or at a fixed request rate. At a fixed rate the latency
+                is measured from the time a request was due, so a gateway that stalls is not hidden by the requests it
+                delayed. Latencies go to an HDR-style histogram, errors are counted per class, and the baseline and
+                candidate runs are compared percentile by percentile.
+"""
+
+import asyncio
+import logging
+
+import aiohttp
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+from common.latency_histogram import REPORT_PERCENTILES, LatencyHistogram
+
+logger = logging.getLogger("logging_test")
+
+# 16 connections per side, 30 seconds measured after 5 seconds of warm up, 10 seconds per request.
+DEFAULT_CONCURRENCY = 16
+DEFAULT_DURATION = 30
+DEFAULT_WARMUP = 5
+REQUEST_TIMEOUT = 10
+
+# The candidate regresses when a checked percentile is more than 10% and 1 ms slower than the baseline, or its error
+# rate is more than 0.1 percentage points higher.
+DEFAULT_CHECK_PERCENTILES = (99.0,)
+DEFAULT_MAX_REGRESSION = 0.10
+DEFAULT_SLACK_MS = 1.0
+DEFAULT_MAX_ERROR_RATE_INCREASE = 0.001
+
+CLIENT_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError, OSError) + ((httpx.HTTPError,) if httpx else ())
+
+
+def error_class(status=None, error=None):
+
+    # Class of a failed request: 5xx, 4xx, timeout or connection. None for a success.
+    if error is not None:
+        return "timeout" if isinstance(error, asyncio.TimeoutError) or "Timeout" in type(error).__name__ else "connection"
+    if status >= 500:
+        return "5xx"
+    if status >= 400:
+        return "4xx"
+    return None
+
+
+def create_client(concurrency, http2=False, verify=False, timeout=REQUEST_TIMEOUT):
+
+    # Client with a pool of up to `concurrency` keep-alive connections, and the coroutine function sending one
+    # request through it and returning the status. Must be called inside the event loop.
+    if http2:
+        client = httpx.AsyncClient(
+            http2=True,
+            verify=verify,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        )
+
+        async def send(method, url, headers, server_hostname):
+
+            # One HTTP/2 request, httpx reads the body before it returns.
+            extensions = {"sni_hostname": server_hostname} if server_hostname else None
+            response = await client.request(method, url, headers=headers, extensions=extensions)
+            return response.status_code
+
+        return client, send
+
+    client = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=concurrency, ssl=None if verify else False),
+        timeout=aiohttp.ClientTimeout(total=timeout),
+    )
+
+    async def send(method, url, headers, server_hostname):
+
+        # One HTTP/1.1 request, the body is read so the connection goes back to the pool.
+        kwargs = {"server_hostname": server_hostname} if server_hostname and url.startswith("https") else {}
+        async with client.request(method, url, headers=headers, **kwargs) as response:
+            await response.read()
+            return response.status
+
+    return client, send
+
+
+async def run_load(
+    label,
+    targets,
+    path="/",
+    method="GET",
+    headers=None,
+    server_hostname=None,
+    concurrency=DEFAULT_CONCURRENCY,
+    duration=DEFAULT_DURATION,
+    warmup=DEFAULT_WARMUP,
+    rate=None,
+    http2=False,
+    verify=False,
+    timeout=REQUEST_TIMEOUT,
+):
+
+    # Load one side, round robin over its target URLs, for warmup + duration seconds. Without a rate every worker
+    # sends its next request as soon as the previous one is answered, with a rate the requests are due every
+    # 1/rate seconds and their latency counts from that time. Only the requests due after the warm up are measured.
+    histogram = LatencyHistogram()
+    errors = {}
+    counters = {"due": 0, "sent": 0, "requests": 0}
+    urls = [target.rstrip("/") + path for target in targets]
+
+    loop = asyncio.get_running_loop()
+    client, send = create_client(concurrency, http2, verify, timeout)
+    start = loop.time()
+    measured_from = start + warmup
+    end = measured_from + duration
+
+    async def worker():
+
+        # Send requests until the end of the run.
+        while True:
+            if rate:
+                due = start + counters["due"] / rate
+                counters["due"] += 1
+                if due >= end:
+                    return
+                if due > loop.time():
+                    await asyncio.sleep(due - loop.time())
+            else:
+                due = loop.time()
+                if due >= end:
+                    return
+            url = urls[counters["sent"] % len(urls)]
+            counters["sent"] += 1
+            try:
+                failure = error_class(status=await send(method, url, headers, server_hostname))
+            except CLIENT_ERRORS as e:
+                failure = error_class(error=e)
+            if due < measured_from:
+                continue
+            counters["requests"] += 1
+            if failure:
+                errors[failure] = errors.get(failure, 0) + 1
+            else:
+                histogram.record(loop.time() - due)
+
+    async with client:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = max(loop.time() - measured_from, 0.001)
+
+    return {
+        "label": label,
+        "targets": len(urls),
+        "requests": counters["requests"],
+        "errors": errors,
+        "duration_s": elapsed,
+        "histogram": histogram,
+    }
+
+
+def merge_results(results):
+
+    # One result for the runs of the same side, with their histograms merged.
+    merged = {
+        "label": results[0]["label"],
+        "targets": results[0]["targets"],
+        "requests": 0,
+        "errors": {},
+        "duration_s": 0.0,
+        "histogram": LatencyHistogram(),
+    }
+    for result in results:
+        merged["requests"] += result["requests"]
+        merged["duration_s"] += result["duration_s"]
+        merged["histogram"].merge(result["histogram"])
+        for name, count in result["errors"].items():
+            merged["errors"][name] = merged["errors"].get(name, 0) + count
+    return merged
+
+
+def side_metrics(result, percentiles=REPORT_PERCENTILES):
+
+    # Throughput, error rate and latency percentiles in milliseconds of one side.
+    failed = sum(result["errors"].values())
+    metrics = {
+        "requests": result["requests"],
+        "throughput_rps": result["requests"] / result["duration_s"],
+        "error_rate": failed / result["requests"] if result["requests"] else 0.0,
+        "errors": dict(result["errors"]),
+    }
+    metrics.update(result["histogram"].summary(percentiles))
+    return metrics
+
+
+async def run_ab(baseline_targets, candidate_targets, rounds=1, **options):
+
+    # Load the baseline and the candidate one after the other, swapping which goes first every round so a drift of
+    # the cluster load does not favour one side. Returns the merged (baseline, candidate) results.
+    runs = {"baseline": [], "candidate": []}
+    sides = [("baseline", baseline_targets), ("candidate", candidate_targets)]
+    for index in range(rounds):
+        for label, targets in sides if index % 2 == 0 else reversed(sides):
+            logger.info(f"Round {index + 1}/{rounds}: loading the {label} ({len(targets)} targets)")
+            runs[label].append(await run_load(label, targets, **options))
+    return merge_results(runs["baseline"]), merge_results(runs["candidate"])
+
+
+def compare(
+    baseline,
+    candidate,
+    check_percentiles=DEFAULT_CHECK_PERCENTILES,
+    max_regression=DEFAULT_MAX_REGRESSION,
+    slack_ms=DEFAULT_SLACK_MS,
+    max_error_rate_increase=DEFAULT_MAX_ERROR_RATE_INCREASE,
+):
+
+    # Metrics of both sides row by row: [{metric, baseline, candidate, delta, checked, regressed}]. Only the checked
+    # percentiles and the error rate can regress, the other rows are for the report.
+    percentiles = sorted(set(REPORT_PERCENTILES) | set(check_percentiles))
+    baseline, candidate = side_metrics(baseline, percentiles), side_metrics(candidate, percentiles)
+    checked = {f"p{percentile:g}" for percentile in check_percentiles}
+    metrics = ["throughput_rps", "error_rate", "mean_ms"] + [f"p{percentile:g}" for percentile in percentiles] + ["max_ms"]
+
+    rows = []
+    for metric in metrics:
+        before, after = baseline[metric], candidate[metric]
+        row = {
+            "metric": metric,
+            "baseline": before,
+            "candidate": after,
+            "delta": (after - before) / before if before and after is not None else None,
+            "checked": metric in checked or metric == "error_rate",
+            "regressed": False,
+        }
+        if metric == "error_rate":
+            row["regressed"] = after > before + max_error_rate_increase
+        elif metric in checked:
+            # A candidate without a single successful request has nothing to sign off on.
+            row["regressed"] = after is None or (before is not None and after > before * (1 + max_regression) + slack_ms)
+        rows.append(row)
+    return rows
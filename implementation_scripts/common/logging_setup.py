@@ -0,0 +1,84 @@
+"""
+Filename      : logging_setup.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : Shared logger for all the scripts. Records are handed to a QueueListener thread which writes them to
+                the log file through a buffer and to stdout, so logging never blocks the API calls of the scripts.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+import types
+from datetime import datetime
+
+from common.event_log import attach_event_log
+from common.instrumentation import install as install_instrumentation
+
+LOGGER_NAME = "logging_test"
+LOG_FORMAT = "[%(asctime)s] %(levelname)8s : %(message)s"
+LOG_DATE_FORMAT = "%a, %d %b %Y %H:%M:%S"
+
+# Records buffered before the log file is written, errors are always written straight away.
+BUFFER_CAPACITY = 256
+
+
+class BlankLineFormatter(logging.Formatter):
+
+    # Format the records marked as blank lines as an empty line instead of swapping formatters on the handler.
+    def format(self, record):
+        if getattr(record, "blank_line", False):
+            return ""
+        return super().format(record)
+
+
+def log_newline(self, how_many_lines=1):
+
+    # Output blank lines in the log file, safe to call from several threads at once.
+    for i in range(how_many_lines):
+        self.info("", extra={"blank_line": True})
+
+
+def create_logger(step):
+
+    # Create the handlers, they only run on the listener thread
+    file_handler = logging.FileHandler(
+        f"./logs/{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_{step}.log",
+        mode="w",
+        encoding="utf-8",
+    )
+    file_handler.setLevel(logging.DEBUG)
+    file_handler.setFormatter(BlankLineFormatter(fmt=LOG_FORMAT, datefmt=LOG_DATE_FORMAT))
+    buffered_handler = logging.handlers.MemoryHandler(
+        BUFFER_CAPACITY,
+        flushLevel=logging.ERROR,
+        target=file_handler,
+    )
+    sh = logging.StreamHandler(sys.stdout)
+    sh.setFormatter(logging.Formatter(fmt=LOG_FORMAT, datefmt=LOG_DATE_FORMAT))
+
+    # Hand the records over to a background thread through a queue
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, buffered_handler, sh)
+    listener.start()
+    atexit.register(listener.stop)
+
+    # Create a logger, with the queue handler
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    # Save some data and add a method to logger object
+    logger.listener = listener
+    logger.newline = types.MethodType(log_newline, logger)
+
+    # Write structured events alongside the human readable log
+    attach_event_log(logger, step)
+
+    # Time the subprocess, kubernetes and YAML calls of the step and report them at exit
+    install_instrumentation(step)
+
+    return logger
@@ -0,0 +1,133 @@
+"""
+Filename      : metadata_scan.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : Metadata-only scan of every object kind the migration relabels. Lists Services, ServiceAccounts, Roles,
+                RoleBindings and Deployments across all namespaces as PartialObjectMetadataList, so the API server
+                returns only names, labels and annotations, and classifies the label state of every gateway object:
+                SMCP-owned, stripped or Helm-adopted.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from common.cluster_api import typed_api
+from common.fast_read import list_views
+
+logger = logging.getLogger("logging_test")
+
+# Ask for metadata only, servers without the transformation fall back to the full objects.
+METADATA_ACCEPT = "application/json;as=PartialObjectMetadataList;g=meta.k8s.io;v=v1,application/json"
+METADATA_FIELDS = {
+    "namespace": "metadata.namespace",
+    "name": "metadata.name",
+    "labels": "metadata.labels",
+    "annotations": "metadata.annotations",
+}
+
+# Manifest key -> (display name, api, list all namespaces method) of the objects whose labels the migration changes.
+SCAN_KINDS = {
+    "service": ("Service", "core", "list_service_for_all_namespaces"),
+    "service_account": ("Service Account", "core", "list_service_account_for_all_namespaces"),
+    "role": ("Role", "auth", "list_role_for_all_namespaces"),
+    "role_binding": ("Role Binding", "auth", "list_role_binding_for_all_namespaces"),
+    "deployment": ("Deployment", "apps", "list_deployment_for_all_namespaces"),
+    "injected_deployment": ("Deployment", "apps", "list_deployment_for_all_namespaces"),
+}
+
+# Labels the SMCP operator puts on the gateway objects, removed by remove_labels.py.
+SMCP_OWNERSHIP_LABELS = [
+    "app.kubernetes.io/component",
+    "app.kubernetes.io/instance",
+    "app.kubernetes.io/managed-by",
+    "app.kubernetes.io/name",
+    "app.kubernetes.io/part-of",
+    "app.kubernetes.io/version",
+    "istio.io/rev",
+    "maistra-version",
+    "maistra.io/owner",
+    "maistra.io/owner-name",
+    "release",
+]
+MANAGED_BY_LABEL = "app.kubernetes.io/managed-by"
+HELM_ANNOTATIONS = ["meta.helm.sh/release-name", "meta.helm.sh/release-namespace"]
+
+LABEL_STATES = ["smcp-owned", "stripped", "helm-adopted", "partial", "missing"]
+
+
+def list_metadata(api, method):
+
+    # Names, labels and annotations of every object of one kind, indexed by (namespace, name).
+    views = list_views(getattr(api, method), METADATA_FIELDS, _headers={"Accept": METADATA_ACCEPT})
+    return {(view.namespace, view.name): view for view in views}
+
+
+def scan_metadata(api_client, kinds=None, max_workers=10):
+
+    # One metadata LIST per object kind across all namespaces, run concurrently. Returns the objects per list
+    # method. Raises ApiException on failure.
+    kinds = kinds or list(SCAN_KINDS)
+    methods = sorted({SCAN_KINDS[kind][1:] for kind in kinds})
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(lambda method: list_metadata(typed_api(api_client, method[0]), method[1]), methods)
+        return dict(zip([method for api, method in methods], results))
+
+
+def label_state(view):
+
+    # Label state of one object: all SMCP ownership labels, none of them, Helm release labels and annotations
+    # with no SMCP label left, anything in between, or no object at all.
+    if view is None:
+        return "missing"
+    labels = view.labels or {}
+    annotations = view.annotations or {}
+    owned = [label for label in SMCP_OWNERSHIP_LABELS if label != MANAGED_BY_LABEL and label in labels]
+    helm = labels.get(MANAGED_BY_LABEL) == "Helm" and all(annotations.get(name) for name in HELM_ANNOTATIONS)
+
+    if helm:
+        return "partial" if owned else "helm-adopted"
+    if len(owned) == len(SMCP_OWNERSHIP_LABELS) - 1 and labels.get(MANAGED_BY_LABEL):
+        return "smcp-owned"
+    if owned or labels.get(MANAGED_BY_LABEL):
+        return "partial"
+    return "stripped"
+
+
+def audit_manifest(manifest, scanned, kinds=None):
+
+    # Label state of every object of every gateway in the manifest, from the result of scan_metadata.
+    kinds = kinds or list(SCAN_KINDS)
+    audit = []
+    for record in manifest:
+        namespace = record["namespace"]
+        states = {}
+        releases = {}
+        for kind in kinds:
+            view = scanned[SCAN_KINDS[kind][2]].get((namespace, record["objects"][kind]))
+            states[kind] = label_state(view)
+            if states[kind] == "helm-adopted":
+                releases[kind] = view.annotations["meta.helm.sh/release-name"]
+        audit.append(
+            {
+                "namespace": namespace,
+                "gateway_id": record["gateway_id"],
+                "gateway_type": record["gateway_type"],
+                "states": states,
+                "releases": releases,
+            }
+        )
+    return audit
+
+
+def diff_audits(before, after):
+
+    # Objects whose label state changed between two audits: [(namespace, gateway_id, kind, before, after)].
+    previous = {(row["namespace"], row["gateway_id"]): row["states"] for row in before}
+    changes = []
+    for row in after:
+        states = previous.get((row["namespace"], row["gateway_id"]), {})
+        for kind, state in row["states"].items():
+            if states.get(kind, "missing") != state:
+                changes.append((row["namespace"], row["gateway_id"], kind, states.get(kind, "missing"), state))
+    return changes
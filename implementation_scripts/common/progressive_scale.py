@@ -0,0 +1,187 @@
+"""
+Filename      : progressive_scale.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : Progressive scale down of the SMCP gateways. Instead of cutting a gateway straight to zero replicas, it
+                is stepped down a few replicas at a time while guards watch the injected gateway that takes over its
+                traffic. A step only goes ahead when every guard passes; a breached guard pauses the scale down until
+                it recovers, or aborts it, leaving the SMCP gateway at its current scale, when it does not recover in
+                time. Step guards, e.g. that the removed pods are drained, are checked the same way after every step.
+                The HorizontalPodAutoscaler of a gateway is pinned to the replicas of each step before the step, so
+                that it does not scale the gateway back up; --restore puts its bounds back from the replica snapshot.
+"""
+
+import logging
+import time
+
+import kubernetes.client.rest
+
+from common.cluster_api import patch_object
+from common.dry_run import error_message
+from common.event_log import elapsed_ms
+from common.fast_read import REPLICA_FIELDS, read_view
+
+logger = logging.getLogger("logging_test")
+
+# One replica per step, 30 seconds for the traffic to settle after every step, every injected gateway replica
+# available, and up to 5 minutes of pause before the scale down of a gateway is aborted.
+DEFAULT_STEP = 1
+DEFAULT_INTERVAL = 30
+DEFAULT_MIN_READY_RATIO = 1.0
+DEFAULT_PAUSE_TIMEOUT = 300
+
+
+def scale_steps(replicas, step):
+
+    # Replica counts of the steps down to zero, e.g. [3, 1, 0] for 5 replicas and a step of 2.
+    steps = []
+    while replicas > 0:
+        replicas = max(0, replicas - step)
+        steps.append(replicas)
+    return steps
+
+
+def readiness_guard(apps_api, namespace, deployment, min_ready_ratio=DEFAULT_MIN_READY_RATIO):
+
+    # Guard that passes while the injected gateway deployment has at least one replica and the given share of its
+    # replicas available. Returns (passed, detail).
+    def check():
+
+        # Available replicas of the injected gateway against its desired replicas.
+        try:
+            view = read_view(apps_api.read_namespaced_deployment, REPLICA_FIELDS, deployment, namespace)
+        except kubernetes.client.rest.ApiException as e:
+            return False, f"injected gateway '{deployment}' cannot be read: {e.status} {error_message(e)}"
+        desired = view.replicas or 0
+        available = view.available_replicas or 0
+        if desired == 0 or available < desired * min_ready_ratio:
+            return False, f"injected gateway '{deployment}' has {available}/{desired} replicas available"
+        return True, f"injected gateway '{deployment}' has {available}/{desired} replicas available"
+
+    return check
+
+
+def check_guards(guards):
+
+    # Run the guards in order, (False, detail) of the first one breached, (True, details) when all pass.
+    details = []
+    for guard in guards:
+        passed, detail = guard()
+        if not passed:
+            return False, detail
+        details.append(detail)
+    return True, "; ".join(details)
+
+
+def wait_for_guards(namespace, name, guards, interval, pause_timeout, sleep=time.sleep):
+
+    # Check the guards, and while one is breached pause and check again every interval, up to pause_timeout
+    # seconds. Returns (passed, detail).
+    start = time.monotonic()
+    passed, detail = check_guards(guards)
+    while not passed and time.monotonic() - start < pause_timeout:
+        logger.warning(f"Pausing the scale down of '{name}' in namespace '{namespace}': {detail}")
+        logger.event("Deployment", namespace, name, "scale_down", "paused", reason=detail)
+        sleep(max(interval, 1))
+        passed, detail = check_guards(guards)
+    return passed, detail
+
+
+def pin_autoscaler(apps_api, namespace, hpa, replicas):
+
+    # Pin the min and max replicas of the HPA of a gateway to the replicas of a step, so that it neither scales the
+    # step back up to its minReplicas nor up on load. The HPA stays at one replica for the last step: it does not act
+    # on a deployment scaled to zero. Raises ApiException on failure.
+    replicas = max(replicas, 1)
+    patch_object(
+        apps_api.api_client, "hpa", hpa["name"], namespace, {"spec": {"minReplicas": replicas, "maxReplicas": replicas}}
+    )
+
+
+def progressive_scale_down(
+    apps_api,
+    namespace,
+    name,
+    guards,
+    previous_replicas=None,
+    step=DEFAULT_STEP,
+    interval=DEFAULT_INTERVAL,
+    pause_timeout=DEFAULT_PAUSE_TIMEOUT,
+    step_guards=(),
+    hpa=None,
+    sleep=time.sleep,
+):
+
+    # Step one SMCP gateway deployment from its current scale down to zero replicas, checking the guards before
+    # every step and the step guards after it, then letting the traffic settle for interval seconds. previous_replicas
+    # is the scale recorded before the first scale down, for the events, and hpa the HPA bounds recorded with it
+    # {"name", "min_replicas", "max_replicas"}, pinned to each step. Returns the result with the replica count the
+    # gateway was left at.
+    start = time.monotonic()
+    result = {"namespace": namespace, "name": name, "replicas": None, "completed": False}
+    try:
+        replicas = read_view(apps_api.read_namespaced_deployment, REPLICA_FIELDS, name, namespace).replicas or 0
+    except kubernetes.client.rest.ApiException as e:
+        result["reason"] = f"{e.status} {e.reason}: {error_message(e)}"
+        return result
+    if previous_replicas is None:
+        previous_replicas = replicas
+
+    result["replicas"] = replicas
+    for target in scale_steps(replicas, step):
+        passed, detail = wait_for_guards(namespace, name, guards, interval, pause_timeout, sleep)
+        if not passed:
+            logger.error(
+                f"Aborted the scale down of '{name}' in namespace '{namespace}' at {result['replicas']} replicas: {detail}"
+            )
+            logger.event(
+                "Deployment", namespace, name, "scale_down", "aborted", None, elapsed_ms(start),
+                replicas=result["replicas"], previous_replicas=previous_replicas, reason=detail,
+            )
+            result["reason"] = detail
+            return result
+
+        step_start = time.monotonic()
+        try:
+            if hpa:
+                pin_autoscaler(apps_api, namespace, hpa, target)
+            apps_api.patch_namespaced_deployment_scale(
+                name, namespace, {"spec": {"replicas": target}}, _preload_content=False
+            )
+        except kubernetes.client.rest.ApiException as e:
+            logger.event(
+                "Deployment", namespace, name, "scale_step", "failed", e.status, elapsed_ms(step_start),
+                replicas=target, hpa=hpa["name"] if hpa else None,
+            )
+            result["reason"] = f"{e.status} {e.reason}: {error_message(e)}"
+            return result
+        logger.info(f"Stepped deployment '{name}' in namespace '{namespace}' down to {target} replicas ({detail}).")
+        logger.event(
+            "Deployment", namespace, name, "scale_step", "success", 200, elapsed_ms(step_start),
+            replicas=target, from_replicas=result["replicas"], previous_replicas=previous_replicas,
+        )
+        result["replicas"] = target
+
+        if step_guards:
+            passed, detail = wait_for_guards(namespace, name, step_guards, interval, pause_timeout, sleep)
+            if not passed:
+                logger.error(
+                    f"Stopped the scale down of '{name}' in namespace '{namespace}' after the step to {target} replicas: {detail}"
+                )
+                logger.event(
+                    "Deployment", namespace, name, "scale_down", "aborted", None, elapsed_ms(start),
+                    replicas=target, previous_replicas=previous_replicas, reason=detail,
+                )
+                result["reason"] = detail
+                return result
+            logger.info(f"Step of deployment '{name}' in namespace '{namespace}' to {target} replicas settled ({detail}).")
+        if target:
+            sleep(interval)
+
+    logger.event(
+        "Deployment", namespace, name, "scale_down", "success", 200, elapsed_ms(start),
+        replicas=0, previous_replicas=previous_replicas, progressive=True,
+    )
+    result.update({"completed": True, "reason": None})
+    return result
@@ -0,0 +1,49 @@
+"""
+Filename      : quantity.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : Kubernetes resource quantities as plain numbers (cores and bytes) and back, so quota values written in
+                any unit ("500m", "2", "1536Mi", "4Gi", "1G") can be added and compared.
+"""
+
+import math
+
+from kubernetes.utils import parse_quantity as parse_kubernetes_quantity
+
+MI = 1024 ** 2
+GI = 1024 ** 3
+
+
+def parse_quantity(value):
+
+    # Quantity as a float in cores or bytes, NaN when the value is not set.
+    if value is None or value == "":
+        return math.nan
+    return float(parse_kubernetes_quantity(value))
+
+
+def format_cpu(cores):
+
+    # Whole cores as "2", anything else rounded up to the millicore, e.g. "2500m".
+    millicores = math.ceil(round(cores * 1000, 6))
+    if millicores % 1000 == 0:
+        return str(millicores // 1000)
+    return f"{millicores}m"
+
+
+def format_memory(size):
+
+    # Whole Gi as "4Gi", anything else rounded up to the Mi, e.g. "4608Mi".
+    mebibytes = math.ceil(round(size / MI, 6))
+    if mebibytes % 1024 == 0:
+        return f"{mebibytes // 1024}Gi"
+    return f"{mebibytes}Mi"
+
+
+def format_quantity(resource, value):
+
+    # Format a value for a quota resource name such as 'requests.cpu' or 'limits.memory'.
+    if resource.endswith("memory"):
+        return format_memory(value)
+    return format_cpu(value)
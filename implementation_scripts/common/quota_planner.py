@@ -0,0 +1,99 @@
+"""
+Filename      : quota_planner.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : Quota capacity planner for the injected gateways. Loads the hard and used values of every namespace
+                quota and the demand of the gateway pods the chart renders from the cluster values file, the same
+                demand the quota pre-flight checks, into NumPy arrays and computes, in one vectorized pass, the exact
+                quota increase each namespace needs to admit its new gateway pods.
+"""
+
+import copy
+
+import numpy as np
+
+from common.chart_renderer import render_values
+from common.quota_preflight import (
+    PREFLIGHT_RESOURCES,
+    QUOTA_ALIASES,
+    enable_namespaces,
+    format_value,
+    gateway_demand,
+    quota_values,
+)
+
+
+def quota_names(quota, resource):
+
+    # Names of a resource in the status.hard of a quota, the resource itself and any alias the quota sets.
+    hard = (quota.get("status") or {}).get("hard") or {}
+    return [name for name in hard if QUOTA_ALIASES.get(name, name) == resource] or [resource]
+
+
+def plan_quotas(quotas, cluster_values, namespaces, limit_ranges, live_deployments):
+
+    # Plan the quota of every namespace. quotas: the items of a quota list, indexed by namespace and name.
+    # limit_ranges and live_deployments as for quota_preflight.gateway_demand. The demand is that of the
+    # injected gateways of every enabled component, as they will be after enable_injected_gateway.py.
+    # Returns one row per namespace that has a '<namespace>-quota', in the order of namespaces.
+    by_name = {(item["metadata"]["namespace"], item["metadata"]["name"]): item for item in quotas}
+    namespaces = [namespace for namespace in namespaces if (namespace, f"{namespace}-quota") in by_name]
+    if not namespaces:
+        return []
+
+    enabled = copy.deepcopy(cluster_values)
+    enable_namespaces(enabled, set(namespaces))
+    pod_demand, unset = gateway_demand(render_values(enabled, namespaces), limit_ranges, live_deployments)
+
+    quota_items = [by_name[(namespace, f"{namespace}-quota")] for namespace in namespaces]
+    hard = np.array([quota_values(quota, "hard") for quota in quota_items])
+    used = np.array([quota_values(quota, "used") for quota in quota_items])
+    demand = np.array(
+        [pod_demand.get(namespace, np.zeros(len(PREFLIGHT_RESOURCES))) for namespace in namespaces]
+    )
+
+    # Resources the quota does not set are not limited, a missing used value counts as nothing used.
+    limited = ~np.isnan(hard)
+    used = np.nan_to_num(used)
+    headroom = np.where(limited, hard - used, np.inf)
+    shortfall = np.where(limited, np.maximum(demand - headroom, 0), 0)
+    new_hard = np.where(limited, hard + shortfall, np.nan)
+    blocked = (shortfall > 0).any(axis=1)
+
+    plan = []
+    for index, namespace in enumerate(namespaces):
+        plan.append(
+            {
+                "namespace": namespace,
+                "quota": f"{namespace}-quota",
+                "blocked": bool(blocked[index]),
+                "hard": dict(zip(PREFLIGHT_RESOURCES, hard[index])),
+                "used": dict(zip(PREFLIGHT_RESOURCES, used[index])),
+                "demand": dict(zip(PREFLIGHT_RESOURCES, demand[index])),
+                "shortfall": dict(zip(PREFLIGHT_RESOURCES, shortfall[index])),
+                # Limited resources the gateway pods leave unset: admission rejects them whatever the quota.
+                "unset": sorted(
+                    resource for column, resource in enumerate(PREFLIGHT_RESOURCES)
+                    if limited[index][column] and resource in unset.get(namespace, ())
+                ),
+                # Only the resources that are short are patched, under every name the quota sets them with, in
+                # the units of a quota spec.
+                "patch": {
+                    name: format_value(resource, new_hard[index][column])
+                    for column, resource in enumerate(PREFLIGHT_RESOURCES)
+                    if shortfall[index][column] > 0
+                    for name in quota_names(quota_items[index], resource)
+                },
+            }
+        )
+    return plan
+
+
+def format_row(row, field):
+
+    # Human readable values of a plan row, e.g. "requests.cpu=2500m, requests.memory=4Gi, pods=3".
+    return ", ".join(
+        f"{resource}={'-' if np.isnan(value) else format_value(resource, value)}"
+        for resource, value in row[field].items()
+    )
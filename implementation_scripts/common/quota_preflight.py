@@ -0,0 +1,209 @@
+"""
+Filename      : quota_preflight.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : Quota admission pre-flight for the injected gateways. Adds the requests and limits of the pods the
+                rendered gateway deployments will create to the status.used of every quota of their namespace and
+                predicts, before 'helm upgrade' runs, which namespaces will reject the new gateway pods.
+"""
+
+import math
+
+import numpy as np
+
+from common.chart_renderer import render_values
+from common.quantity import format_quantity, parse_quantity
+from common.values_diff import COMPONENT_TYPES
+
+PREFLIGHT_RESOURCES = ["requests.cpu", "requests.memory", "limits.cpu", "limits.memory", "pods"]
+
+# Quota resource names that count the same as one of PREFLIGHT_RESOURCES.
+QUOTA_ALIASES = {"cpu": "requests.cpu", "memory": "requests.memory", "count/pods": "pods"}
+
+# Quota scopes that match a long running gateway pod with requests set, quotas with any other scope ignore it.
+GATEWAY_POD_SCOPES = {"NotTerminating", "NotBestEffort"}
+
+# Extra pods a rolling update of an existing deployment starts before it stops old ones, the default maxSurge.
+ROLLOUT_SURGE = 0.25
+
+
+def enable_namespaces(cluster_values, namespaces):
+
+    # Same as enable_injected_gateway.py: turn on the injected gateway of every enabled component of the namespaces.
+    for project in cluster_values.get("project") or []:
+        if project.get("namespace") in namespaces:
+            for component_type in COMPONENT_TYPES:
+                component = project.get(component_type)
+                if isinstance(component, dict) and component.get("enabled"):
+                    component[f"injected_{component_type}"] = True
+
+
+def limit_range_defaults(limit_ranges):
+
+    # Container defaults of the LimitRanges of every namespace: {namespace: {"requests": {...}, "limits": {...}}}.
+    # A LimitRange without defaultRequest defaults the requests to its default limits.
+    defaults = {}
+    for item in limit_ranges:
+        namespace = item["metadata"]["namespace"]
+        entry = defaults.setdefault(namespace, {"requests": {}, "limits": {}})
+        for limit in (item.get("spec") or {}).get("limits") or []:
+            if limit.get("type") != "Container":
+                continue
+            default_limits = limit.get("default") or {}
+            for name, value in default_limits.items():
+                entry["limits"].setdefault(name, value)
+            for name, value in (limit.get("defaultRequest") or default_limits).items():
+                entry["requests"].setdefault(name, value)
+    return defaults
+
+
+def container_resources(container, defaults):
+
+    # [requests.cpu, requests.memory, limits.cpu, limits.memory] of a container as admitted, NaN when unset.
+    # A missing request takes the limit (API server defaulting), then the LimitRange of the namespace applies.
+    resources = container.get("resources") or {}
+    requests = dict(resources.get("requests") or {})
+    limits = dict(resources.get("limits") or {})
+    for name, value in limits.items():
+        requests.setdefault(name, value)
+    for name, value in (defaults or {}).get("limits", {}).items():
+        limits.setdefault(name, value)
+    for name, value in (defaults or {}).get("requests", {}).items():
+        requests.setdefault(name, value)
+
+    values = []
+    for resource in PREFLIGHT_RESOURCES[:4]:
+        kind, name = resource.split(".")
+        value = requests.get(name) if kind == "requests" else limits.get(name)
+        values.append(parse_quantity(None if value is None else str(value)))
+    return values
+
+
+def new_pods(deployment, live):
+
+    # Pods the upgrade creates for a deployment: every replica of a new deployment, the added replicas plus the
+    # surge pods of the rolling update for one that already runs.
+    replicas = (deployment.get("spec") or {}).get("replicas")
+    replicas = 1 if replicas is None else int(replicas)
+    if live is None:
+        return replicas
+    live_replicas = (live.get("spec") or {}).get("replicas")
+    live_replicas = 1 if live_replicas is None else int(live_replicas)
+    return max(replicas - live_replicas, 0) + math.ceil(ROLLOUT_SURGE * replicas)
+
+
+def gateway_demand(rendered, limit_ranges, live_deployments):
+
+    # Resources of the new gateway pods of every namespace as [requests.cpu, requests.memory, limits.cpu,
+    # limits.memory, pods], and the resources any of those pods leaves unset. live_deployments: the deployments
+    # already on the cluster, indexed by (namespace, name).
+    defaults = limit_range_defaults(limit_ranges)
+    demand = {}
+    unset = {}
+    for item in rendered:
+        if item["kind"] != "Deployment":
+            continue
+        namespace = item["metadata"]["namespace"]
+        pods = new_pods(item, live_deployments.get((namespace, item["metadata"]["name"])))
+        containers = item["spec"]["template"]["spec"]["containers"]
+        resources = np.array([container_resources(container, defaults.get(namespace)) for container in containers])
+        pod = np.nansum(resources, axis=0)
+        missing = np.append(np.isnan(resources).any(axis=0), False)
+
+        demand.setdefault(namespace, np.zeros(len(PREFLIGHT_RESOURCES)))
+        demand[namespace] += np.append(pod, 1) * pods
+        if pods:
+            unset.setdefault(namespace, set()).update(
+                resource for resource, flag in zip(PREFLIGHT_RESOURCES, missing) if flag
+            )
+    return demand, unset
+
+
+def quota_applies(quota):
+
+    # True when the quota counts gateway pods, i.e. it has no scope or only scopes gateway pods match.
+    spec = quota.get("spec") or {}
+    scopes = set(spec.get("scopes") or [])
+    for expression in (spec.get("scopeSelector") or {}).get("matchExpressions") or []:
+        if expression.get("operator") == "Exists":
+            scopes.add(expression.get("scopeName"))
+        else:
+            # PriorityClass and other value selectors do not match the gateway pods, which set no priority class.
+            return False
+    return scopes <= GATEWAY_POD_SCOPES
+
+
+def quota_values(quota, field):
+
+    # PREFLIGHT_RESOURCES of status.hard or status.used, NaN when not set. The lowest of a resource and its
+    # aliases limits admission.
+    values = (quota.get("status") or {}).get(field) or {}
+    result = [math.nan] * len(PREFLIGHT_RESOURCES)
+    for name, value in values.items():
+        resource = QUOTA_ALIASES.get(name, name)
+        if resource in PREFLIGHT_RESOURCES:
+            column = PREFLIGHT_RESOURCES.index(resource)
+            result[column] = np.fmin(result[column], parse_quantity(str(value)))
+    return result
+
+
+def predict_admission(cluster_values, quotas, limit_ranges, live_deployments, namespaces=None):
+
+    # Predict the admission of the new gateway pods of every namespace against all its quotas in one vectorized
+    # pass. Returns one row per namespace that creates gateway pods, in namespace order.
+    rendered = render_values(cluster_values, namespaces)
+    demand, unset = gateway_demand(rendered, limit_ranges, live_deployments)
+    applicable = [quota for quota in quotas if quota["metadata"]["namespace"] in demand and quota_applies(quota)]
+
+    rows = {
+        namespace: {
+            "namespace": namespace,
+            "fails": False,
+            "quotas": [],
+            "demand": dict(zip(PREFLIGHT_RESOURCES, demand[namespace])),
+            "reasons": [],
+        }
+        for namespace in sorted(demand)
+    }
+    if not applicable:
+        return list(rows.values())
+
+    hard = np.array([quota_values(quota, "hard") for quota in applicable])
+    used = np.nan_to_num(np.array([quota_values(quota, "used") for quota in applicable]))
+    wanted = np.array([demand[quota["metadata"]["namespace"]] for quota in applicable])
+    missing = np.array(
+        [
+            [resource in unset.get(quota["metadata"]["namespace"], ()) for resource in PREFLIGHT_RESOURCES]
+            for quota in applicable
+        ]
+    )
+
+    # A resource the quota does not set is not limited. A pod that leaves a limited resource unset is rejected
+    # outright, otherwise it fails when used plus the new pods exceed hard.
+    limited = ~np.isnan(hard)
+    after = used + wanted
+    exceeded = limited & ~missing & (after > hard + 1e-9)
+    unspecified = limited & missing
+
+    for index, quota in enumerate(applicable):
+        row = rows[quota["metadata"]["namespace"]]
+        row["quotas"].append(quota["metadata"]["name"])
+        for column, resource in enumerate(PREFLIGHT_RESOURCES):
+            if exceeded[index][column]:
+                row["reasons"].append(
+                    f"{quota['metadata']['name']}: {resource} used {format_value(resource, used[index][column])} + "
+                    f"gateways {format_value(resource, wanted[index][column])} > hard {format_value(resource, hard[index][column])}"
+                )
+            elif unspecified[index][column]:
+                row["reasons"].append(f"{quota['metadata']['name']}: must specify {resource} on the gateway pods")
+        row["fails"] = bool(row["reasons"])
+    return list(rows.values())
+
+
+def format_value(resource, value):
+
+    # Quota value in the units of a quota spec, pods as a plain count.
+    if resource == "pods":
+        return str(int(value))
+    return format_quantity(resource, value)
@@ -0,0 +1,156 @@
+"""
+Filename      : replica_snapshot.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : Scale snapshot of the SMCP gateway deployments. Records the spec.replicas of every gateway deployment and
+                the min/max replicas of its HorizontalPodAutoscaler with one scoped list of each, before the scale down,
+                and puts every gateway back to exactly that scale concurrently when capacity has to be restored.
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import kubernetes.client.rest
+import yaml
+
+from common.cluster_api import patch_object, typed_api
+from common.dry_run import error_message
+from common.event_log import elapsed_ms
+from common.scope import build_scope, list_in_scope
+
+logger = logging.getLogger("logging_test")
+
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+SafeDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+SNAPSHOT_FILE = "./backups/smcp_gateway_replicas.yaml"
+
+
+def take_snapshot(api_client, gateways, max_workers=10):
+
+    # Scale of the given gateway deployments [(namespace, name)], from one list of the deployments and one of the
+    # HPAs of their namespaces, run concurrently. Deployments that do not exist are left out. Raises ApiException on
+    # failure.
+    scope = build_scope({namespace for namespace, name in gateways})
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        deployments, autoscalers = executor.map(
+            lambda resource: list_in_scope(api_client, resource, scope, max_workers=max_workers), ["deployment", "hpa"]
+        )
+
+    replicas = {
+        (item["metadata"]["namespace"], item["metadata"]["name"]): item["spec"].get("replicas")
+        for item in deployments["items"]
+    }
+    hpas = {}
+    for item in autoscalers["items"]:
+        target = item["spec"].get("scaleTargetRef") or {}
+        if target.get("kind") == "Deployment":
+            hpas[(item["metadata"]["namespace"], target.get("name"))] = {
+                "name": item["metadata"]["name"],
+                "min_replicas": item["spec"].get("minReplicas", 1),
+                "max_replicas": item["spec"].get("maxReplicas"),
+            }
+
+    return [
+        {"namespace": namespace, "name": name, "replicas": replicas[(namespace, name)], "hpa": hpas.get((namespace, name))}
+        for namespace, name in sorted(gateways)
+        if (namespace, name) in replicas
+    ]
+
+
+def merge_snapshot(previous, current):
+
+    # Snapshot to save: the current one, except for the gateways an earlier run already scaled below their recorded
+    # scale, to zero or part of the way with their HPA pinned, whose scale recorded before that run is kept.
+    recorded = {(entry["namespace"], entry["name"]): entry for entry in previous}
+    merged = {}
+    for entry in current:
+        key = (entry["namespace"], entry["name"])
+        scaled_down = key in recorded and (entry["replicas"] or 0) < (recorded[key]["replicas"] or 0)
+        merged[key] = recorded[key] if scaled_down else entry
+    for key, entry in recorded.items():
+        merged.setdefault(key, entry)
+    return [merged[key] for key in sorted(merged)]
+
+
+def load_snapshot(path=SNAPSHOT_FILE):
+
+    # Gateways of a saved snapshot, an empty list when there is none.
+    try:
+        with open(path, "r") as file:
+            return (yaml.load(file, Loader=SafeLoader) or {}).get("gateways") or []
+    except FileNotFoundError:
+        return []
+
+
+def save_snapshot(snapshot, path=SNAPSHOT_FILE):
+
+    # Write the snapshot next to the other backups.
+    with open(path, "w") as file:
+        yaml.dump({"gateways": snapshot}, file, Dumper=SafeDumper, sort_keys=False)
+
+
+def scale_differs(entry, current):
+
+    # True when a gateway is missing or its replica count or HPA bounds differ from the snapshot.
+    if current is None:
+        return True
+    return entry["replicas"] != current["replicas"] or bool(entry.get("hpa") and entry["hpa"] != current.get("hpa"))
+
+
+def restore_gateway(api_client, entry, current, dry_run=None):
+
+    # Put the HPA bounds and then the replica count of one gateway back to the snapshot, only what differs.
+    start = time.monotonic()
+    namespace, name = entry["namespace"], entry["name"]
+    result = {"kind": "Deployment", "namespace": namespace, "name": name, "action": "restore_scale"}
+    if current is None:
+        result.update({"restored": False, "status": 404, "reason": "NotFound", "message": "deployment not found"})
+        return result
+
+    kwargs = {"dry_run": dry_run} if dry_run else {}
+    hpa = entry.get("hpa")
+    try:
+        if hpa and hpa != current.get("hpa"):
+            patch_object(
+                api_client, "hpa", hpa["name"], namespace,
+                {"spec": {"minReplicas": hpa["min_replicas"], "maxReplicas": hpa["max_replicas"]}}, dry_run=dry_run,
+            )
+        if entry["replicas"] != current["replicas"]:
+            typed_api(api_client, "apps").patch_namespaced_deployment_scale(
+                name, namespace, {"spec": {"replicas": entry["replicas"]}}, _preload_content=False, **kwargs
+            )
+        result.update({"restored": True, "status": 200, "reason": None, "message": None})
+    except kubernetes.client.rest.ApiException as e:
+        result.update({"restored": False, "status": e.status, "reason": e.reason, "message": error_message(e)})
+    logger.event(
+        "Deployment", namespace, name, "restore_scale",
+        ("dry_run_accepted" if dry_run else "success") if result["restored"] else "failed", result["status"],
+        elapsed_ms(start), replicas=entry["replicas"], current_replicas=current["replicas"], hpa=hpa,
+    )
+    return result
+
+
+def restore_snapshot(api_client, snapshot, dry_run=None, max_workers=10):
+
+    # Restore every gateway whose scale differs from the snapshot, concurrently. Returns the results and the number
+    # of gateways already at their snapshot scale. Raises ApiException when the current scale cannot be read.
+    current = {
+        (entry["namespace"], entry["name"]): entry
+        for entry in take_snapshot(
+            api_client, [(entry["namespace"], entry["name"]) for entry in snapshot], max_workers=max_workers
+        )
+    }
+    changed = [entry for entry in snapshot if scale_differs(entry, current.get((entry["namespace"], entry["name"])))]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(
+            executor.map(
+                lambda entry: restore_gateway(
+                    api_client, entry, current.get((entry["namespace"], entry["name"])), dry_run
+                ),
+                changed,
+            )
+        )
+    return results, len(snapshot) - len(changed)
@@ -0,0 +1,177 @@
+"""
+Filename      : restore.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : Restore engine for the backout. Loads the YAML backups written by backup_smcp_resources.py, strips the
+                fields the API server populates, diffs every backup against the live object and puts back only the
+                objects that drifted, concurrently, with server-side apply. Labels and annotations added since the
+                backup, e.g. the Helm release labels, are removed so the objects end up exactly as they were backed up.
+"""
+
+import glob
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import kubernetes.client.rest
+import yaml
+
+from common.chart_renderer import diff_object
+from common.cluster_api import apply_object, get_object, patch_object, resource_type
+from common.dry_run import error_message
+from common.event_log import elapsed_ms
+
+logger = logging.getLogger("logging_test")
+
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+BACKUP_DIR = "./backups"
+
+# Backup folder -> oc resource type, in restore order: the namespaces and quotas before the objects in them.
+BACKUP_KINDS = {
+    "namespace": "namespace",
+    "quota": "quota",
+    "service_account": "sa",
+    "role": "role",
+    "role_binding": "rolebinding",
+    "service": "svc",
+}
+
+# Field manager of the restored fields, shown in the managedFields of the objects.
+FIELD_MANAGER = "smesh-restore"
+
+# Fields populated by the API server, never part of what is restored.
+SERVER_METADATA_FIELDS = ["resourceVersion", "uid", "managedFields", "creationTimestamp", "generation", "selfLink"]
+SERVER_SPEC_FIELDS = ["clusterIP", "clusterIPs"]
+RESTORED_METADATA_MAPS = ["labels", "annotations"]
+
+
+def clean_object(obj):
+
+    # Copy of a backed up object without the fields populated by the API server.
+    obj = {key: value for key, value in obj.items() if key != "status"}
+    obj["metadata"] = {
+        key: value for key, value in (obj.get("metadata") or {}).items() if key not in SERVER_METADATA_FIELDS
+    }
+    if isinstance(obj.get("spec"), dict):
+        obj["spec"] = {key: value for key, value in obj["spec"].items() if key not in SERVER_SPEC_FIELDS}
+    return obj
+
+
+def load_backups(backup_dir=BACKUP_DIR, kinds=None, namespaces=None):
+
+    # Cleaned objects of the backups, in restore order: [(backup folder, object)]. Only the given backup folders
+    # and namespaces when given.
+    kinds = kinds or list(BACKUP_KINDS)
+    backups = []
+    for kind in BACKUP_KINDS:
+        if kind not in kinds:
+            continue
+        for path in sorted(glob.glob(os.path.join(backup_dir, kind, "*.yaml"))):
+            with open(path, "r") as file:
+                obj = yaml.load(file, Loader=SafeLoader)
+            if not obj or not obj.get("kind"):
+                logger.warning(f"Skipping '{path}', it does not contain an API object")
+                continue
+            metadata = obj.get("metadata") or {}
+            namespace = metadata.get("namespace") or metadata.get("name")
+            if namespaces and namespace not in namespaces:
+                continue
+            backups.append((kind, clean_object(obj)))
+    return backups
+
+
+def stale_metadata(desired, live):
+
+    # Labels and annotations of the live object missing from the backup, as a patch that removes them.
+    removed = {}
+    for field in RESTORED_METADATA_MAPS:
+        stale = set((live.get("metadata") or {}).get(field) or {}) - set(desired["metadata"].get(field) or {})
+        if stale:
+            removed[field] = {key: None for key in sorted(stale)}
+    return {"metadata": removed} if removed else None
+
+
+def plan_object(api_client, kind, obj):
+
+    # What restoring one backup changes: the paths that drifted and the metadata to remove. Missing objects are
+    # recreated.
+    resource = resource_type(obj["kind"])
+    name = obj["metadata"]["name"]
+    namespace = obj["metadata"].get("namespace")
+    plan = {
+        "kind": obj["kind"],
+        "folder": kind,
+        "namespace": namespace,
+        "name": name,
+        "object": obj,
+        "exists": True,
+        "differences": [],
+        "remove": None,
+        "error": None,
+    }
+    try:
+        live = get_object(api_client, resource, name, namespace)
+    except kubernetes.client.rest.ApiException as e:
+        if e.status != 404:
+            plan["error"] = (e.status, e.reason, error_message(e))
+            return plan
+        plan["exists"] = False
+        plan["differences"] = ["."]
+        return plan
+
+    plan["differences"] = diff_object(obj, live)
+    plan["remove"] = stale_metadata(obj, live)
+    return plan
+
+
+def plan_restore(api_client, backups, max_workers=10):
+
+    # Compare every backup with its live object concurrently, plans in the order of the backups.
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda backup: plan_object(api_client, *backup), backups))
+
+
+def needs_restore(plan):
+
+    # True when the live object differs from its backup.
+    return not plan["error"] and bool(plan["differences"] or plan["remove"])
+
+
+def restore_object(api_client, plan, dry_run=None):
+
+    # Remove the labels and annotations added since the backup, then apply the backup with server-side apply.
+    start = time.monotonic()
+    resource = resource_type(plan["kind"])
+    result = {key: plan[key] for key in ("kind", "namespace", "name")}
+    action = "restore" if plan["exists"] else "recreate"
+    try:
+        if plan["remove"]:
+            patch_object(api_client, resource, plan["name"], plan["namespace"], plan["remove"], dry_run=dry_run)
+        apply_object(api_client, plan["object"], FIELD_MANAGER, dry_run=dry_run)
+        result.update({"restored": True, "status": 200, "reason": None, "message": None})
+    except kubernetes.client.rest.ApiException as e:
+        result.update({"restored": False, "status": e.status, "reason": e.reason, "message": error_message(e)})
+    result["action"] = action
+    result["latency_ms"] = elapsed_ms(start)
+    logger.event(
+        plan["kind"], plan["namespace"], plan["name"], action,
+        ("dry_run_accepted" if dry_run else "success") if result["restored"] else "failed",
+        result["status"], result["latency_ms"],
+        fields=len(plan["differences"]), reason=result["reason"],
+    )
+    return result
+
+
+def restore(api_client, plans, dry_run=None, max_workers=10):
+
+    # Restore every object that drifted from its backup, concurrently within a backup folder and folder by folder
+    # in restore order, so the namespaces exist before the objects in them. Results in the order of the plans.
+    results = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for kind in BACKUP_KINDS:
+            batch = [plan for plan in plans if plan["folder"] == kind and needs_restore(plan)]
+            results.extend(executor.map(lambda plan: restore_object(api_client, plan, dry_run), batch))
+    return results
@@ -0,0 +1,273 @@
+"""
+Filename      : reverse_plan.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : Reverse plan of the backout. Reads the structured events of the implementation steps to find what was
+                actually changed, and runs the inverse of every change as a small dependency graph: the SMCP gateways
+                are enabled again in one patch, the deployments are scaled back to the replica counts recorded by the
+                scale down, and the objects and quotas are restored from the backups, independent operations
+                concurrently.
+"""
+
+import glob
+import json
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import kubernetes.client.rest
+
+from common.cluster_api import CONTROL_PLANE_NAMESPACE, SMCP_NAME, get_object, patch_object, typed_api
+from common.dry_run import error_message
+from common.event_log import elapsed_ms
+from common.fast_read import REPLICA_FIELDS, read_view
+from common.gateway_manifest import GATEWAY_TYPES
+from common.restore import BACKUP_DIR, load_backups, plan_restore, restore
+
+logger = logging.getLogger("logging_test")
+
+LOGS_DIR = "./logs"
+
+# Action of a forward step, as recorded in its events -> backout operation that reverts it.
+INVERSE_ACTIONS = {
+    "disable_gateway": "enable_gateways",
+    "scale_down": "scale_up",
+    "scale_step": "scale_up",
+    "remove_labels": "restore_objects",
+    "apply_helm_labels": "restore_objects",
+    "patch_quota": "restore_quotas",
+}
+
+# Backout operation -> operations that must succeed first. The deployments are scaled up once the SMCP manages its
+# gateways again, and the quotas only go back to their original values once the SMCP gateways run again.
+BACKOUT_DAG = {
+    "enable_gateways": [],
+    "restore_objects": [],
+    "scale_up": ["enable_gateways"],
+    "restore_quotas": ["scale_up"],
+}
+
+# Kind recorded in the events -> backup folder of backup_smcp_resources.py.
+BACKUP_FOLDERS = {
+    "Service": "service",
+    "ServiceAccount": "service_account",
+    "Role": "role",
+    "RoleBinding": "role_binding",
+    "ResourceQuota": "quota",
+}
+
+
+def read_events(logs_dir=LOGS_DIR):
+
+    # Events of every step in ./logs, oldest first. The file names start with the time the step started.
+    events = []
+    for path in sorted(glob.glob(os.path.join(logs_dir, "*.events.jsonl"))):
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    logger.warning(f"Skipping a malformed event in '{path}'")
+    return events
+
+
+def event_target(event):
+
+    # What a forward change was applied to: the gateway for the SMCP patches, the object otherwise.
+    if event["action"] == "disable_gateway":
+        return event.get("gateway_id")
+    return (event["kind"], event["namespace"], event["name"])
+
+
+def changes_done(events):
+
+    # Successful forward changes per backout operation, the last event of every target.
+    done = {operation: {} for operation in BACKOUT_DAG}
+    for event in events:
+        operation = INVERSE_ACTIONS.get(event.get("action"))
+        if operation and event.get("outcome") == "success":
+            done[operation][event_target(event)] = event
+    return done
+
+
+def succeeded(results):
+
+    # True when every change of an operation succeeded.
+    return all(result["succeeded"] for result in results)
+
+
+def change_result(kind, namespace, name, action, success, status=None, reason=None, message=None):
+
+    # Result of one inverse change, in the shape of the dry run results.
+    return {
+        "kind": kind,
+        "namespace": namespace,
+        "name": name,
+        "action": action,
+        "succeeded": success,
+        "status": status,
+        "reason": reason,
+        "message": message,
+    }
+
+
+def enable_gateways(api_client, changes, dry_run=None):
+
+    # Set enabled=true on every SMCP gateway the disable step turned off, in a single JSON patch.
+    start = time.monotonic()
+    smcp = get_object(api_client, "smcp", SMCP_NAME, CONTROL_PLANE_NAMESPACE)
+    gateways = smcp["spec"].get("gateways") or {}
+
+    patch_data = []
+    results = []
+    for gateway_id, event in sorted(changes.items()):
+        gateway_types = [event["gateway_type"]] if event.get("gateway_type") else GATEWAY_TYPES
+        gateway_type = next((name for name in gateway_types if gateway_id in (gateways.get(name) or {})), None)
+        if gateway_type is None:
+            results.append(
+                change_result(
+                    "ServiceMeshControlPlane", CONTROL_PLANE_NAMESPACE, gateway_id, "enable_gateway", False,
+                    404, "NotFound", f"gateway '{gateway_id}' is not in the SMCP any more",
+                )
+            )
+        elif gateways[gateway_type][gateway_id].get("enabled") is not True:
+            patch_data.append(
+                {"op": "replace", "path": f"/spec/gateways/{gateway_type}/{gateway_id}/enabled", "value": True}
+            )
+
+    if patch_data:
+        try:
+            patch_object(api_client, "smcp", SMCP_NAME, CONTROL_PLANE_NAMESPACE, patch_data, dry_run=dry_run)
+            outcome = (True, 200, None, None)
+        except kubernetes.client.rest.ApiException as e:
+            outcome = (False, e.status, e.reason, error_message(e))
+        for operation in patch_data:
+            gateway_id = operation["path"].split("/")[4]
+            results.append(
+                change_result("ServiceMeshControlPlane", CONTROL_PLANE_NAMESPACE, gateway_id, "enable_gateway", *outcome)
+            )
+        logger.event(
+            "ServiceMeshControlPlane", CONTROL_PLANE_NAMESPACE, SMCP_NAME, "enable_gateways",
+            ("dry_run_accepted" if dry_run else "success") if outcome[0] else "failed", outcome[1],
+            elapsed_ms(start), gateways=len(patch_data),
+        )
+    return results
+
+
+def scale_up_deployment(apps_api, event, dry_run=None):
+
+    # Scale one deployment back to the replica count recorded before the scale down.
+    start = time.monotonic()
+    namespace, name = event["namespace"], event["name"]
+    replicas = event.get("previous_replicas")
+    if replicas is None:
+        return change_result(
+            "Deployment", namespace, name, "scale_up", False,
+            None, "NoReplicaCount", "the scale down did not record the replica count, scale it up by hand",
+        )
+
+    kwargs = {"dry_run": dry_run} if dry_run else {}
+    try:
+        if read_view(apps_api.read_namespaced_deployment, REPLICA_FIELDS, name, namespace).replicas == replicas:
+            return None
+        apps_api.patch_namespaced_deployment_scale(
+            name, namespace, {"spec": {"replicas": replicas}}, _preload_content=False, **kwargs
+        )
+        result = change_result("Deployment", namespace, name, "scale_up", True, 200)
+    except kubernetes.client.rest.ApiException as e:
+        result = change_result("Deployment", namespace, name, "scale_up", False, e.status, e.reason, error_message(e))
+    logger.event(
+        "Deployment", namespace, name, "scale_up",
+        ("dry_run_accepted" if dry_run else "success") if result["succeeded"] else "failed", result["status"],
+        elapsed_ms(start), replicas=replicas,
+    )
+    return result
+
+
+def scale_up(api_client, changes, dry_run=None, max_workers=10):
+
+    # Scale every deployment the scale down step set to zero back up, concurrently.
+    apps_api = typed_api(api_client, "apps")
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(lambda event: scale_up_deployment(apps_api, event, dry_run), changes.values())
+        return [result for result in results if result is not None]
+
+
+def restore_changed(api_client, changes, backup_dir, dry_run=None, max_workers=10):
+
+    # Restore every object a step changed from its backup, when it still differs from it.
+    targets = set(changes)
+    folders = sorted({BACKUP_FOLDERS[kind] for kind, namespace, name in targets if kind in BACKUP_FOLDERS})
+    namespaces = sorted({namespace for kind, namespace, name in targets})
+    backups = [
+        (folder, obj)
+        for folder, obj in load_backups(backup_dir, kinds=folders, namespaces=namespaces)
+        if (obj["kind"], obj["metadata"].get("namespace"), obj["metadata"]["name"]) in targets
+    ]
+
+    found = {(obj["kind"], obj["metadata"].get("namespace"), obj["metadata"]["name"]) for folder, obj in backups}
+    results = [
+        change_result(kind, namespace, name, "restore", False, None, "NoBackup", f"no backup in '{backup_dir}'")
+        for kind, namespace, name in sorted(targets - found)
+    ]
+
+    plans = plan_restore(api_client, backups, max_workers=max_workers)
+    for plan in plans:
+        if plan["error"]:
+            results.append(change_result(plan["kind"], plan["namespace"], plan["name"], "restore", False, *plan["error"]))
+    for result in restore(api_client, plans, dry_run=dry_run, max_workers=max_workers):
+        results.append(
+            change_result(
+                result["kind"], result["namespace"], result["name"], result["action"], result["restored"],
+                result["status"], result["reason"], result["message"],
+            )
+        )
+    return results
+
+
+def run_backout(api_client, done, backup_dir=BACKUP_DIR, dry_run=None, max_workers=10):
+
+    # Run the backout operations of the changes done in dependency order, every operation whose dependencies
+    # succeeded concurrently with the others. Operations after a failed one are skipped. Returns the results per
+    # operation and the operations skipped.
+    operations = {
+        "enable_gateways": lambda changes: enable_gateways(api_client, changes, dry_run),
+        "scale_up": lambda changes: scale_up(api_client, changes, dry_run, max_workers),
+        "restore_objects": lambda changes: restore_changed(api_client, changes, backup_dir, dry_run, max_workers),
+        "restore_quotas": lambda changes: restore_changed(api_client, changes, backup_dir, dry_run, max_workers),
+    }
+
+    def run_operation(operation):
+
+        # Results of one operation, a failed API read counts as one failed change.
+        start = time.monotonic()
+        try:
+            results = operations[operation](done[operation]) if done[operation] else []
+        except kubernetes.client.rest.ApiException as e:
+            results = [change_result(None, None, None, operation, False, e.status, e.reason, error_message(e))]
+        logger.event(
+            "Backout", None, None, operation, "success" if succeeded(results) else "failed",
+            None, elapsed_ms(start), changes=len(done[operation]), results=len(results),
+        )
+        return results
+
+    results = {}
+    skipped = []
+    running = {}
+    with ThreadPoolExecutor(max_workers=len(BACKOUT_DAG)) as executor:
+        while len(results) + len(skipped) < len(BACKOUT_DAG):
+            # Start every operation whose dependencies succeeded, skip the ones behind a failed operation.
+            for operation, dependencies in BACKOUT_DAG.items():
+                if operation in results or operation in skipped or operation in running.values():
+                    continue
+                if any(dependency in skipped or not succeeded(results.get(dependency, [])) for dependency in dependencies):
+                    skipped.append(operation)
+                elif all(dependency in results for dependency in dependencies):
+                    running[executor.submit(run_operation, operation)] = operation
+            if not running:
+                break
+            for future in wait(running, return_when=FIRST_COMPLETED).done:
+                results[running.pop(future)] = future.result()
+    return results, skipped
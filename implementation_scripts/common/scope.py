@@ -0,0 +1,68 @@
+"""
+Filename      : scope.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : Namespace and gateway scope of a step, resolved once (by default from the maistra.io/member-of label
+                of the mesh member namespaces) and turned into per-namespace or field-selected list requests that run
+                concurrently, so the API server only returns the objects of the mesh namespaces instead of every object
+                of a shared cluster.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from common.cluster_api import CONTROL_PLANE_NAMESPACE, CORE_RESOURCES, list_objects, resource_type
+
+# Namespaces of the gateway projects and names of the SMCP gateways (ig<id> / eg<id>) the migration works on.
+NAMESPACE_PREFIX = "lbg"
+GATEWAY_PREFIXES = ("ig", "eg")
+
+
+def mesh_namespaces(api_client, prefix=NAMESPACE_PREFIX):
+
+    # Member namespaces of the mesh with the project prefix. The mesh labels every namespace it has configured as a
+    # member, whether the SMMR lists it in spec.members or selects it with spec.memberSelectors.
+    namespaces = list_objects(api_client, "namespace", label_selector=f"maistra.io/member-of={CONTROL_PLANE_NAMESPACE}")
+    names = [namespace["metadata"]["name"] for namespace in namespaces["items"]]
+    return [namespace for namespace in names if namespace.startswith(prefix)]
+
+
+def build_scope(namespaces, gateway_prefixes=GATEWAY_PREFIXES):
+
+    # Scope of a step: its namespaces, in order, and the name prefixes of its gateways.
+    return {"namespaces": sorted(set(namespaces)), "gateway_prefixes": tuple(gateway_prefixes)}
+
+
+def in_gateway_scope(scope, name):
+
+    # True when an object name belongs to one of the gateways of the scope.
+    return bool(name) and name.startswith(scope["gateway_prefixes"])
+
+
+def is_cluster_scoped(resource):
+
+    # Namespaces are the only cluster scoped resource the scripts list.
+    resource = resource_type(resource)
+    return resource in CORE_RESOURCES and CORE_RESOURCES[resource][3] is None
+
+
+def list_in_scope(api_client, resource, scope, label_selector=None, field_selector=None, max_workers=10):
+
+    # Same List as list_objects, but only for the namespaces of the scope: one namespaced list per namespace, or
+    # one list selected by metadata.name per namespace for cluster scoped resources, run concurrently. Items are
+    # returned in namespace order. Raises ApiException on failure.
+    def list_namespace(namespace):
+
+        # Objects of one namespace of the scope.
+        if is_cluster_scoped(resource):
+            selector = ",".join(filter(None, [f"metadata.name={namespace}", field_selector]))
+            return list_objects(api_client, resource, label_selector=label_selector, field_selector=selector)
+        return list_objects(
+            api_client, resource, namespace=namespace, label_selector=label_selector, field_selector=field_selector
+        )
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pages = list(executor.map(list_namespace, scope["namespaces"]))
+
+    items = [item for page in pages for item in page["items"]]
+    return {"apiVersion": "v1", "items": items, "kind": "List", "metadata": {"resourceVersion": ""}}
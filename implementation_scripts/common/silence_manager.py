@@ -0,0 +1,388 @@
+"""
+Filename      : silence_manager.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : Alertmanager silences through the v2 API. One pooled requests.Session is shared by every cluster and the
+                silences of many clusters are created, extended or expired concurrently. Silences are scoped to the
+                migrating namespaces or gateways of the SMCP inventory, and their end times are spread so the alerts
+                do not all come back at once. The silence IDs are kept in the silence store (common/silence_store.py)
+                keyed by cluster, change ID and scope, so the silences of a change can be found again by any later run.
+"""
+
+import logging
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlparse
+
+import kubernetes.client.rest
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import InsecureRequestWarning
+from urllib3.util.retry import Retry
+
+from common.cluster_api import create_api_client, get_route_host, get_smcp, whoami
+from common.event_log import elapsed_ms
+from common.gateway_manifest import get_gateway_inventory
+from common.silence_store import SILENCE_DB, SilenceStore
+
+logger = logging.getLogger("logging_test")
+
+ALERTMANAGER_NAMESPACE = "openshift-monitoring"
+ALERTMANAGER_ROUTE = "alertmanager-main"
+
+SILENCE_HOURS = 13
+
+# Random extra minutes added to every end time, so the silences of a change do not all expire together.
+JITTER_MINUTES = 30
+
+# cluster: every alert of the cluster, namespace: one silence per migrating namespace, gateway: one per gateway.
+SCOPES = ["cluster", "namespace", "gateway"]
+CLUSTER_SCOPE = "cluster"
+
+# CA bundle of the router certificate, the alertmanager route is not verified when it is not set.
+CA_FILE_ENV = "SMESH_ALERTMANAGER_CA_FILE"
+
+# Silences handled at the same time, and connections kept open per alertmanager.
+MAX_WORKERS = 10
+REQUEST_TIMEOUT = 30
+
+# Answers retried. GET and DELETE are retried by the session, a POST is only sent again once alertmanager shows that
+# the previous one did not store the silence, since a POST without an ID is not idempotent.
+RETRY_STATUSES = [429, 503]
+POST_RETRIES = 3
+BACKOFF_SECONDS = 0.5
+
+# Silence every alert, the matcher the original script used.
+DEFAULT_MATCHERS = [
+    {
+        "name": "severity",
+        "value": "critical|major|warning|Critical|Info|Warning",
+        "isRegex": True,
+        "isEqual": True,
+    }
+]
+
+_store = {}
+
+
+def create_session():
+
+    # Session shared by every cluster: keep-alive connections per alertmanager and retries of throttled reads and
+    # deletes. POSTs are retried by post_silence.
+    retry = Retry(
+        total=3,
+        backoff_factor=BACKOFF_SECONDS,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=["GET", "DELETE"],
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Content-Type"] = "application/json"
+
+    session.verify = os.environ.get(CA_FILE_ENV) or False
+    if not session.verify:
+        # Disable warnings for certificate verification
+        requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+    return session
+
+
+def connect_cluster(context_name=None):
+
+    # Alertmanager URL, bearer token and API client of one cluster, the current credentials when no context is given.
+    api_client = create_api_client(context_name)
+    name = context_name or urlparse(api_client.configuration.host).netloc
+    token = api_client.configuration.api_key.get("authorization", "")
+    if not whoami(api_client) or not token:
+        logger.error(f"You are not logged in to the OpenShift cluster '{name}'. Please log in and try again.")
+        sys.exit(1)
+
+    try:
+        alert_host = get_route_host(api_client, ALERTMANAGER_NAMESPACE, ALERTMANAGER_ROUTE)
+    except kubernetes.client.rest.ApiException as e:
+        logger.error(f"Failed to get silence host of cluster '{name}': {e.reason} - {e.body}")
+        sys.exit(1)
+
+    return {"name": name, "url": f"https://{alert_host}", "token": token, "api_client": api_client}
+
+
+def initialize_store(db_path=SILENCE_DB):
+
+    # Open the silence store of the run, migrating its schema when needed.
+    if "default" not in _store:
+        _store["default"] = SilenceStore(db_path)
+    return _store["default"]
+
+
+def save_silence(cluster, change_id, scope, silence_id, ends_at):
+
+    # Insert or replace the silence of a cluster, change and scope.
+    initialize_store().save(cluster, change_id, scope, silence_id, ends_at)
+
+
+def load_silence(cluster, change_id, scope):
+
+    # Silence ID of a cluster, change and scope, None when there is none.
+    return initialize_store().get(cluster, change_id, scope)
+
+
+def list_silences(cluster, change_id):
+
+    # Scopes silenced on a cluster for the change.
+    return initialize_store().scopes(cluster, change_id)
+
+
+def remove_silence(cluster, change_id, scope):
+
+    # Forget the silence of a cluster, change and scope.
+    initialize_store().remove(cluster, change_id, scope)
+
+
+def sweep_expired():
+
+    # Forget the silences alertmanager already ended on its own.
+    expired = initialize_store().sweep(timestamp(datetime.now(timezone.utc)))
+    for cluster, change_id, scope, silence_id in expired:
+        logger.info(f"Silence {silence_id} for '{scope}' of change '{change_id}' on cluster '{cluster}' has ended, removed from the store")
+    return expired
+
+
+def namespace_scope(namespace):
+
+    # Store key of the silence of a namespace.
+    return f"namespace:{namespace}"
+
+
+def gateway_scope(namespace, gateway_id):
+
+    # Store key of the silence of a gateway.
+    return f"gateway:{namespace}/{gateway_id}"
+
+
+def scope_matchers(scope):
+
+    # Matchers of a scope. A gateway covers the pods of the SMCP gateway (<gid>-<hash>) and of the injected
+    # gateway (<gid>-gateway-<hash>), a namespace every alert of the namespace.
+    if scope == CLUSTER_SCOPE:
+        return DEFAULT_MATCHERS
+    kind, target = scope.split(":", 1)
+    if kind == "namespace":
+        return [{"name": "namespace", "value": target, "isRegex": False, "isEqual": True}]
+    namespace, gateway_id = target.split("/", 1)
+    return [
+        {"name": "namespace", "value": namespace, "isRegex": False, "isEqual": True},
+        {"name": "pod", "value": f"{gateway_id}-.*", "isRegex": True, "isEqual": True},
+    ]
+
+
+def plan_scopes(cluster, scope):
+
+    # Scopes to silence on a cluster, from the gateways of its SMCP inventory.
+    if scope == CLUSTER_SCOPE:
+        return [CLUSTER_SCOPE]
+    inventory = get_gateway_inventory(get_smcp(cluster["api_client"]))
+    if scope == "gateway":
+        return [gateway_scope(gateway["namespace"], gateway["gateway_id"]) for gateway in inventory]
+    return [namespace_scope(namespace) for namespace in dict.fromkeys(gateway["namespace"] for gateway in inventory)]
+
+
+def passed_scopes(cluster, change_id, passed):
+
+    # Stored scopes of the change whose gateways all passed their checks. passed: {(namespace, gateway_id): bool}
+    namespaces = {}
+    for (namespace, gateway_id), result in passed.items():
+        namespaces[namespace] = namespaces.get(namespace, True) and result
+
+    scopes = []
+    for scope in list_silences(cluster["name"], change_id):
+        kind, _, target = scope.partition(":")
+        if kind == "namespace" and namespaces.get(target):
+            scopes.append(scope)
+        elif kind == "gateway" and passed.get(tuple(target.split("/", 1))):
+            scopes.append(scope)
+    return scopes
+
+
+def timestamp(moment):
+
+    # RFC 3339 timestamp in UTC, the format alertmanager expects.
+    return moment.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def end_time(hours, jitter_minutes):
+
+    # now + hours, plus a random spread so the silences end over a window instead of all at once.
+    return timestamp(
+        datetime.now(timezone.utc) + timedelta(hours=hours, minutes=random.uniform(0, jitter_minutes))
+    )
+
+
+def request(session, cluster, method, path, action, silence_id=None, **kwargs):
+
+    # One alertmanager call, recorded as a Silence event.
+    start = time.monotonic()
+    try:
+        response = session.request(
+            method,
+            f"{cluster['url']}{path}",
+            headers={"Authorization": f"Bearer {cluster['token']}"},
+            # Passed per call, requests prefers REQUESTS_CA_BUNDLE over the session setting otherwise.
+            verify=session.verify,
+            timeout=REQUEST_TIMEOUT,
+            **kwargs,
+        )
+    except requests.RequestException as e:
+        logger.error(f"Alertmanager of cluster '{cluster['name']}' is not reachable: {e}")
+        logger.event(
+            "Silence", ALERTMANAGER_NAMESPACE, silence_id, action, "failed", None, elapsed_ms(start),
+            cluster=cluster["name"],
+        )
+        return None
+    logger.event(
+        "Silence", ALERTMANAGER_NAMESPACE, silence_id, action,
+        "success" if response.ok else "failed", response.status_code, elapsed_ms(start),
+        cluster=cluster["name"],
+    )
+    return response
+
+
+def get_silence(session, cluster, silence_id):
+
+    # The silence as alertmanager knows it, None when it does not exist anymore.
+    response = request(session, cluster, "GET", f"/api/v2/silence/{silence_id}", "get_silence", silence_id)
+    if response is None or not response.ok:
+        return None
+    return response.json()
+
+
+def find_posted_silence(session, cluster, payload):
+
+    # ID of the silence a POST of this payload stored, None when there is none. The comment names the change and the
+    # scope and the end time carries a random spread, together they only match the silence of this very payload.
+    response = request(session, cluster, "GET", "/api/v2/silences", "find_silence")
+    if response is None or not response.ok:
+        return None
+    for silence in response.json():
+        if (
+            silence.get("comment") == payload["comment"]
+            and (silence.get("endsAt") or "")[:19] == payload["endsAt"][:19]
+            and silence.get("status", {}).get("state") != "expired"
+        ):
+            return silence.get("id")
+    return None
+
+
+def post_silence(session, cluster, change_id, scope, payload, action):
+
+    # Create or update a silence and return its ID. Alertmanager returns a new ID when it cannot update in place.
+    # A throttled or unanswered POST may still have been stored, so it is only sent again when the silence is not
+    # found in alertmanager, otherwise the silence found is kept.
+    for attempt in range(POST_RETRIES + 1):
+        response = request(session, cluster, "POST", "/api/v2/silences", action, payload.get("id"), json=payload)
+        if response is not None and response.status_code not in RETRY_STATUSES:
+            break
+        silence_id = find_posted_silence(session, cluster, payload)
+        if silence_id:
+            save_silence(cluster["name"], change_id, scope, silence_id, payload["endsAt"])
+            return silence_id
+        if attempt < POST_RETRIES:
+            retry_after = response.headers.get("Retry-After") if response is not None else None
+            time.sleep(float(retry_after) if retry_after and retry_after.isdigit() else BACKOFF_SECONDS * 2 ** attempt)
+    if response is None or not response.ok:
+        if response is not None:
+            logger.error(
+                f"Failed to {action.split('_')[0]} silence '{scope}' on cluster '{cluster['name']}': {response.status_code} - {response.text}"
+            )
+        return None
+    silence_id = response.json().get("silenceID")
+    save_silence(cluster["name"], change_id, scope, silence_id, payload["endsAt"])
+    return silence_id
+
+
+def create_silence(session, cluster, change_id, scope, hours=SILENCE_HOURS, jitter_minutes=JITTER_MINUTES):
+
+    # Silence the scope for the change. Running it again for the same change extends the existing silence.
+    if load_silence(cluster["name"], change_id, scope):
+        return extend_silence(session, cluster, change_id, scope, hours, jitter_minutes)
+
+    payload = {
+        "matchers": scope_matchers(scope),
+        "startsAt": timestamp(datetime.now(timezone.utc) - timedelta(hours=1)),
+        "endsAt": end_time(hours, jitter_minutes),
+        "createdBy": "api",
+        "comment": f"Silencing alerts for the injected gateway implementation ({change_id}, {scope})",
+    }
+    silence_id = post_silence(session, cluster, change_id, scope, payload, "create_silence")
+    if silence_id:
+        logger.info(f"Silence {silence_id} for '{scope}' created on cluster '{cluster['name']}' until {payload['endsAt']}")
+    return silence_id
+
+
+def extend_silence(session, cluster, change_id, scope, hours=SILENCE_HOURS, jitter_minutes=JITTER_MINUTES):
+
+    # Move the end of the silence of the scope to now + hours, recreating it when it expired meanwhile.
+    silence_id = load_silence(cluster["name"], change_id, scope)
+    silence = get_silence(session, cluster, silence_id) if silence_id else None
+    if not silence or silence.get("status", {}).get("state") == "expired":
+        if silence_id:
+            remove_silence(cluster["name"], change_id, scope)
+        return create_silence(session, cluster, change_id, scope, hours, jitter_minutes)
+
+    payload = {
+        "id": silence_id,
+        "matchers": silence["matchers"],
+        "startsAt": silence["startsAt"],
+        "endsAt": end_time(hours, jitter_minutes),
+        "createdBy": silence.get("createdBy", "api"),
+        "comment": silence.get("comment", ""),
+    }
+    new_id = post_silence(session, cluster, change_id, scope, payload, "extend_silence")
+    if new_id:
+        logger.info(f"Silence {new_id} for '{scope}' on cluster '{cluster['name']}' extended until {payload['endsAt']}")
+    return new_id
+
+
+def expire_silence(session, cluster, change_id, scope):
+
+    # Expire the silence of the scope. A silence alertmanager does not know anymore is simply forgotten.
+    silence_id = load_silence(cluster["name"], change_id, scope)
+    if not silence_id:
+        logger.warning(f"No silence stored for '{scope}' of change '{change_id}' on cluster '{cluster['name']}'")
+        return None
+
+    response = request(session, cluster, "DELETE", f"/api/v2/silence/{silence_id}", "delete_silence", silence_id)
+    if response is None or response.status_code not in (200, 404):
+        if response is not None:
+            logger.error(
+                f"Failed to delete silence {silence_id} on cluster '{cluster['name']}': {response.status_code} - {response.text}"
+            )
+        return None
+
+    remove_silence(cluster["name"], change_id, scope)
+    logger.info(f"Silence {silence_id} for '{scope}' deleted successfully on cluster '{cluster['name']}'")
+    return silence_id
+
+
+def run_silences(function, session, tasks, change_id, *args):
+
+    # Run a silence action for every (cluster, scope) concurrently and return {(cluster name, scope): result}.
+    results = {}
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = {
+            executor.submit(function, session, cluster, change_id, scope, *args): (cluster["name"], scope)
+            for cluster, scope in tasks
+        }
+        for future in as_completed(futures):
+            try:
+                results[futures[future]] = future.result()
+            except Exception as e:
+                logger.error(f"Silence action failed for '{futures[future][1]}' on cluster '{futures[future][0]}': {e}")
+                results[futures[future]] = None
+    return results
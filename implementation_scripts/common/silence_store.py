@@ -0,0 +1,177 @@
+"""
+Filename      : silence_store.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : Persistent store of the alertmanager silences, one row per cluster, change and scope. The schema is
+                versioned with PRAGMA user_version and migrated in place. The database runs in WAL mode with a busy
+                timeout, every write is a short IMMEDIATE transaction and each thread uses its own connection, so
+                several operators and worker threads can use the same store at once.
+"""
+
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger("logging_test")
+
+SILENCE_DB = "silence_id.db"
+
+# Milliseconds a writer waits for another writer before failing with 'database is locked'.
+BUSY_TIMEOUT_MS = 30000
+
+
+def migrate_v1(connection):
+
+    # Silences table with its indexes. Rows of the unversioned silences table written before this store existed
+    # are carried over, silences stored before they were scoped silence the whole cluster. The alert_id table of
+    # the original script has no cluster or change and is left as it is.
+    tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    columns = []
+    if "silences" in tables:
+        columns = [row[1] for row in connection.execute("PRAGMA table_info(silences)")]
+        connection.execute("ALTER TABLE silences RENAME TO silences_unversioned")
+
+    connection.execute(
+        """
+        CREATE TABLE silences (
+            cluster TEXT NOT NULL,
+            change_id TEXT NOT NULL,
+            scope TEXT NOT NULL,
+            silence_id TEXT NOT NULL,
+            expires_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now')),
+            PRIMARY KEY (cluster, change_id, scope)
+        )
+        """
+    )
+    # Lookups by silence ID and expiry sweeps, (cluster, change_id) lookups use the primary key.
+    connection.execute("CREATE INDEX silences_silence_id ON silences (silence_id)")
+    connection.execute("CREATE INDEX silences_expires_at ON silences (expires_at)")
+
+    if columns:
+        scope = "scope" if "scope" in columns else "'cluster'"
+        connection.execute(
+            "INSERT OR REPLACE INTO silences (cluster, change_id, scope, silence_id, expires_at) "
+            f"SELECT cluster, change_id, {scope}, silence_id, ends_at FROM silences_unversioned"
+        )
+        connection.execute("DROP TABLE silences_unversioned")
+
+
+# Schema migrations in order, the schema version is the number of migrations applied.
+MIGRATIONS = [migrate_v1]
+
+
+class SilenceStore:
+
+    # Silences of every cluster and change, safe to share between threads and processes.
+    def __init__(self, path=SILENCE_DB):
+        self.path = path
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+        self.migrate()
+
+    def connection(self):
+
+        # One connection per thread, in autocommit mode so the transactions are explicit.
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+            connection.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            self.local.connection = connection
+            with self.lock:
+                self.connections.append(connection)
+        return connection
+
+    @contextmanager
+    def transaction(self):
+
+        # Take the write lock up front, a deferred transaction upgrading to a write can fail under contention.
+        connection = self.connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def migrate(self):
+
+        # Apply the migrations the database has not seen yet, each in its own transaction.
+        with self.transaction() as connection:
+            version = connection.execute("PRAGMA user_version").fetchone()[0]
+            for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+                migration(connection)
+                connection.execute(f"PRAGMA user_version = {number}")
+                logger.debug(f"Silence store '{self.path}' migrated to schema version {number}.")
+
+    def save(self, cluster, change_id, scope, silence_id, expires_at):
+
+        # Insert or update the silence of a cluster, change and scope.
+        with self.transaction() as connection:
+            connection.execute(
+                """
+                INSERT INTO silences (cluster, change_id, scope, silence_id, expires_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (cluster, change_id, scope) DO UPDATE SET
+                    silence_id = excluded.silence_id,
+                    expires_at = excluded.expires_at,
+                    updated_at = strftime('%Y-%m-%dT%H:%M:%fZ', 'now')
+                """,
+                (cluster, change_id, scope, silence_id, expires_at),
+            )
+
+    def get(self, cluster, change_id, scope):
+
+        # Silence ID of a cluster, change and scope, None when there is none.
+        row = self.connection().execute(
+            "SELECT silence_id FROM silences WHERE cluster = ? AND change_id = ? AND scope = ?",
+            (cluster, change_id, scope),
+        ).fetchone()
+        return row[0] if row else None
+
+    def scopes(self, cluster, change_id):
+
+        # Scopes silenced on a cluster for the change.
+        rows = self.connection().execute(
+            "SELECT scope FROM silences WHERE cluster = ? AND change_id = ? ORDER BY scope", (cluster, change_id)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def find(self, silence_id):
+
+        # (cluster, change_id, scope) of a silence ID, None when it is not stored.
+        return self.connection().execute(
+            "SELECT cluster, change_id, scope FROM silences WHERE silence_id = ?", (silence_id,)
+        ).fetchone()
+
+    def remove(self, cluster, change_id, scope):
+
+        # Forget the silence of a cluster, change and scope.
+        with self.transaction() as connection:
+            connection.execute(
+                "DELETE FROM silences WHERE cluster = ? AND change_id = ? AND scope = ?", (cluster, change_id, scope)
+            )
+
+    def sweep(self, now):
+
+        # Forget the silences that ended before now (RFC 3339 UTC timestamp) and return them.
+        with self.transaction() as connection:
+            rows = connection.execute(
+                "SELECT cluster, change_id, scope, silence_id FROM silences WHERE expires_at < ?", (now,)
+            ).fetchall()
+            connection.execute("DELETE FROM silences WHERE expires_at < ?", (now,))
+        return rows
+
+    def close(self):
+
+        # Close the connections of every thread.
+        with self.lock:
+            for connection in self.connections:
+                connection.close()
+            self.connections = []
+        self.local = threading.local()
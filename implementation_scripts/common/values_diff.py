@@ -0,0 +1,133 @@
+"""
+Filename      : values_diff.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : Structural diff of two versions of the cluster values file keyed on project[].namespace, reporting
+                which ingress/egress blocks changed and which rendered objects and Helm releases they affect.
+"""
+
+from common.chart_renderer import render_project
+from common.helm_release import release_name_for
+
+COMPONENT_TYPES = ["ingress", "egress"]
+
+
+def index_projects(cluster_values):
+
+    # Index the projects of the values file by namespace.
+    return {
+        project["namespace"]: project
+        for project in cluster_values.get("project") or []
+        if isinstance(project, dict) and project.get("namespace")
+    }
+
+
+def diff_mapping(old, new, path=""):
+
+    # Return (path, old value, new value) for every leaf that differs between two nested values.
+    if isinstance(old, dict) and isinstance(new, dict):
+        changes = []
+        for key in list(old) + [key for key in new if key not in old]:
+            changes.extend(diff_mapping(old.get(key), new.get(key), f"{path}.{key}" if path else str(key)))
+        return changes
+
+    if isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        changes = []
+        for index, (old_item, new_item) in enumerate(zip(old, new)):
+            changes.extend(diff_mapping(old_item, new_item, f"{path}[{index}]"))
+        return changes
+
+    if old != new:
+        return [(path, old, new)]
+    return []
+
+
+def diff_values(old_values, new_values):
+
+    # Compare two versions of the values file project by project.
+    old_projects = index_projects(old_values)
+    new_projects = index_projects(new_values)
+
+    result = {
+        "added": [ns for ns in new_projects if ns not in old_projects],
+        "removed": [ns for ns in old_projects if ns not in new_projects],
+        "changed": {},
+        "unchanged": 0,
+        "global": diff_mapping(
+            {key: value for key, value in old_values.items() if key != "project"},
+            {key: value for key, value in new_values.items() if key != "project"},
+        ),
+    }
+
+    for namespace, new_project in new_projects.items():
+        if namespace not in old_projects:
+            continue
+        old_project = old_projects[namespace]
+        changes = {}
+        for component_type in COMPONENT_TYPES:
+            component_changes = diff_mapping(
+                old_project.get(component_type) or {},
+                new_project.get(component_type) or {},
+            )
+            if component_changes:
+                changes[component_type] = component_changes
+        if changes:
+            result["changed"][namespace] = changes
+        else:
+            result["unchanged"] += 1
+
+    return result
+
+
+def object_key(obj):
+
+    # Identity of a rendered object inside a namespace.
+    return (obj["kind"], obj["metadata"]["name"])
+
+
+def diff_rendered(old_project, new_project):
+
+    # Compare the objects the chart renders for two versions of a project.
+    old_objects = {object_key(obj): obj for obj in render_project(old_project)} if old_project else {}
+    new_objects = {object_key(obj): obj for obj in render_project(new_project)} if new_project else {}
+
+    return {
+        "create": [key for key in new_objects if key not in old_objects],
+        "delete": [key for key in old_objects if key not in new_objects],
+        "update": [
+            key for key in new_objects if key in old_objects and new_objects[key] != old_objects[key]
+        ],
+    }
+
+
+def plan_upgrades(old_values, new_values, diff, strategy="none", batch_count=1):
+
+    # Work out the rendered object changes per namespace, the minimal set of releases to upgrade and the releases
+    # to uninstall. A removed namespace whose release still owns other projects is an upgrade of that release, one
+    # whose release owns no project any more, e.g. its own per-namespace release, has no values file left to upgrade
+    # with and is uninstalled.
+    old_projects = index_projects(old_values)
+    new_projects = index_projects(new_values)
+    remaining = {release_name_for(namespace, strategy, batch_count) for namespace in new_projects}
+
+    affected = list(diff["changed"]) + diff["added"] + diff["removed"]
+    patch_plan = {}
+    releases = set()
+    uninstall = set()
+
+    for namespace in affected:
+        object_changes = diff_rendered(old_projects.get(namespace), new_projects.get(namespace))
+        if any(object_changes.values()):
+            patch_plan[namespace] = object_changes
+            release_name = release_name_for(namespace, strategy, batch_count)
+            if release_name in remaining:
+                releases.add(release_name)
+            else:
+                uninstall.add(release_name)
+
+    # A change outside the project list can affect every release.
+    if diff["global"]:
+        releases.update(remaining)
+
+    return {"patch_plan": patch_plan, "releases": sorted(releases), "uninstall": sorted(uninstall)}
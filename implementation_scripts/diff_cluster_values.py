@@ -0,0 +1,194 @@
+"""
+Filename      : diff_cluster_values.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : This script compares two versions of the cluster values file and reports which projects' ingress/egress
+                blocks changed, which injected gateway objects that changes and the minimal set of helm upgrades to run,
+                and the releases of removed namespaces to uninstall.
+"""
+
+import argparse
+import os
+import sys
+
+import yaml
+
+from common.helm_release import DEFAULT_SHARD_STRATEGY, RELEASE_NAMESPACE, SHARD_STRATEGIES, shard_values_dir
+from common.values_diff import diff_values, plan_upgrades
+from common.logging_setup import create_logger
+from common.instrumentation import span
+
+# Use the libyaml bindings when available, the pure python parser is several times slower on large values files.
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+CHART_PATH = "./charts/service-mesh-injected-gateway"
+
+
+def load_values(values_file):
+
+    # Read a cluster values file, replacing tabs the same way 07.enable_injected_gateway.py does.
+    with open(values_file, "r") as file:
+        cluster_values = yaml.load(file.read().replace("\t", "  "), Loader=SafeLoader)
+
+    if not isinstance(cluster_values, dict) or "project" not in cluster_values:
+        logger.error(f"The cluster values file '{values_file}' does not contain 'project' key. Exiting.. !")
+        sys.exit(1)
+
+    return cluster_values
+
+
+def main():
+
+    logger.info(
+        "============================   Starting Script Execution.  ============================"
+    )
+    logger.newline()
+
+    for values_file in [args.old_values, args.new_values]:
+        if not os.path.isfile(values_file):
+            logger.error(f"Required input file {values_file} does not exist. Exiting.. !")
+            sys.exit(1)
+
+    old_values = load_values(args.old_values)
+    new_values = load_values(args.new_values)
+
+    diff = diff_values(old_values, new_values)
+    plan = plan_upgrades(old_values, new_values, diff, args.shard_by, args.batch_count)
+
+    for namespace, changes in diff["changed"].items():
+        logger.info(f"Namespace '{namespace}' changed:")
+        for component_type, component_changes in changes.items():
+            for path, old, new in component_changes:
+                logger.info(f" - {component_type}.{path}: {old} -> {new}")
+    for namespace in diff["added"]:
+        logger.info(f"Namespace '{namespace}' added.")
+    for namespace in diff["removed"]:
+        logger.info(f"Namespace '{namespace}' removed.")
+    for path, old, new in diff["global"]:
+        logger.warning(f"Global value '{path}' changed: {old} -> {new}")
+
+    logger.newline()
+    for namespace, object_changes in plan["patch_plan"].items():
+        logger.info(f"Injected gateway objects affected in namespace '{namespace}':")
+        for action in ["create", "update", "delete"]:
+            for kind, name in object_changes[action]:
+                logger.info(f" - {action:<6} : {kind} '{name}'")
+                logger.event(kind, namespace, name, "plan_upgrade", action)
+
+    logger.newline()
+    logger.info(f"Namespaces changed    : {len(diff['changed'])}")
+    logger.info(f"Namespaces added      : {len(diff['added'])}")
+    logger.info(f"Namespaces removed    : {len(diff['removed'])}")
+    logger.info(f"Namespaces unchanged  : {diff['unchanged']}")
+    logger.info(f"Releases to upgrade   : {len(plan['releases'])}")
+    logger.info(f"Releases to uninstall : {len(plan['uninstall'])}")
+
+    if plan["releases"]:
+        logger.newline()
+        logger.info("Upgrade plan: ")
+        for release_name in plan["releases"]:
+            if args.shard_by == "none":
+                values_file = args.new_values
+            else:
+                values_file = os.path.join(args.shards_dir, f"{release_name}.yaml")
+            logger.info(
+                f" - helm upgrade --install {release_name} {CHART_PATH} --namespace {RELEASE_NAMESPACE} --timeout 600s --values {values_file}"
+            )
+        if args.shard_by != "none":
+            logger.info(
+                f"Regenerate the release values files in '{args.shards_dir}' from '{args.new_values}' with shard_injected_gateway_releases.py --action plan first."
+            )
+        else:
+            logger.warning(
+                "The single release re-renders every project. Use shard_injected_gateway_releases.py to upgrade only the changed namespaces."
+            )
+
+    if plan["uninstall"]:
+        logger.newline()
+        logger.info("Uninstall plan: ")
+        for release_name in plan["uninstall"]:
+            logger.info(f" - helm uninstall {release_name} --namespace {RELEASE_NAMESPACE} --timeout 600s")
+
+    if args.output:
+        with span("file", "write upgrade plan"), open(args.output, "w") as file:
+            yaml.safe_dump(
+                {
+                    "changed": {
+                        namespace: {
+                            component_type: [
+                                {"path": path, "old": old, "new": new} for path, old, new in component_changes
+                            ]
+                            for component_type, component_changes in changes.items()
+                        }
+                        for namespace, changes in diff["changed"].items()
+                    },
+                    "added": diff["added"],
+                    "removed": diff["removed"],
+                    "patch_plan": {
+                        namespace: {
+                            action: [f"{kind}/{name}" for kind, name in keys]
+                            for action, keys in object_changes.items()
+                        }
+                        for namespace, object_changes in plan["patch_plan"].items()
+                    },
+                    "releases": plan["releases"],
+                    "uninstall": plan["uninstall"],
+                },
+                file,
+                sort_keys=False,
+            )
+        logger.info(f"Upgrade plan saved to '{args.output}'")
+
+    logger.newline()
+    logger.info(
+        "============================   Script Execution Completed.   ============================"
+    )
+
+
+if __name__ == "__main__":
+    # Set global logger
+    logger = create_logger("diff_cluster_values")
+
+    parser = argparse.ArgumentParser("diff_cluster_values")
+    parser.add_argument(
+        "old_values",
+        help="Full path of the previous cluster values file.",
+    )
+    parser.add_argument(
+        "new_values",
+        help="Full path of the updated cluster values file.",
+    )
+    parser.add_argument(
+        "--shard-by",
+        choices=SHARD_STRATEGIES,
+        default=DEFAULT_SHARD_STRATEGY,
+        help=f"Release sharding in use, so the plan lists the releases that own the changed namespaces (default: {DEFAULT_SHARD_STRATEGY}).",
+    )
+    parser.add_argument(
+        "--batch-count",
+        type=int,
+        default=16,
+        help="Number of releases the namespaces are spread over when sharding by batch.",
+    )
+    parser.add_argument(
+        "--shards-dir",
+        help="Directory holding the values file of each release when sharding (default: <new values>-shards).",
+    )
+    parser.add_argument(
+        "--output",
+        help="Write the diff and upgrade plan to this file.",
+    )
+
+    args = parser.parse_args()
+    if args.batch_count < 1:
+        logger.info(
+            "USAGE: python diff_cluster_values.py <old values> <new values> [--shard-by none|namespace|batch] [--batch-count <n>]"
+        )
+        logger.error("--batch-count must be at least 1.")
+        sys.exit(1)  # Exit with error status
+    if args.shards_dir is None:
+        # Same directory shard_injected_gateway_releases.py writes to and the playbook reads.
+        args.shards_dir = shard_values_dir(args.new_values)
+
+    main()
@@ -0,0 +1,190 @@
+"""
+Filename      : render_injected_gateway.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : This script renders the injected gateway chart from the cluster values file without helm, validates
+                the values and optionally compares the rendered objects against the live objects in the cluster.
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib3.exceptions import InsecureRequestWarning
+import requests
+
+import kubernetes.client.rest
+import yaml
+
+from common.chart_renderer import diff_object, render_values, validate_values
+from common.cluster_api import create_api_client, list_objects
+from common.logging_setup import create_logger
+from common.instrumentation import span
+
+# Use the libyaml bindings when available, the pure python parser is several times slower on large values files.
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+SafeDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+
+# Kind -> resource listed to read the live objects for comparison.
+LIVE_KINDS = {
+    "ServiceAccount": "sa",
+    "Role": "role",
+    "RoleBinding": "rolebinding",
+    "Service": "svc",
+    "Deployment": "deployment",
+}
+
+
+def list_live_objects(namespace, kinds):
+
+    # List the live objects of every rendered kind in the namespace, keyed by (kind, name). The raw JSON of the
+    # lists is compared as is, without building the typed models.
+    live = {}
+    for kind in kinds:
+        try:
+            items = list_objects(api_client, LIVE_KINDS[kind], namespace=namespace)["items"]
+        except kubernetes.client.rest.ApiException as e:
+            logger.error(f"Error listing {kind} objects in namespace '{namespace}'")
+            logger.error("Error details: ")
+            logger.error(f" - Reason: {e.reason}")
+            logger.error(f" - Status: {e.status}")
+            logger.error(f" - Message: {e.body}")
+            continue
+        for item in items:
+            live[(kind, item["metadata"]["name"])] = item
+    return live
+
+
+def compare_with_cluster(rendered):
+
+    # Compare every rendered object with its live counterpart, listing each namespace once and concurrently.
+    requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+
+    by_namespace = {}
+    for obj in rendered:
+        by_namespace.setdefault(obj["metadata"]["namespace"], []).append(obj)
+
+    namespaces = sorted(by_namespace)
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        live_objects = dict(
+            zip(
+                namespaces,
+                executor.map(
+                    lambda ns: list_live_objects(ns, {obj["kind"] for obj in by_namespace[ns]}),
+                    namespaces,
+                ),
+            )
+        )
+
+    missing = drifted = in_sync = 0
+    for namespace in namespaces:
+        logger.newline()
+        for obj in by_namespace[namespace]:
+            kind = obj["kind"]
+            name = obj["metadata"]["name"]
+            live = live_objects[namespace].get((kind, name))
+            if live is None:
+                missing += 1
+                logger.warning(f"{kind} '{name}' in namespace '{namespace}' does not exist in the cluster.")
+                logger.event(kind, namespace, name, "compare", "missing")
+                continue
+            differences = diff_object(obj, live)
+            if differences:
+                drifted += 1
+                logger.warning(f"{kind} '{name}' in namespace '{namespace}' differs from the rendered chart:")
+                for path in differences:
+                    logger.warning(f" - {path}")
+                logger.event(kind, namespace, name, "compare", "drift", differences=differences)
+            else:
+                in_sync += 1
+                logger.info(f"{kind} '{name}' in namespace '{namespace}' matches the rendered chart.")
+                logger.event(kind, namespace, name, "compare", "in_sync")
+
+    logger.newline()
+    logger.info(f"Objects in sync       : {in_sync}")
+    logger.info(f"Objects with drift    : {drifted}")
+    logger.info(f"Objects missing       : {missing}")
+
+
+def main():
+
+    logger.info(
+        "============================   Starting Script Execution.  ============================"
+    )
+    logger.newline()
+
+    if not os.path.isfile(args.values_file):
+        logger.error(f"Required input file {args.values_file} does not exist. Exiting.. !")
+        sys.exit(1)
+
+    start = time.monotonic()
+
+    with open(args.values_file, "r") as file:
+        cluster_values = yaml.load(file.read().replace("\t", "  "), Loader=SafeLoader)
+
+    namespaces = set(args.namespace) if args.namespace else None
+
+    # Validate the values before rendering anything.
+    errors = validate_values(cluster_values, namespaces)
+    if errors:
+        logger.error("The cluster values file failed validation:")
+        for error in errors:
+            logger.error(f" - {error}")
+        logger.newline()
+        sys.exit(1)
+
+    rendered = render_values(cluster_values, namespaces)
+    elapsed = time.monotonic() - start
+
+    projects = {obj["metadata"]["namespace"] for obj in rendered}
+    logger.info(
+        f"Rendered {len(rendered)} objects for {len(projects)} namespaces in {elapsed:.3f} seconds."
+    )
+
+    if args.output:
+        with span("file", "write rendered manifests"), open(args.output, "w") as file:
+            yaml.dump_all(rendered, file, Dumper=SafeDumper, sort_keys=False)
+        logger.info(f"Rendered manifests saved to '{args.output}'")
+
+    if args.compare:
+        compare_with_cluster(rendered)
+
+    logger.newline()
+    logger.info(
+        "============================   Script Execution Completed.   ============================"
+    )
+
+
+if __name__ == "__main__":
+    # Set global logger
+    logger = create_logger("render_injected_gateway")
+
+    parser = argparse.ArgumentParser("render_injected_gateway")
+    parser.add_argument(
+        "values_file",
+        help="Full path of the cluster values file.",
+    )
+    parser.add_argument(
+        "--namespace",
+        action="append",
+        help="Only render the given namespace. Can be repeated to render several namespaces.",
+    )
+    parser.add_argument(
+        "--output",
+        help="Write the rendered manifests to this file.",
+    )
+    parser.add_argument(
+        "--compare",
+        action="store_true",
+        help="Compare the rendered objects against the live objects in the cluster.",
+    )
+
+    args = parser.parse_args()
+
+    if args.compare:
+        api_client = create_api_client()
+
+    main()
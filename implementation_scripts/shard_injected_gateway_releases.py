@@ -0,0 +1,293 @@
+"""
+Filename      : shard_injected_gateway_releases.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : This script splits the single injected gateway Helm release into per-namespace or per-batch releases.
+                It writes one values file per release, moves the existing objects over to their new release through
+                the meta.helm.sh/release-name annotation and retires the original release without deleting anything.
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib3.exceptions import InsecureRequestWarning
+import requests
+
+import kubernetes.client.rest
+from kubernetes import client
+from ruamel.yaml import YAML
+
+from common.chart_renderer import render_values
+from common.helm_release import (
+    RELEASE_NAME,
+    RELEASE_NAMESPACE,
+    DEFAULT_SHARD_STRATEGY,
+    SHARD_STRATEGIES,
+    plan_shards,
+    shard_values,
+    shard_values_dir,
+)
+from common.event_log import elapsed_ms
+from common.cluster_api import create_api_client
+from common.logging_setup import create_logger
+from common.instrumentation import span
+
+yaml = YAML()
+yaml.width = sys.maxsize  # Set width to max size to avoid line breaks in YAML output
+yaml.preserve_quotes = True  # Preserve quotes in YAML output
+
+CHART_PATH = "./charts/service-mesh-injected-gateway"
+
+# Kind -> (api, patch method) used to move the objects to their new release.
+PATCH_METHODS = {
+    "ServiceAccount": ("core", "patch_namespaced_service_account"),
+    "Role": ("auth", "patch_namespaced_role"),
+    "RoleBinding": ("auth", "patch_namespaced_role_binding"),
+    "Service": ("core", "patch_namespaced_service"),
+    "Deployment": ("apps", "patch_namespaced_deployment"),
+}
+
+
+def write_shard_values(cluster_values, shards):
+
+    # Write one values file per release and log the helm command that installs it. Values files of releases that
+    # are not planned any more are removed first, the playbook installs every values file of the directory.
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    for filename in sorted(os.listdir(args.output_dir)):
+        release_name, extension = os.path.splitext(filename)
+        if extension == ".yaml" and release_name not in shards:
+            os.remove(os.path.join(args.output_dir, filename))
+            logger.warning(f"Values file '{filename}' of release '{release_name}' is no longer planned, removed.")
+            logger.event("ValuesFile", None, filename, "prune_shard", "success", release=release_name)
+
+    for release_name, projects in shards.items():
+        fullname = os.path.join(args.output_dir, f"{release_name}.yaml")
+        with span("file", "write release values"), open(fullname, "w") as file:
+            yaml.dump(shard_values(cluster_values, projects), file)
+
+        logger.info(
+            f"Release '{release_name}' with {len(projects)} namespaces saved to '{fullname}'"
+        )
+        logger.info(
+            f" - helm upgrade --install {release_name} {CHART_PATH} --namespace {RELEASE_NAMESPACE} --timeout 600s --values {fullname}"
+        )
+
+
+def adopt_object(obj, release_name):
+
+    # Point the Helm ownership metadata of an existing object at its new release.
+    kind = obj["kind"]
+    name = obj["metadata"]["name"]
+    namespace = obj["metadata"]["namespace"]
+
+    body = {
+        "metadata": {
+            "labels": {
+                "app.kubernetes.io/managed-by": "Helm"
+            },
+            "annotations": {
+                "meta.helm.sh/release-name": release_name,
+                "meta.helm.sh/release-namespace": RELEASE_NAMESPACE
+            }
+        }
+    }
+
+    if args.dry_run:
+        logger.info(
+            f"DRY RUN: {kind} '{name}' in namespace '{namespace}' would be moved to release '{release_name}'."
+        )
+        logger.event(kind, namespace, name, "adopt", "dry_run", release=release_name)
+        return
+
+    apis = {"core": core_api, "apps": apps_api, "auth": auth_api}
+    api_name, method = PATCH_METHODS[kind]
+    start = time.monotonic()
+    try:
+        getattr(apis[api_name], method)(name=name, namespace=namespace, body=body)
+        logger.event(kind, namespace, name, "adopt", "success", 200, elapsed_ms(start), release=release_name)
+        logger.info(
+            f"{kind} '{name}' in namespace '{namespace}' moved to release '{release_name}'."
+        )
+    except kubernetes.client.rest.ApiException as e:
+        logger.event(
+            kind, namespace, name, "adopt", "not_found" if e.status == 404 else "failed", e.status, elapsed_ms(start),
+            release=release_name,
+        )
+        if e.status == 404:
+            logger.warning(
+                f"{kind} '{name}' not found in namespace '{namespace}'. It will be created by release '{release_name}'."
+            )
+        else:
+            logger.error(
+                f"Error moving {kind} '{name}' in namespace '{namespace}' to release '{release_name}'"
+            )
+            logger.error("Error details: ")
+            logger.error(f" - Reason: {e.reason}")
+            logger.error(f" - Status: {e.status}")
+            logger.error(f" - Message: {e.body}")
+
+
+def adopt_objects(shards):
+
+    # Move every object rendered for a shard to the shard release, concurrently.
+    requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+
+    work = []
+    for release_name, projects in shards.items():
+        for obj in render_values({"project": projects}):
+            work.append((obj, release_name))
+
+    logger.info(f"Moving {len(work)} objects to {len(shards)} releases.")
+    logger.newline()
+
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        list(executor.map(lambda item: adopt_object(*item), work))
+
+
+def retire_monolith(shards):
+
+    # Delete the release secrets of the single release so Helm forgets it without deleting any object. Only once
+    # every shard release is deployed, otherwise the single release is the only history of the objects.
+    requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+
+    if RELEASE_NAME in shards:
+        logger.error(f"Sharding '{args.shard_by}' keeps the release '{RELEASE_NAME}', it cannot be retired. Exiting.. !")
+        sys.exit(1)
+
+    deployed = core_api.list_namespaced_secret(RELEASE_NAMESPACE, label_selector="owner=helm,status=deployed")
+    missing = sorted(set(shards) - {secret.metadata.labels.get("name") for secret in deployed.items})
+    if missing:
+        logger.error(
+            f"{len(missing)} of {len(shards)} shard releases are not deployed in namespace '{RELEASE_NAMESPACE}', "
+            f"e.g. '{missing[0]}'. Install every release before retiring '{RELEASE_NAME}'. Exiting.. !"
+        )
+        sys.exit(1)
+
+    label_selector = f"owner=helm,name={RELEASE_NAME}"
+    secrets = core_api.list_namespaced_secret(RELEASE_NAMESPACE, label_selector=label_selector)
+
+    if not secrets.items:
+        logger.info(f"No release secrets found for '{RELEASE_NAME}' in namespace '{RELEASE_NAMESPACE}'.")
+        return
+
+    for secret in secrets.items:
+        if args.dry_run:
+            logger.info(f"DRY RUN: Release secret '{secret.metadata.name}' would be deleted.")
+            continue
+        start = time.monotonic()
+        try:
+            core_api.delete_namespaced_secret(secret.metadata.name, RELEASE_NAMESPACE)
+            logger.info(f"Release secret '{secret.metadata.name}' deleted.")
+            logger.event("Secret", RELEASE_NAMESPACE, secret.metadata.name, "retire_release", "success", 200, elapsed_ms(start))
+        except kubernetes.client.rest.ApiException as e:
+            logger.event("Secret", RELEASE_NAMESPACE, secret.metadata.name, "retire_release", "failed", e.status, elapsed_ms(start))
+            logger.error(f"Error deleting release secret '{secret.metadata.name}'")
+            logger.error("Error details: ")
+            logger.error(f" - Reason: {e.reason}")
+            logger.error(f" - Status: {e.status}")
+            logger.error(f" - Message: {e.body}")
+
+
+def main():
+
+    logger.info(
+        "============================   Starting Script Execution.  ============================"
+    )
+    logger.newline()
+
+    if not os.path.isfile(args.values_file):
+        logger.error(f"Required input file {args.values_file} does not exist. Exiting.. !")
+        sys.exit(1)
+
+    with open(args.values_file, "r") as file:
+        cluster_values = yaml.load(file.read().replace("\t", "  "))
+
+    if "project" not in cluster_values:
+        logger.error("The cluster values file does not contain 'project' key. Exiting.. !")
+        sys.exit(1)
+
+    shards = plan_shards(cluster_values, args.shard_by, args.batch_count)
+    logger.info(
+        f"Split {len(cluster_values['project'])} namespaces into {len(shards)} releases using '{args.shard_by}' sharding."
+    )
+    logger.newline()
+
+    if args.action == "plan":
+        write_shard_values(cluster_values, shards)
+    elif args.action == "adopt":
+        adopt_objects(shards)
+    elif args.action == "retire-monolith":
+        retire_monolith(shards)
+
+    logger.newline()
+    logger.info("Next Steps: ")
+    logger.info(" - plan            : review the values file written for each release")
+    logger.info(" - adopt           : move the existing objects to their new release")
+    logger.info(" - retire-monolith : forget the single release, then install each release with its values file")
+    logger.newline()
+    logger.info(
+        "============================   Script Execution Completed.   ============================"
+    )
+
+
+if __name__ == "__main__":
+    # Set global logger
+    logger = create_logger("shard_injected_gateway_releases")
+
+    parser = argparse.ArgumentParser("shard_injected_gateway_releases")
+    parser.add_argument(
+        "values_file",
+        help="Full path of the cluster values file.",
+    )
+    parser.add_argument(
+        "--action",
+        choices=["plan", "adopt", "retire-monolith"],
+        required=True,
+        help="Specify the action to perform: 'plan', 'adopt' or 'retire-monolith'.",
+    )
+    parser.add_argument(
+        "--shard-by",
+        choices=SHARD_STRATEGIES,
+        default=DEFAULT_SHARD_STRATEGY,
+        help="Create one release per namespace or per batch of namespaces; use the same value with 05.apply_helm_adoption.py. Required, 'none' keeps the single release.",
+    )
+    parser.add_argument(
+        "--batch-count",
+        type=int,
+        default=16,
+        help="Number of releases to spread the namespaces over when sharding by batch.",
+    )
+    parser.add_argument(
+        "--output-dir",
+        help="Directory to write the values file of each release to (default: <values file>-shards, read by the playbook).",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Run the script in dry run mode without making any changes.",
+    )
+
+    args = parser.parse_args()
+    if args.batch_count < 1 or args.shard_by == "none":
+        logger.info("USAGE: python shard_injected_gateway_releases.py <cluster_values.yaml> --action plan|adopt|retire-monolith --shard-by namespace|batch [--batch-count <n>]")
+        if args.batch_count < 1:
+            logger.error("--batch-count must be at least 1.")
+        else:
+            logger.error("--shard-by namespace or batch is required, 'none' keeps the single release and there is nothing to split.")
+        sys.exit(1)  # Exit with error status
+    if args.output_dir is None:
+        args.output_dir = shard_values_dir(args.values_file)
+
+    if args.action != "plan":
+        api_client = create_api_client()
+
+        global core_api, apps_api, auth_api  # Declare the api clients as global variables to use them in other functions
+        core_api = client.CoreV1Api(api_client)
+        apps_api = client.AppsV1Api(api_client)
+        auth_api = client.RbacAuthorizationV1Api(api_client)
+
+    main()
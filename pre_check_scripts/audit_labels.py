@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Filename      : audit_labels.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : This script audits the labels and annotations of the service, service account, role, role binding and
+                deployments of every SMCP gateway with one metadata-only list per object kind, and reports each object
+                as SMCP-owned, stripped or Helm-adopted. Run it before and after a step and pass the first audit with
+                --baseline to see exactly which objects the step changed.
+"""
+
+import argparse
+import os
+import sys
+import time
+from urllib3.exceptions import InsecureRequestWarning
+import requests
+
+import kubernetes.client.rest
+
+import yaml
+
+# Shared helpers live alongside the implementation scripts.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "implementation_scripts"))
+
+from common.cluster_api import create_api_client, get_smcp, whoami
+from common.event_log import elapsed_ms
+from common.gateway_manifest import build_manifest
+from common.logging_setup import create_logger
+from common.metadata_scan import LABEL_STATES, SCAN_KINDS, audit_manifest, diff_audits, scan_metadata
+
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+SafeDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+
+def scan_cluster():
+
+    # Metadata of every object kind the migration relabels, exits when a list fails.
+    start = time.monotonic()
+    try:
+        scanned = scan_metadata(api_client)
+        logger.event(
+            "Metadata", None, None, "scan_metadata", "success", 200, elapsed_ms(start),
+            objects=sum(len(objects) for objects in scanned.values()),
+        )
+        return scanned
+    except kubernetes.client.rest.ApiException as e:
+        logger.event("Metadata", None, None, "scan_metadata", "failed", e.status, elapsed_ms(start))
+        logger.error("Error listing the object metadata in the cluster")
+        logger.error("Error details: ")
+        logger.error(f" - Reason: {e.reason}")
+        logger.error(f" - Status: {e.status}")
+        logger.error(f" - Message: {e.body}")
+        sys.exit(1)
+
+
+def check_login():
+
+    # Check if the user is logged in to the OpenShift cluster.
+    # If not, prompt the user to log in and exit the script.
+    if not whoami(api_client):
+        logger.error("UNAUTHORIZED...!! Please login to the cluster and try again... !")
+        sys.exit(1)
+
+
+def main():
+
+    if args.baseline and not os.path.isfile(args.baseline):
+        logger.error(f"Required input file {args.baseline} does not exist. Exiting.. !")
+        sys.exit(1)
+
+    # Read SMCP configuration from the OpenShift cluster.
+    smcp = get_smcp(api_client)
+
+    logger.info(
+        "============================   Starting Script Execution.  ============================"
+    )
+
+    requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+    audit = audit_manifest(build_manifest(smcp), scan_cluster())
+
+    logger.newline()
+    logger.info(
+        f"\t\t{'NAMESPACE':<40}\t{'GATEWAY_ID':<12}\t" + "\t".join(f"{kind.upper():<20}" for kind in SCAN_KINDS)
+    )
+    for row in audit:
+        logger.info(
+            f"\t\t{row['namespace']:<40}\t{row['gateway_id']:<12}\t"
+            + "\t".join(f"{row['states'][kind]:<20}" for kind in SCAN_KINDS)
+        )
+        logger.event(
+            "Gateway", row["namespace"], row["gateway_id"], "audit_labels", "success", **row["states"]
+        )
+
+    # Totals per object kind and label state.
+    logger.newline()
+    for kind, (display_name, api, method) in SCAN_KINDS.items():
+        counts = {state: sum(row["states"][kind] == state for row in audit) for state in LABEL_STATES}
+        logger.info(
+            f"{display_name + ' (' + kind + ')':<40}: "
+            + ", ".join(f"{state}={count}" for state, count in counts.items() if count)
+        )
+
+    if args.output:
+        with open(args.output, "w") as file:
+            yaml.dump(audit, file, Dumper=SafeDumper, sort_keys=False)
+        logger.newline()
+        logger.info(f"Label audit saved to '{args.output}'")
+
+    if args.baseline:
+        with open(args.baseline, "r") as file:
+            baseline = yaml.load(file, Loader=SafeLoader) or []
+        changes = diff_audits(baseline, audit)
+        logger.newline()
+        logger.info(f"Objects whose label state changed since '{args.baseline}': {len(changes)}")
+        for namespace, gateway_id, kind, before, after in changes:
+            logger.info(f" - {namespace} {gateway_id} {kind}: {before} -> {after}")
+            logger.event("Gateway", namespace, gateway_id, "audit_labels", "changed", object_kind=kind, before=before, after=after)
+
+    logger.newline()
+    logger.info(
+        "============================   Script Execution Completed.   ============================"
+    )
+
+
+if __name__ == "__main__":
+    # Set global logger
+    logger = create_logger("audit_labels")
+
+    parser = argparse.ArgumentParser("audit_labels")
+    parser.add_argument(
+        "--output",
+        help="Write the label audit to this file, to pass as --baseline after the next step.",
+    )
+    parser.add_argument(
+        "--baseline",
+        help="Label audit written by an earlier run, report every object whose label state changed since.",
+    )
+    args = parser.parse_args()
+
+    # Configure the Kubernetes client to connect to the OpenShift cluster.
+    api_client = create_api_client()
+
+    check_login()
+
+    # Run the main function
+    main()
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Filename      : compare_gateway_latency.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : This script compares the latency of the SMCP gateway (baseline) and the injected gateway (candidate) of
+                a namespace before the namespace is signed off. Both sides sit behind the same Service, so every side
+                is loaded through its own pods, on the target port of the chosen Service port (80 or 443). It drives
+                the same HTTP/1.1 or HTTP/2 load through both, reports the throughput, error rates and latency
+                percentiles side by side, and exits with an error when the tail latency or the error rate of the
+                injected gateway regressed. --baseline-url / --candidate-url load any two URLs instead.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from urllib3.exceptions import InsecureRequestWarning
+import requests
+
+import kubernetes.client.rest
+from kubernetes import client
+
+# Shared helpers live alongside the implementation scripts.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "implementation_scripts"))
+
+from common.cluster_api import create_api_client, get_smcp, whoami
+from common.envoy_stats import gateway_pods
+from common.fast_read import read_view
+from common.gateway_manifest import build_manifest
+from common.load_generator import (
+    DEFAULT_CHECK_PERCENTILES,
+    DEFAULT_CONCURRENCY,
+    DEFAULT_DURATION,
+    DEFAULT_MAX_ERROR_RATE_INCREASE,
+    DEFAULT_MAX_REGRESSION,
+    DEFAULT_SLACK_MS,
+    DEFAULT_WARMUP,
+    REQUEST_TIMEOUT,
+    compare,
+    httpx,
+    run_ab,
+    side_metrics,
+)
+from common.logging_setup import create_logger
+
+SERVICE_PORT_FIELDS = {"name": "metadata.name", "ports": "spec.ports"}
+
+
+def check_login():
+
+    # Check if the user is logged in to the OpenShift cluster.
+    # If not, prompt the user to log in and exit the script.
+    if not whoami(api_client):
+        logger.error("UNAUTHORIZED...!! Please login to the cluster and try again... !")
+        sys.exit(1)
+
+
+def resolve_targets():
+
+    # Pod URLs of the SMCP gateway (baseline) and the injected gateway (candidate) of the namespace, on the target
+    # port behind the chosen port of the gateway Service.
+    record = next(
+        (
+            record for record in build_manifest(get_smcp(api_client))
+            if record["namespace"] == args.namespace and record["gateway_id"] == args.gateway_id
+        ),
+        None,
+    )
+    if record is None:
+        logger.error(f"Gateway '{args.gateway_id}' in namespace '{args.namespace}' is not in the SMCP. Exiting.. !")
+        sys.exit(1)
+
+    try:
+        service = read_view(
+            core_api.read_namespaced_service, SERVICE_PORT_FIELDS, record["objects"]["service"], args.namespace
+        )
+        pods = gateway_pods(core_api, [record])
+    except kubernetes.client.rest.ApiException as e:
+        logger.error(f"Error reading the gateway '{args.gateway_id}' in namespace '{args.namespace}'")
+        logger.error("Error details: ")
+        logger.error(f" - Reason: {e.reason}")
+        logger.error(f" - Status: {e.status}")
+        logger.error(f" - Message: {e.body}")
+        sys.exit(1)
+
+    port = next((port for port in service.ports or [] if port["port"] == args.port), None)
+    if port is None or not isinstance(port.get("targetPort", port["port"]), int):
+        logger.error(f"Service '{service.name}' has no port {args.port} with a numeric target port. Exiting.. !")
+        sys.exit(1)
+    scheme = "https" if args.port == 443 or port.get("name", "").startswith("https") else "http"
+    target_port = port.get("targetPort", port["port"])
+
+    targets = {"smcp": [], "injected": []}
+    for pod in pods:
+        targets[pod["side"]].append(f"{scheme}://{pod['pod_ip']}:{target_port}")
+    logger.info(f"Service '{service.name}' port {args.port} -> {scheme} target port {target_port}")
+    return targets["smcp"], targets["injected"]
+
+
+def format_value(metric, value):
+
+    # Rates as percentages, the rest with one or three decimals.
+    if value is None:
+        return "-"
+    if metric == "error_rate":
+        return f"{value:.3%}"
+    return f"{value:.1f}" if metric == "throughput_rps" else f"{value:.3f}"
+
+
+def log_comparison(rows):
+
+    # Side by side table of the two runs, the checked rows marked OK or REGRESSED.
+    logger.info(f"\t{'METRIC':<16}{'BASELINE':>14}{'CANDIDATE':>14}{'DELTA':>10}   CHECK")
+    for row in rows:
+        delta = f"{row['delta']:+.1%}" if row["delta"] is not None else "-"
+        check = ("REGRESSED" if row["regressed"] else "OK") if row["checked"] else ""
+        line = (
+            f"\t{row['metric']:<16}{format_value(row['metric'], row['baseline']):>14}"
+            f"{format_value(row['metric'], row['candidate']):>14}{delta:>10}   {check}"
+        )
+        if row["regressed"]:
+            logger.error(line)
+        else:
+            logger.info(line)
+
+
+def main():
+
+    logger.info(
+        "============================   Starting Script Execution.  ============================"
+    )
+
+    if args.baseline_url:
+        baseline_targets, candidate_targets = args.baseline_url, args.candidate_url
+    else:
+        baseline_targets, candidate_targets = resolve_targets()
+    for label, targets in (("baseline (SMCP gateway)", baseline_targets), ("candidate (injected gateway)", candidate_targets)):
+        if not targets:
+            logger.error(f"No target for the {label}. Exiting.. !")
+            sys.exit(1)
+        logger.info(f"Targets of the {label}: {', '.join(targets)}")
+
+    headers = {"Host": args.host} if args.host else None
+    logger.newline()
+    logger.info(
+        f"Loading both sides over {'HTTP/2' if args.http2 else 'HTTP/1.1'} with {args.concurrency} connections, "
+        f"{args.warmup}s warm up + {args.duration}s measured"
+        + (f" at {args.rate} req/s" if args.rate else "")
+        + f", {args.rounds} round(s)"
+    )
+    baseline, candidate = asyncio.run(
+        run_ab(
+            baseline_targets,
+            candidate_targets,
+            rounds=args.rounds,
+            path=args.path,
+            method=args.method,
+            headers=headers,
+            server_hostname=args.host,
+            concurrency=args.concurrency,
+            duration=args.duration,
+            warmup=args.warmup,
+            rate=args.rate,
+            http2=args.http2,
+            timeout=args.timeout,
+        )
+    )
+
+    rows = compare(
+        baseline,
+        candidate,
+        check_percentiles=args.check_percentile or DEFAULT_CHECK_PERCENTILES,
+        max_regression=args.max_regression,
+        slack_ms=args.slack_ms,
+        max_error_rate_increase=args.max_error_rate_increase,
+    )
+    logger.newline()
+    log_comparison(rows)
+    for label, result in (("Baseline", baseline), ("Candidate", candidate)):
+        if result["errors"]:
+            logger.warning(f"{label} errors: {', '.join(f'{name}={count}' for name, count in sorted(result['errors'].items()))}")
+
+    regressed = [row["metric"] for row in rows if row["regressed"]]
+    report = {
+        "namespace": args.namespace,
+        "gateway_id": args.gateway_id,
+        "baseline": side_metrics(baseline),
+        "candidate": side_metrics(candidate),
+        "comparison": rows,
+        "regressed": regressed,
+    }
+    logger.event(
+        "Gateway", args.namespace, args.gateway_id, "latency_ab", "regressed" if regressed else "success",
+        baseline=report["baseline"], candidate=report["candidate"], regressed=regressed,
+    )
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+        logger.info(f"Report saved to '{args.output}'")
+
+    logger.newline()
+    if regressed:
+        logger.error(f"The candidate regressed on: {', '.join(regressed)}")
+    else:
+        logger.info("No regression of the candidate.")
+    logger.info(
+        "============================   Script Execution Completed.   ============================"
+    )
+    if regressed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    # Set global logger
+    logger = create_logger("compare_gateway_latency")
+
+    parser = argparse.ArgumentParser("compare_gateway_latency")
+    parser.add_argument("--namespace", help="Namespace of the gateway to compare.")
+    parser.add_argument("--gateway-id", help="SMCP gateway id, e.g. ig001.")
+    parser.add_argument("--port", type=int, default=80, help="Port of the gateway Service to load (default: 80).")
+    parser.add_argument(
+        "--baseline-url",
+        action="append",
+        help="Load this URL as the baseline instead of the SMCP gateway pods, can be repeated.",
+    )
+    parser.add_argument(
+        "--candidate-url",
+        action="append",
+        help="Load this URL as the candidate instead of the injected gateway pods, can be repeated.",
+    )
+    parser.add_argument("--path", default="/", help="Request path (default: /).")
+    parser.add_argument("--method", default="GET", help="Request method (default: GET).")
+    parser.add_argument("--host", help="Host header and TLS server name the gateway routes on.")
+    parser.add_argument("--http2", action="store_true", help="Send HTTP/2 requests, needs httpx[http2].")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f"Concurrent connections per side (default: {DEFAULT_CONCURRENCY}).",
+    )
+    parser.add_argument(
+        "--duration",
+        type=float,
+        default=DEFAULT_DURATION,
+        help=f"Seconds measured per side and round (default: {DEFAULT_DURATION}).",
+    )
+    parser.add_argument(
+        "--warmup",
+        type=float,
+        default=DEFAULT_WARMUP,
+        help=f"Seconds of load before the measure starts (default: {DEFAULT_WARMUP}).",
+    )
+    parser.add_argument("--rate", type=float, help="Requests per second per side, as fast as possible when not set.")
+    parser.add_argument("--rounds", type=int, default=1, help="Rounds of baseline and candidate runs (default: 1).")
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=REQUEST_TIMEOUT,
+        help=f"Seconds before a request times out (default: {REQUEST_TIMEOUT}).",
+    )
+    parser.add_argument(
+        "--check-percentile",
+        type=float,
+        action="append",
+        help="Latency percentile that must not regress, can be repeated (default: 99).",
+    )
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=DEFAULT_MAX_REGRESSION,
+        help=f"Share a checked percentile may grow by (default: {DEFAULT_MAX_REGRESSION}).",
+    )
+    parser.add_argument(
+        "--slack-ms",
+        type=float,
+        default=DEFAULT_SLACK_MS,
+        help=f"Milliseconds a checked percentile may grow by on top of --max-regression (default: {DEFAULT_SLACK_MS}).",
+    )
+    parser.add_argument(
+        "--max-error-rate-increase",
+        type=float,
+        default=DEFAULT_MAX_ERROR_RATE_INCREASE,
+        help=f"Error rate the candidate may add to the baseline (default: {DEFAULT_MAX_ERROR_RATE_INCREASE}).",
+    )
+    parser.add_argument("--output", help="Write the report as JSON to this file.")
+    args = parser.parse_args()
+
+    by_url = bool(args.baseline_url) and bool(args.candidate_url)
+    by_gateway = bool(args.namespace) and bool(args.gateway_id)
+    if by_url == by_gateway or args.concurrency < 1 or args.rounds < 1:
+        logger.info(
+            "USAGE: python compare_gateway_latency.py --namespace <ns> --gateway-id <id> [--port 80|443] "
+            "(OR) --baseline-url <url> --candidate-url <url> [--duration <s>] [--concurrency <n>] [--rate <req/s>]"
+        )
+        logger.error("Please provide the relevant input to run.")
+        sys.exit(1)  # Exit with error status
+
+    if args.http2 and httpx is None:
+        logger.error("HTTP/2 load needs httpx with the http2 extra: pip install 'httpx[http2]'")
+        sys.exit(1)
+
+    if by_gateway:
+        # Configure the Kubernetes client to connect to the OpenShift cluster.
+        requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+        api_client = create_api_client()
+
+        check_login()
+
+        global core_api  # Declare core_api as a global variable to use it in other functions
+        core_api = client.CoreV1Api(api_client)
+
+    # Run the main function
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Filename      : quota_preflight.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : This script predicts, before 'helm upgrade' runs, which namespaces will reject the injected gateway pods
+                because the status.used of a quota plus the requests and limits of the new gateway pods exceed its
+                hard values. Exits with status 1 when any namespace will fail admission.
+"""
+
+import argparse
+import os
+import sys
+import time
+from urllib3.exceptions import InsecureRequestWarning
+import requests
+
+import kubernetes.client.rest
+
+import yaml
+
+# Shared helpers live alongside the implementation scripts.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "implementation_scripts"))
+
+from common.cluster_api import create_api_client, list_objects, whoami
+from common.event_log import elapsed_ms
+from common.logging_setup import create_logger
+from common.quota_preflight import enable_namespaces, predict_admission
+
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def load_yaml(path):
+
+    # Read a YAML input file the same way the implementation scripts do.
+    if not os.path.isfile(path):
+        logger.error(f"Required input file {path} does not exist. Exiting.. !")
+        sys.exit(1)
+    with open(path, "r") as f:
+        return yaml.load(f.read().replace("\t", "  "), Loader=SafeLoader)
+
+
+def list_items(resource, label_selector=None):
+
+    # Every object of a resource across all namespaces, in one list call.
+    start = time.monotonic()
+    try:
+        items = list_objects(api_client, resource, label_selector=label_selector)["items"]
+        logger.event(resource, None, None, "list", "success", 200, elapsed_ms(start), items=len(items))
+        return items
+    except kubernetes.client.rest.ApiException as e:
+        logger.event(resource, None, None, "list", "failed", e.status, elapsed_ms(start))
+        logger.error(f"Error listing '{resource}' objects in the cluster")
+        logger.error("Error details: ")
+        logger.error(f" - Reason: {e.reason}")
+        logger.error(f" - Status: {e.status}")
+        logger.error(f" - Message: {e.body}")
+        sys.exit(1)
+
+
+def check_login():
+
+    # Check if the user is logged in to the OpenShift cluster.
+    # If not, prompt the user to log in and exit the script.
+    if not whoami(api_client):
+        logger.error("UNAUTHORIZED...!! Please login to the cluster and try again... !")
+        sys.exit(1)
+
+
+def main():
+
+    cluster_values = load_yaml(args.values_file)
+    if args.enable_from:
+        enable_namespaces(cluster_values, set(load_yaml(args.enable_from) or []))
+
+    logger.info(
+        "============================   Starting Script Execution.  ============================"
+    )
+
+    # One list call per resource type for the whole cluster.
+    requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+    quotas = list_items("quota")
+    limit_ranges = list_items("limitrange")
+    live_deployments = {
+        (item["metadata"]["namespace"], item["metadata"]["name"]): item
+        for item in list_items("deployment", label_selector="type=injectedgateway")
+    }
+
+    results = predict_admission(cluster_values, quotas, limit_ranges, live_deployments, args.namespace)
+    failures = [row for row in results if row["fails"]]
+
+    for row in results:
+        logger.event(
+            "ResourceQuota", row["namespace"], None, "quota_preflight", "fail" if row["fails"] else "pass",
+            quotas=len(row["quotas"]), pods=int(row["demand"]["pods"]), reasons=len(row["reasons"]),
+        )
+        if row["fails"]:
+            logger.newline()
+            logger.error(f"FAIL - Gateway pods in namespace {row['namespace']} will be rejected by its quota")
+            for reason in row["reasons"]:
+                logger.error(f"  - {reason}")
+
+    logger.newline()
+    logger.info(f"Total namespaces creating injected gateway pods: {len(results)}")
+    logger.info(f"Total namespaces that will fail quota admission: {len(failures)}")
+    if failures:
+        logger.newline()
+        logger.info(f"\t\t{'NAMESPACE':<50}\t{' : ':<2}\t{'QUOTAS':<10}")
+        for row in failures:
+            logger.info(f"\t\t{row['namespace']:<50}\t{' : ':<2}\t{', '.join(row['quotas']):<10}")
+
+    logger.newline()
+    logger.info(
+        "============================   Script Execution Completed.   ============================"
+    )
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    # Set global logger
+    logger = create_logger("quota_preflight")
+
+    parser = argparse.ArgumentParser("quota_preflight")
+    parser.add_argument("values_file", help="Cluster values file that will be passed to 'helm upgrade'.")
+    parser.add_argument(
+        "--namespace",
+        action="append",
+        default=None,
+        help="Only check this namespace, can be given more than once. Defaults to every project of the values file.",
+    )
+    parser.add_argument(
+        "--enable-from",
+        default=None,
+        help="input_namespace.yaml of enable_injected_gateway.py, check the values as they will be after that step.",
+    )
+    args = parser.parse_args()
+
+    # Configure the Kubernetes client to connect to the OpenShift cluster.
+    api_client = create_api_client()
+
+    check_login()
+
+    # Run the main function
+    main()
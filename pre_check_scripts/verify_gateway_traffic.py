@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Filename      : verify_gateway_traffic.py
+Author        : Kyndryl Engineering
+Maintained by : Kyndryl Engineering
+Version       : 1.0
+Description   : This script checks that the traffic has moved from the SMCP gateways to the injected gateways. It scrapes
+                the Envoy stats of every gateway pod twice, an interval apart, and reports the request rate, 5xx rate and
+                active connections of the old and the new gateway of every namespace side by side. It exits with an
+                error while any SMCP gateway still serves traffic.
+                This is a post scale down check, run it after scale_down_smcp_gateway.py: both gateways sit behind the
+                same Service, so SMCP pods that are still running and ready keep their share of the requests. The
+                TAKEOVER column tells, before the scale down, whether the injected gateway serves its share.
+"""
+
+import argparse
+import os
+import sys
+from urllib3.exceptions import InsecureRequestWarning
+import requests
+
+import kubernetes.client.rest
+from kubernetes import client
+
+# Shared helpers live alongside the implementation scripts.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "implementation_scripts"))
+
+from common.cluster_api import create_api_client, get_smcp, whoami
+from common.envoy_stats import (
+    DEFAULT_INTERVAL,
+    DRAIN_MAX_CONNECTIONS,
+    DRAIN_MAX_RPS,
+    STATS_URL_ENV,
+    create_session,
+    measure_traffic,
+)
+from common.gateway_manifest import build_manifest, check_manifest_namespace, resolve_manifest
+from common.logging_setup import create_logger
+
+
+def check_login():
+
+    # Check if the user is logged in to the OpenShift cluster.
+    # If not, prompt the user to log in and exit the script.
+    if not whoami(api_client):
+        logger.error("UNAUTHORIZED...!! Please login to the cluster and try again... !")
+        sys.exit(1)
+
+
+def format_side(traffic):
+
+    # Request rate, 5xx rate and connections of one side, with the pods whose stats were read.
+    return (
+        f"{traffic['rps']:>9.1f} {traffic['errors_per_s']:>7.1f} {traffic['active_connections']:>6.0f} "
+        f"{traffic['scraped']:>3}/{traffic['pods']:<3}"
+    )
+
+
+def main():
+
+    # Read SMCP configuration from the OpenShift cluster.
+    smcp = get_smcp(api_client)
+
+    logger.info(
+        "============================   Starting Script Execution.  ============================"
+    )
+
+    requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+    manifest = build_manifest(smcp)
+    resolve_manifest(manifest, [], core_api)
+    records = [
+        record for record in manifest
+        if (not args.namespace or record["namespace"] in args.namespace) and check_manifest_namespace(record)
+    ]
+
+    logger.info(f"Scraping the Envoy stats of {len(records)} gateways twice, {args.interval} seconds apart")
+    try:
+        report = measure_traffic(
+            create_session(), core_api, records, args.interval, args.stats_url, args.max_rps, args.max_connections
+        )
+    except kubernetes.client.rest.ApiException as e:
+        logger.error("Error listing the gateway pods")
+        logger.error("Error details: ")
+        logger.error(f" - Reason: {e.reason}")
+        logger.error(f" - Status: {e.status}")
+        logger.error(f" - Message: {e.body}")
+        sys.exit(1)
+
+    logger.newline()
+    header = f"{'req/s':>9} {'5xx/s':>7} {'conns':>6} {'pods':<7}"
+    logger.info(f"{'NAMESPACE':<30} {'GATEWAY_ID':<10} | SMCP {header} | INJECTED {header} | SHARE   TAKEOVER  STATUS")
+    for row in report:
+        share = f"{row['injected_share']:>6.1%}" if row["injected_share"] is not None else f"{'-':>6}"
+        line = (
+            f"{row['namespace']:<30} {row['gateway_id']:<10} | SMCP {format_side(row['smcp'])} | "
+            f"INJECTED {format_side(row['injected'])} | {share}  {'YES' if row['taken_over'] else 'NO':<8}  "
+            f"{'DRAINED' if row['drained'] else 'SERVING'}"
+        )
+        if row["drained"]:
+            logger.info(line)
+        else:
+            logger.error(line)
+        logger.event(
+            "Gateway", row["namespace"], row["gateway_id"], "verify_traffic",
+            "drained" if row["drained"] else "serving", smcp=row["smcp"], injected=row["injected"],
+            injected_share=row["injected_share"], pod_share=row["pod_share"], taken_over=row["taken_over"],
+        )
+
+    serving = [row for row in report if not row["drained"]]
+    logger.newline()
+    logger.info(f"SMCP gateways drained         : {len(report) - len(serving)}")
+    logger.info(f"SMCP gateways still serving   : {len(serving)}")
+    if serving:
+        logger.warning("Run this check after the SMCP gateways are scaled down, running SMCP pods keep their share of the Service traffic.")
+
+    logger.newline()
+    logger.info(
+        "============================   Script Execution Completed.   ============================"
+    )
+    if serving:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    # Set global logger
+    logger = create_logger("verify_gateway_traffic")
+
+    parser = argparse.ArgumentParser("verify_gateway_traffic")
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=DEFAULT_INTERVAL,
+        help=f"Seconds between the two scrapes the rates are computed from (default: {DEFAULT_INTERVAL}).",
+    )
+    parser.add_argument(
+        "--namespace",
+        action="append",
+        help="Only check the gateways of this namespace, can be repeated.",
+    )
+    parser.add_argument(
+        "--stats-url",
+        help=f"URL template of the pod stats with {{namespace}}, {{pod}} and {{pod_ip}}, also read from {STATS_URL_ENV}.",
+    )
+    parser.add_argument(
+        "--max-rps",
+        type=float,
+        default=DRAIN_MAX_RPS,
+        help=f"Requests per second below which an SMCP gateway is drained (default: {DRAIN_MAX_RPS}).",
+    )
+    parser.add_argument(
+        "--max-connections",
+        type=float,
+        default=DRAIN_MAX_CONNECTIONS,
+        help=f"Active connections below which an SMCP gateway is drained (default: {DRAIN_MAX_CONNECTIONS}).",
+    )
+    args = parser.parse_args()
+
+    # Configure the Kubernetes client to connect to the OpenShift cluster.
+    api_client = create_api_client()
+
+    check_login()
+
+    global core_api  # Declare core_api as a global variable to use it in other functions
+    core_api = client.CoreV1Api(api_client)
+
+    # Run the main function
+    main()
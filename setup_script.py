@@ -41,7 +41,7 @@ def copy_scripts(cluster_prefix):
 
 def create_directory(cluster_prefix):
 
-    folder_list = [cluster_prefix, "logs", "backups/quota", "backups/service", "backups/namespace", "backups/service_account", "backups/role", "backups/role_binding"]
+    folder_list = [cluster_prefix, "logs", "backups/quota", "backups/service", "backups/namespace", "backups/service_account", "backups/role", "backups/role_binding", "backups/values"]
     for folder in folder_list:
         if folder is cluster_prefix:
             dirpath = os.path.join("./", folder)